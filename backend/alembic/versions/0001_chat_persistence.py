@@ -0,0 +1,63 @@
+"""Chat persistence: conversations, chat_requests, messages
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "conversations",
+        sa.Column("id", sa.String(length=64), primary_key=True),
+        sa.Column("model", sa.String(length=128), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_table(
+        "chat_requests",
+        sa.Column("id", sa.String(length=36), primary_key=True),
+        sa.Column("conversation_id", sa.String(length=64), sa.ForeignKey("conversations.id"), nullable=True),
+        sa.Column("client_id", sa.String(length=128), nullable=True),
+        sa.Column("model", sa.String(length=128), nullable=False),
+        sa.Column("status_code", sa.Integer(), nullable=False),
+        sa.Column("streamed", sa.Boolean(), nullable=False),
+        sa.Column("cached", sa.Boolean(), nullable=False),
+        sa.Column("latency_ms", sa.Float(), nullable=False),
+        sa.Column("prompt_eval_count", sa.Integer(), nullable=True),
+        sa.Column("eval_count", sa.Integer(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_chat_requests_created_at", "chat_requests", ["created_at"])
+    op.create_index("ix_chat_requests_conversation_id", "chat_requests", ["conversation_id"])
+    op.create_table(
+        "messages",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("request_id", sa.String(length=36), sa.ForeignKey("chat_requests.id"), nullable=False),
+        sa.Column("conversation_id", sa.String(length=64), sa.ForeignKey("conversations.id"), nullable=True),
+        sa.Column("role", sa.String(length=16), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("model", sa.String(length=128), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_messages_conversation_id", "messages", ["conversation_id"])
+    op.create_index("ix_messages_request_id", "messages", ["request_id"])
+
+
+def downgrade():
+    op.drop_index("ix_messages_request_id", table_name="messages")
+    op.drop_index("ix_messages_conversation_id", table_name="messages")
+    op.drop_table("messages")
+    op.drop_index("ix_chat_requests_conversation_id", table_name="chat_requests")
+    op.drop_index("ix_chat_requests_created_at", table_name="chat_requests")
+    op.drop_table("chat_requests")
+    op.drop_table("conversations")
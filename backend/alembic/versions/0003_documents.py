@@ -0,0 +1,51 @@
+"""Retrieval-augmented generation: documents and document_chunks
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "documents",
+        sa.Column("id", sa.String(length=36), primary_key=True),
+        sa.Column("collection", sa.String(length=128), nullable=False),
+        sa.Column("source", sa.String(length=512), nullable=False),
+        sa.Column("sha256", sa.String(length=64), nullable=False),
+        sa.Column("size", sa.Integer(), nullable=False),
+        sa.Column("chunk_count", sa.Integer(), nullable=False),
+        sa.Column("embedding_model", sa.String(length=128), nullable=False),
+        sa.Column("created_at", sa.Float(), nullable=False),
+        sa.Column("updated_at", sa.Float(), nullable=False),
+        sa.UniqueConstraint("collection", "source", name="uq_documents_collection_source"),
+    )
+    op.create_table(
+        "document_chunks",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column(
+            "document_id",
+            sa.String(length=36),
+            sa.ForeignKey("documents.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("ordinal", sa.Integer(), nullable=False),
+        sa.Column("vector_row", sa.Integer(), nullable=False, unique=True),
+        sa.Column("content", sa.Text(), nullable=False),
+    )
+    op.create_index("ix_document_chunks_document_id", "document_chunks", ["document_id"])
+
+
+def downgrade():
+    op.drop_index("ix_document_chunks_document_id", table_name="document_chunks")
+    op.drop_table("document_chunks")
+    op.drop_table("documents")
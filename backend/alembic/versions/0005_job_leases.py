@@ -0,0 +1,25 @@
+"""Job leases: jobs.claimed_by, jobs.lease_expires_at
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("jobs", sa.Column("claimed_by", sa.String(length=128), nullable=True))
+    op.add_column("jobs", sa.Column("lease_expires_at", sa.Float(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("jobs", "lease_expires_at")
+    op.drop_column("jobs", "claimed_by")
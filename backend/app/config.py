@@ -4,37 +4,242 @@ from typing import Optional
 
 class Settings(BaseSettings):
     """Application settings"""
-    
+
     # API Settings
     app_name: str = "Multimodal AI Chat API"
     app_version: str = "1.0.0"
     debug: bool = False
-    
+
+    # Serving (run.py); with several workers, caches and limits live in a
+    # coordination store in the supervisor process, reached over a Unix socket
+    host: str = "0.0.0.0"
+    port: int = 8000
+    workers: int = 1
+    shared_state_socket: Optional[str] = None  # set by run.py for its workers
+
     # Ollama Settings
     ollama_base_url: str = "http://localhost:11434"
     ollama_timeout: int = 60
-    
+    ollama_base_urls: list[str] = []  # several Ollama nodes; overrides ollama_base_url
+
+    # Multi-node load balancing
+    lb_probe_interval: float = 10.0
+    lb_failure_threshold: int = 3
+
+    # Health snapshot refreshed in the background (endpoints answer from memory)
+    health_probe_interval: float = 5.0
+    health_probe_timeout: float = 2.0  # per dependency probe (database)
+    readiness_queue_threshold: float = 0.9  # not ready once the admission queue is this full
+
+    # Per-node circuit breaker: fail fast with 503 while a node keeps failing
+    circuit_breaker_enabled: bool = True
+    circuit_failure_rate: float = 0.5  # share of errors/timeouts that opens the circuit
+    circuit_min_requests: int = 5  # within the window, before the rate counts
+    circuit_window: float = 30.0
+    circuit_open_duration: float = 15.0  # then half-open: trial requests decide
+    circuit_half_open_requests: int = 1
+
+    # Retries of idempotent Ollama calls (/api/tags, health probes)
+    ollama_retry_attempts: int = 2  # retries after the first attempt
+    ollama_retry_backoff: float = 0.1  # full-jitter exponential backoff base
+    ollama_retry_backoff_max: float = 2.0
+    ollama_retry_budget_ratio: float = 0.2  # retries may add at most this share of calls
+    ollama_retry_budget_min_per_second: float = 1.0
+    ollama_retry_budget_capacity: float = 10.0
+
+    # Hedged streaming: with several nodes, start a second copy of a stream
+    # on another node if no token arrived within this many seconds
+    ollama_hedge_after: Optional[float] = None
+
+    # Ollama HTTP connection pool
+    ollama_max_connections: int = 100
+    ollama_max_keepalive_connections: int = 20
+    ollama_keepalive_expiry: float = 30.0
+    ollama_connect_timeout: float = 5.0
+    ollama_read_timeout: Optional[float] = None  # defaults to ollama_timeout
+    ollama_pool_timeout: float = 10.0
+    ollama_tags_timeout: float = 5.0
+
+    # Model lifecycle: preloading, keep_alive and keep-warm pings
+    preload_models: list[str] = []  # loaded at startup and kept warm
+    ollama_keep_alive: Optional[str] = None  # sent as keep_alive, e.g. "30m"; Ollama default is 5m
+    ollama_keep_alive_overrides: dict[str, str] = {}  # per model; "-1" pins a model in memory
+    keep_warm_interval: float = 60.0
+    keep_warm_window: float = 0.0  # also keep models used within this many seconds warm; 0 = preloaded only
+    ollama_load_timeout: float = 300.0
+
+    # Model catalog cache (/api/tags)
+    catalog_ttl: float = 60.0
+    catalog_refresh_interval: float = 30.0
+
+    # Admission control in front of Ollama
+    max_concurrent_generations: int = 8
+    max_concurrent_per_model: int = 2
+    per_model_concurrency_limits: dict[str, int] = {}
+    max_queued_requests: int = 64
+    queue_timeout: float = 30.0
+
+    # Exact-match response cache (deterministic requests only)
+    response_cache_enabled: bool = False
+    response_cache_backend: str = "memory"  # or "package.module:BackendClass"
+    response_cache_max_entries: int = 1024
+    response_cache_max_bytes: int = 64 * 1024 * 1024
+    response_cache_ttl: Optional[float] = 3600.0
+
+    # Semantic cache: answer paraphrases of earlier prompts (embeddings via Ollama)
+    semantic_cache_enabled: bool = False
+    embedding_model: str = "nomic-embed-text"
+    semantic_cache_threshold: float = 0.92  # minimum cosine similarity for a hit
+    semantic_cache_thresholds: dict[str, float] = {}  # per chat model overrides
+    semantic_cache_max_entries: int = 10000
+    semantic_cache_ann_min_entries: int = 5000  # build an approximate (IVF) index above this; 0 disables
+    semantic_cache_ann_probes: int = 8  # clusters searched per lookup
+    semantic_cache_path: Optional[str] = None  # snapshot file (.npz), loaded at startup
+    semantic_cache_snapshot_interval: float = 300.0
+
+    # Retrieval-augmented generation over ingested documents (metadata in DATABASE_URL)
+    rag_enabled: bool = False
+    rag_index_dir: str = "./rag_index"  # memory-mapped vector file
+    rag_source_dir: Optional[str] = None  # directory ingested by POST /api/v1/documents/sync
+    rag_file_extensions: list[str] = [".txt", ".md", ".markdown", ".rst"]
+    rag_default_collection: str = "default"
+    rag_embedding_model: Optional[str] = None  # defaults to embedding_model
+    rag_chunk_size: int = 1000  # characters
+    rag_chunk_overlap: int = 150
+    rag_embed_batch_size: int = 32  # chunks per /api/embed call
+    rag_embed_concurrency: int = 4  # embedding calls in flight
+    rag_ingest_concurrency: int = 4  # files ingested at once during a sync
+    rag_max_upload_bytes: int = 20 * 1024 * 1024
+    rag_max_upload_files: int = 16
+    rag_prompt_template: str = (
+        "Answer the question using the context below. If the context does not contain "
+        "the answer, say so.\n\nContext:\n{context}\n\nQuestion: {question}"
+    )
+
+    # Batch chat endpoint
+    batch_max_items: int = 1000
+    batch_parallelism: int = 4  # default items in flight per batch
+    batch_max_parallelism: int = 16
+
+    # WebSocket chat (/api/v1/chat/ws)
+    ws_max_streams: int = 8  # concurrent conversations per connection
+    ws_heartbeat_interval: float = 30.0  # ping after this long without sending
+    ws_heartbeat_timeout: float = 10.0  # close if nothing comes back in time
+    ws_idle_timeout: float = 300.0  # close after this long without conversations
+    ws_send_timeout: float = 30.0  # close a client that stops reading
+
+    # Image inputs for vision models (llava, ...)
+    default_vision_model: str = "llava"
+    image_max_upload_bytes: int = 10 * 1024 * 1024  # per file
+    image_max_files: int = 4
+    image_max_pixels: int = 40_000_000
+    image_max_side: int = 1024  # downscale so the longest side fits
+    image_jpeg_quality: int = 85
+    image_workers: Optional[int] = None  # defaults to min(4, CPU count)
+    image_cache_max_entries: int = 256
+    image_cache_max_bytes: int = 128 * 1024 * 1024
+
+    # Asynchronous jobs
+    job_backend: str = "memory"  # "database" (uses DATABASE_URL) or "package.module:BackendClass"
+    job_workers: int = 2
+    job_max_queued: int = 1000
+    job_result_ttl: float = 3600.0
+    job_ollama_timeout: float = 600.0  # upstream read timeout for job generations
+    job_sweep_interval: float = 60.0
+    job_lease_seconds: float = 60.0  # a running job is taken over if its worker stops renewing for this long
+    job_poll_interval: float = 1.0  # how often waiters re-read jobs other processes may be running
+
+    # Share one upstream generation between identical in-flight requests
+    request_coalescing_enabled: bool = True
+    coalescing_stream_window: int = 16  # chunks a shared stream buffers ahead of its slowest reader
+
+    # Conversation sessions
+    session_ttl: float = 3600.0
+    session_max: int = 1000
+    context_window_tokens: int = 4096
+    context_window_overrides: dict[str, int] = {}
+    context_reserve_tokens: int = 512  # left free for the reply
+
+    # Graceful shutdown: max seconds to wait for in-flight chats
+    shutdown_drain_timeout: float = 30.0
+
     # CORS Settings
     allowed_origins: list[str] = ["http://localhost:3000", "http://127.0.0.1:3000"]
-    
+
     # Logging Settings
     log_level: str = "INFO"
-    
-    # Security Settings
+    log_format: str = "json"  # or "console"
+    log_queue_size: int = 10000  # records waiting for the writer thread; more are dropped
+    log_sample_rate: float = 1.0  # share of requests whose INFO/DEBUG lines are kept
+    log_sample_rates: dict[str, float] = {}  # per route template, e.g. {"/api/v1/chat/": 0.1}
+
+    # Prometheus metrics at /metrics
+    metrics_enabled: bool = True
+
+    # Response compression, negotiated via Accept-Encoding (brotli needs the brotli package)
+    compression_enabled: bool = True
+    compression_minimum_size: int = 1024  # bytes; smaller bodies go out as they are
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+
+    # Security Settings: once any key is set, API requests must send one
+    # (X-API-Key or Authorization: Bearer)
     api_key: Optional[str] = None
-    
+    api_keys: list[str] = []  # further accepted keys
+    # Exact paths (a trailing slash is ignored); the backend admin endpoints under /health need a key
+    auth_exempt_paths: list[str] = [
+        "/", "/docs", "/docs/oauth2-redirect", "/redoc", "/openapi.json", "/metrics",
+        "/api/v1/health", "/api/v1/health/live", "/api/v1/health/ready", "/api/v1/health/ping"
+    ]
+
+    # Per API key (client address without auth) and model limits; 0 disables one
+    rate_limit_enabled: bool = False
+    rate_limit_requests_per_minute: int = 60
+    rate_limit_tokens_per_minute: int = 100000  # prompt + generated tokens, charged after each response
+    rate_limit_tokens_per_day: int = 2000000  # UTC day
+    rate_limit_overrides: dict[str, dict[str, int]] = {}  # by API key, e.g. {"<key>": {"tokens_per_day": 0}}
+
+    # Usage metering: requests and tokens per key, model and day in DATABASE_URL
+    usage_tracking_enabled: bool = False
+    usage_flush_interval: float = 60.0  # seconds between database writes
+
     # Fallback/default models
     default_models: list[str] = ["llama3.2", "mistral", "codellama", "llava", "gemma"]
 
     # Database settings
     database_url: str = "postgresql://postgres:P@ssw0rd!@#@localhost/dbname"
+    persistence_enabled: bool = False  # record chat requests and transcripts
+    database_create_tables: bool = False  # create_all at startup (SQLite/local); else use Alembic
+    db_echo: bool = False
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+
+    # Write-behind chat logging
+    write_behind_batch_size: int = 200
+    write_behind_flush_interval: float = 1.0
+    write_behind_queue_size: int = 10000
 
     # Error messages
     error_ollama_api: str = "Error communicating with Ollama API"
     error_ollama_not_running: str = "Ollama not running"
     error_ollama_timeout: str = "Ollama request timeout"
+    error_ollama_unavailable: str = "Ollama is failing, temporarily refusing requests. Please retry later."
     error_empty_response: str = "I apologize, but I couldn't generate a response. Please try again."
     error_internal: str = "Internal server error"
+    error_unauthorized: str = "Missing or invalid API key"
+    error_rate_limited: str = "Rate limit exceeded for this API key and model. Please retry later."
+    error_token_quota: str = "Daily token budget exhausted for this API key and model."
+    error_queue_full: str = "Server is busy, too many queued requests. Please retry later."
+    error_queue_timeout: str = "Timed out waiting for a free model slot. Please retry later."
+    error_job_queue_full: str = "Too many queued jobs. Please retry later."
+    error_job_deadline: str = "Job deadline exceeded"
+    error_job_not_saved: str = "The job's state could not be saved"
+    error_session_not_found: str = "Session not found"
+    error_image_not_found: str = "Unknown or expired image, upload it again"
+    error_retrieval_disabled: str = "Document retrieval is not enabled"
+    error_embedding: str = "Error computing embeddings with Ollama"
 
     class Config:
         env_file = ".env"
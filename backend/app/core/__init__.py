@@ -5,7 +5,12 @@ from .exceptions import (
     ChatProcessingError,
     create_http_exception
 )
-from .logging import setup_logging, get_logger
+from .logging import setup_logging, shutdown_logging, get_logger, RequestContextMiddleware
+from .http import create_http_client
+from .auth import ApiKeyMiddleware, api_key_id, set_rate_limit_headers
+from .compression import CompressionMiddleware
+from .responses import EncodedPayload, FastJSONResponse, dumps
+from .metrics import MetricsMiddleware, metrics_response
 
 __all__ = [
     "ChatException",
@@ -14,5 +19,17 @@ __all__ = [
     "ChatProcessingError",
     "create_http_exception",
     "setup_logging",
-    "get_logger"
+    "shutdown_logging",
+    "get_logger",
+    "RequestContextMiddleware",
+    "create_http_client",
+    "ApiKeyMiddleware",
+    "api_key_id",
+    "set_rate_limit_headers",
+    "CompressionMiddleware",
+    "EncodedPayload",
+    "FastJSONResponse",
+    "dumps",
+    "MetricsMiddleware",
+    "metrics_response"
 ]
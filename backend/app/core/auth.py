@@ -0,0 +1,129 @@
+import contextvars
+import hashlib
+from typing import Dict, Iterable, Optional
+from urllib.parse import parse_qs
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..config import settings
+from . import metrics
+
+# Headers for the current request's response, set by the rate limiter
+_rate_limit_headers: contextvars.ContextVar[Optional[Dict[str, str]]] = contextvars.ContextVar(
+    "rate_limit_headers", default=None
+)
+
+RATE_LIMIT_HEADERS = [
+    "RateLimit-Limit",
+    "RateLimit-Remaining",
+    "RateLimit-Reset",
+    "X-RateLimit-Limit-Tokens",
+    "X-RateLimit-Remaining-Tokens",
+    "X-RateLimit-Reset-Tokens",
+    "Retry-After"
+]
+
+
+def api_key_id(key: str) -> str:
+    """Stable, non-secret identifier of an API key for logs, limits and usage records"""
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def set_rate_limit_headers(headers: Dict[str, str]) -> None:
+    """Attach rate-limit headers to the response of the current request (if any)"""
+    pending = _rate_limit_headers.get()
+    if pending is not None:
+        pending.update(headers)
+
+
+class ApiKeyMiddleware:
+    """ASGI middleware enforcing API keys and adding rate-limit headers
+
+    Once any key is configured (``api_key``, ``api_keys``), requests outside
+    ``auth_exempt_paths`` (exact paths) must send one in ``X-API-Key`` or as
+    ``Authorization: Bearer <key>``; others get 401. Browsers can't set
+    headers on WebSockets, so those may pass ``?api_key=`` instead and are
+    closed with 1008 without a valid key. The caller is identified as
+    ``key:<id>`` in the request state, a hash prefix, so keys never reach
+    logs or the database.
+    Rate-limit headers set while the request is handled are added to its
+    response.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        keys: Optional[Iterable[str]] = None,
+        exempt_paths: Optional[Iterable[str]] = None
+    ):
+        self.app = app
+        keys = keys if keys is not None else [settings.api_key, *settings.api_keys]
+        self.digests = {hashlib.sha256(key.encode()).hexdigest() for key in keys if key}
+        exempt_paths = exempt_paths if exempt_paths is not None else settings.auth_exempt_paths
+        self.exempt_paths = {self._normalize(path) for path in exempt_paths}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        if self.digests and not self._exempt(scope["path"]):
+            digest = self._presented_digest(scope)
+            if digest not in self.digests:
+                metrics.AUTH_FAILURES.inc()
+                await self._reject(scope, receive, send)
+                return
+            scope.setdefault("state", {})["client_id"] = f"key:{digest[:16]}"
+
+        headers: Dict[str, str] = {}
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and headers:
+                message["headers"] = [
+                    *message.get("headers", []),
+                    *((name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers.items())
+                ]
+            await send(message)
+
+        token = _rate_limit_headers.set(headers)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _rate_limit_headers.reset(token)
+
+    def _exempt(self, path: str) -> bool:
+        # Exact matches only: a prefix would also open whatever is mounted below
+        return self._normalize(path) in self.exempt_paths
+
+    @staticmethod
+    def _normalize(path: str) -> str:
+        return path.rstrip("/") or "/"
+
+    @staticmethod
+    def _presented_digest(scope: Scope) -> Optional[str]:
+        for name, value in scope["headers"]:
+            if name == b"x-api-key":
+                key = value
+            elif name == b"authorization" and value[:7].lower() == b"bearer ":
+                key = value[7:].strip()
+            else:
+                continue
+            return hashlib.sha256(key).hexdigest()
+        if scope["type"] == "websocket":
+            key = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("api_key")
+            if key:
+                return hashlib.sha256(key[0].encode()).hexdigest()
+        return None
+
+    @staticmethod
+    async def _reject(scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "websocket":
+            await send({"type": "websocket.close", "code": 1008})
+            return
+        response = JSONResponse(
+            {"detail": settings.error_unauthorized},
+            status_code=401,
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+        await response(scope, receive, send)
@@ -0,0 +1,112 @@
+import gzip
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..config import settings
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only without it
+    brotli = None
+
+_COMPRESSIBLE = ("application/json", "text/", "application/javascript", "application/xml")
+
+
+def _accepted(accept_encoding: str) -> dict:
+    """Content codings from an Accept-Encoding header with their q-values"""
+    codings = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            codings[coding.strip().lower()] = quality
+    return codings
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses with brotli or gzip
+
+    The coding is negotiated from ``Accept-Encoding``: brotli when the
+    client takes it and the ``brotli`` package is installed, else gzip.
+    Only responses sent as a single body message are compressed, with a
+    compressible content type and at least ``minimum_size`` bytes. Streams
+    (SSE, NDJSON) arrive in many messages and pass through as they are,
+    so tokens aren't held back in a compressor's buffer.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: Optional[int] = None,
+        gzip_level: Optional[int] = None,
+        brotli_quality: Optional[int] = None
+    ):
+        self.app = app
+        self.minimum_size = minimum_size if minimum_size is not None else settings.compression_minimum_size
+        self.gzip_level = gzip_level if gzip_level is not None else settings.compression_gzip_level
+        self.brotli_quality = brotli_quality if brotli_quality is not None else settings.compression_brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        coding = self._negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                # Held until the first body message shows whether to compress
+                start = message
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+
+            response_start, start = start, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=response_start["headers"])
+            if (
+                message.get("more_body", False)
+                or len(body) < self.minimum_size
+                or "content-encoding" in headers
+                or not headers.get("content-type", "").startswith(_COMPRESSIBLE)
+            ):
+                await send(response_start)
+                await send(message)
+                return
+
+            compressed = self._compress(coding, body)
+            headers["Content-Encoding"] = coding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await send(response_start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    def _negotiate(accept_encoding: str) -> Optional[str]:
+        codings = _accepted(accept_encoding)
+        if brotli is not None and codings.get("br", 0) > 0:
+            return "br"
+        if codings.get("gzip", codings.get("*", 0)) > 0:
+            return "gzip"
+        return None
+
+    def _compress(self, coding: str, body: bytes) -> bytes:
+        if coding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
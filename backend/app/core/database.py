@@ -0,0 +1,51 @@
+from typing import Optional
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+
+from ..config import settings
+
+_ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+pg8000": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    """Map a sync database URL onto its async driver (asyncpg / aiosqlite)"""
+    parsed = make_url(url)
+    driver = _ASYNC_DRIVERS.get(parsed.drivername)
+    if driver:
+        parsed = parsed.set(drivername=driver)
+    return parsed.render_as_string(hide_password=False)
+
+
+def create_engine(url: Optional[str] = None) -> AsyncEngine:
+    """Create the async engine with a pool sized from settings"""
+    async_url = to_async_url(url or settings.database_url)
+    if async_url.startswith("sqlite"):
+        # SQLite (local/tests) serializes writers anyway; keep its default pool
+        return create_async_engine(async_url, echo=settings.db_echo)
+    return create_async_engine(
+        async_url,
+        echo=settings.db_echo,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=True,
+    )
+
+
+def create_session_factory(engine: AsyncEngine) -> async_sessionmaker:
+    """Session factory for request-scoped ORM work"""
+    return async_sessionmaker(engine, expire_on_commit=False)
+
+
+async def create_tables(engine: AsyncEngine) -> None:
+    """Create all tables (SQLite/local use; production uses Alembic)"""
+    from ..models.db import Base
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
@@ -0,0 +1,24 @@
+import httpx
+
+from ..config import settings
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Create the shared async HTTP client used for upstream calls.
+
+    The client owns a bounded keep-alive connection pool and is meant to be
+    created once per process (in the app lifespan) and closed at shutdown.
+    """
+    read_timeout = settings.ollama_read_timeout or float(settings.ollama_timeout)
+    timeout = httpx.Timeout(
+        connect=settings.ollama_connect_timeout,
+        read=read_timeout,
+        write=read_timeout,
+        pool=settings.ollama_pool_timeout,
+    )
+    limits = httpx.Limits(
+        max_connections=settings.ollama_max_connections,
+        max_keepalive_connections=settings.ollama_max_keepalive_connections,
+        keepalive_expiry=settings.ollama_keepalive_expiry,
+    )
+    return httpx.AsyncClient(timeout=timeout, limits=limits)
@@ -1,13 +1,104 @@
+import atexit
+import contextvars
 import logging
+import logging.handlers
+import queue
+import random
 import sys
-from typing import Optional
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+import structlog
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from ..config import settings
+from . import metrics
+
+# Per-request state for log sampling; None outside requests
+_request_state: contextvars.ContextVar[Optional["_RequestLogState"]] = contextvars.ContextVar(
+    "request_log_state", default=None
+)
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class _RequestLogState:
+    """Sampling decision for one request, made on its first INFO/DEBUG line
+
+    Deciding lazily means the matched route template is known by then, so
+    rates can be configured per route (``/api/v1/sessions/{session_id}``).
+    Every line of a sampled request is kept, so its trail stays complete.
+    """
+
+    __slots__ = ("scope", "_sampled")
+
+    def __init__(self, scope: Scope):
+        self.scope = scope
+        self._sampled: Optional[bool] = None
+
+    @property
+    def sampled(self) -> bool:
+        if self._sampled is None:
+            route = getattr(self.scope.get("route"), "path", None) or self.scope["path"]
+            rate = settings.log_sample_rates.get(route, settings.log_sample_rate)
+            self._sampled = rate >= 1 or random.random() < rate
+        return self._sampled
+
+
+class _SamplingFilter(logging.Filter):
+    """Drop INFO/DEBUG lines of unsampled requests; warnings and errors always pass"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+        state = _request_state.get()
+        if state is None or state.sampled:
+            return True
+        metrics.LOG_RECORDS_DROPPED.labels(reason="sampled").inc()
+        return False
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hand records to the writer thread without formatting or blocking
+
+    The stock QueueHandler formats the message in the calling thread;
+    here only the request context is captured (it lives in contextvars,
+    which the writer thread can't see). ``msg % args`` and the JSON
+    rendering happen in the writer. When the queue is full the record
+    is dropped and counted instead of stalling the event loop.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.context = structlog.contextvars.get_contextvars()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.LOG_RECORDS_DROPPED.labels(reason="queue_full").inc()
+
+
+def _add_record_fields(logger: Any, method_name: str, event_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """Level, logger, creation time and captured request context, from the LogRecord"""
+    record: logging.LogRecord = event_dict["_record"]
+    for key, value in getattr(record, "context", {}).items():
+        event_dict.setdefault(key, value)
+    event_dict.setdefault("level", record.levelname.lower())
+    event_dict["logger"] = record.name
+    event_dict["timestamp"] = datetime.fromtimestamp(record.created, timezone.utc).isoformat()
+    return event_dict
 
 
 def setup_logging(log_level: Optional[str] = None) -> None:
-    """Setup application logging configuration"""
-    
+    """Setup application logging configuration
+
+    All records (stdlib ``logging`` and ``structlog``) go through a bounded
+    queue to a background thread, which formats them as JSON (or
+    human-readable with ``log_format="console"``) and writes to stdout.
+    """
+    global _listener
+
     level = log_level or settings.log_level
     log_level_map = {
         "DEBUG": logging.DEBUG,
@@ -16,20 +107,107 @@ def setup_logging(log_level: Optional[str] = None) -> None:
         "ERROR": logging.ERROR,
         "CRITICAL": logging.CRITICAL,
     }
-    
-    logging.basicConfig(
-        level=log_level_map.get(level.upper(), logging.INFO),
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        handlers=[
-            logging.StreamHandler(sys.stdout),
-        ]
+
+    renderer = (
+        structlog.dev.ConsoleRenderer(colors=False) if settings.log_format == "console"
+        else structlog.processors.JSONRenderer()
+    )
+    formatter = structlog.stdlib.ProcessorFormatter(
+        processors=[
+            _add_record_fields,
+            structlog.stdlib.PositionalArgumentsFormatter(),
+            structlog.processors.format_exc_info,
+            structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+            renderer,
+        ],
+    )
+    structlog.configure(
+        processors=[
+            structlog.contextvars.merge_contextvars,
+            structlog.stdlib.filter_by_level,
+            structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
+        ],
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        wrapper_class=structlog.stdlib.BoundLogger,
+        cache_logger_on_first_use=True,
     )
-    
-    # Set specific loggers
+
+    writer = logging.StreamHandler(sys.stdout)
+    writer.setFormatter(formatter)
+    records: queue.Queue = queue.Queue(maxsize=settings.log_queue_size)
+    handler = _NonBlockingQueueHandler(records)
+    handler.addFilter(_SamplingFilter())
+
+    if _listener is not None:
+        _listener.stop()
+    _listener = logging.handlers.QueueListener(records, writer, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(log_level_map.get(level.upper(), logging.INFO))
+
+    # Set specific loggers; uvicorn's own handlers would write synchronously
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        logging.getLogger(name).handlers = []
+        logging.getLogger(name).propagate = True
     logging.getLogger("uvicorn").setLevel(logging.INFO)
     logging.getLogger("fastapi").setLevel(logging.INFO)
 
 
-def get_logger(name: str) -> logging.Logger:
-    """Get a logger instance"""
-    return logging.getLogger(name)
+def shutdown_logging() -> None:
+    """Write out everything still queued and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
+
+
+def get_logger(name: str) -> structlog.stdlib.BoundLogger:
+    """Get a structured logger instance"""
+    return structlog.stdlib.get_logger(name)
+
+
+class RequestContextMiddleware:
+    """ASGI middleware giving every request a correlation ID for its logs
+
+    Uses the caller's ``X-Request-ID`` when present, otherwise generates
+    one, binds it (with method and path) into the structlog contextvars
+    so every log line of the request carries it, and echoes it in the
+    response headers.
+    """
+
+    def __init__(self, app: ASGIApp, header: str = "x-request-id"):
+        self.app = app
+        self.header = header.encode("latin-1")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == self.header and 0 < len(value) <= 128:
+                request_id = value.decode("latin-1")
+                break
+        request_id = request_id or uuid.uuid4().hex
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = [*message["headers"], (self.header, request_id.encode("latin-1"))]
+            await send(message)
+
+        tokens = structlog.contextvars.bind_contextvars(
+            request_id=request_id, method=scope.get("method", "WS"), path=scope["path"]
+        )
+        state_token = _request_state.set(_RequestLogState(scope))
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_state.reset(state_token)
+            structlog.contextvars.reset_contextvars(**tokens)
@@ -0,0 +1,186 @@
+import time
+from typing import Any, Callable, Dict, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Buckets sized for LLM work: milliseconds (cache hits) up to minutes (cold loads)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKENS_PER_SECOND_BUCKETS = (1, 2.5, 5, 10, 15, 20, 30, 40, 50, 75, 100, 150, 200, 400)
+
+# HTTP layer (per route template, not raw path, to bound label cardinality)
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests", ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency until the response is fully sent",
+    ["method", "route"], buckets=LATENCY_BUCKETS
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served"
+)
+
+# Chat pipeline (per model)
+CHAT_REQUESTS = Counter(
+    "chat_requests_total", "Chat requests", ["model", "endpoint", "status"]
+)
+CHAT_REQUEST_DURATION = Histogram(
+    "chat_request_duration_seconds", "End-to-end chat latency", ["model", "endpoint"], buckets=LATENCY_BUCKETS
+)
+GENERATION_STAGE_DURATION = Histogram(
+    "chat_stage_duration_seconds",
+    "Time spent per pipeline stage: queue_wait, model_validation, upstream_connect, "
+    "load, prompt_eval, eval, serialization, embedding, retrieval",
+    ["model", "stage"], buckets=STAGE_BUCKETS
+)
+TIME_TO_FIRST_TOKEN = Histogram(
+    "chat_time_to_first_token_seconds", "Streaming time to first token", ["model"], buckets=LATENCY_BUCKETS
+)
+TOKENS_PER_SECOND = Histogram(
+    "chat_tokens_per_second", "Generation speed reported by Ollama (eval_count / eval_duration)",
+    ["model"], buckets=TOKENS_PER_SECOND_BUCKETS
+)
+TOKENS = Counter(
+    "chat_tokens_total", "Tokens processed by Ollama", ["model", "kind"]
+)
+GENERATIONS_IN_FLIGHT = Gauge(
+    "ollama_generations_in_flight", "Upstream generations currently running", ["model"]
+)
+UPSTREAM_ERRORS = Counter(
+    "ollama_upstream_errors_total", "Failed upstream Ollama calls by failure type", ["operation", "kind"]
+)
+SEMANTIC_CACHE_LOOKUPS = Counter(
+    "semantic_cache_lookups_total", "Semantic cache lookups by result: hit, miss or error", ["model", "result"]
+)
+SEMANTIC_CACHE_SIMILARITY = Histogram(
+    "semantic_cache_best_similarity", "Cosine similarity of the nearest cached prompt",
+    ["model"], buckets=(0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.92, 0.94, 0.96, 0.98, 0.99, 1.0)
+)
+SEMANTIC_CACHE_ENTRIES = Gauge(
+    "semantic_cache_entries", "Prompts held by the semantic cache"
+)
+CIRCUIT_STATE = Gauge(
+    "ollama_circuit_state", "Circuit breaker state per node: 0 closed, 1 half-open, 2 open", ["backend"]
+)
+CIRCUIT_REJECTIONS = Counter(
+    "ollama_circuit_rejections_total", "Requests refused because every node's circuit was open"
+)
+UPSTREAM_RETRIES = Counter(
+    "ollama_retries_total", "Retries of idempotent Ollama calls by outcome: retried or budget_exhausted",
+    ["operation", "outcome"]
+)
+HEDGED_REQUESTS = Counter(
+    "ollama_hedged_requests_total", "Streams hedged onto a second node, by which copy won", ["model", "winner"]
+)
+MODEL_WARMUPS = Counter(
+    "ollama_model_warmups_total", "Model loads requested ahead of traffic", ["model", "reason", "status"]
+)
+AUTH_FAILURES = Counter(
+    "auth_failures_total", "Requests rejected for a missing or invalid API key"
+)
+RATE_LIMITED = Counter(
+    "rate_limited_requests_total", "Requests refused by per-key rate limits", ["limit"]
+)
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total", "Log records not written: sampled out or queue full", ["reason"]
+)
+WEBSOCKET_CONNECTIONS = Gauge(
+    "websocket_connections", "Open chat WebSocket connections"
+)
+WEBSOCKET_STREAMS = Gauge(
+    "websocket_streams", "Conversations streaming over chat WebSockets"
+)
+WEBSOCKET_CLOSES = Counter(
+    "websocket_closes_total", "Chat WebSockets closed, by reason", ["reason"]
+)
+ADMISSION_QUEUED = Gauge(
+    "admission_queued_requests", "Requests waiting for a generation slot"
+)
+ADMISSION_ACTIVE = Gauge(
+    "admission_active_generations", "Generation slots currently held"
+)
+
+_NS = 1e-9
+
+
+def observe_stage(model: str, stage: str, seconds: float) -> None:
+    """Record time spent in one pipeline stage"""
+    GENERATION_STAGE_DURATION.labels(model=model, stage=stage).observe(seconds)
+
+
+def observe_generation(model: str, stats: Dict[str, Any]) -> None:
+    """Record Ollama's own timing counters from a final response/chunk
+
+    Ollama reports durations in nanoseconds; ``load_duration`` is non-zero
+    only when the model had to be loaded for this request.
+    """
+    for stage, field in (("load", "load_duration"), ("prompt_eval", "prompt_eval_duration"), ("eval", "eval_duration")):
+        if stats.get(field):
+            observe_stage(model, stage, stats[field] * _NS)
+    if stats.get("prompt_eval_count"):
+        TOKENS.labels(model=model, kind="prompt").inc(stats["prompt_eval_count"])
+    if stats.get("eval_count"):
+        TOKENS.labels(model=model, kind="completion").inc(stats["eval_count"])
+        if stats.get("eval_duration"):
+            TOKENS_PER_SECOND.labels(model=model).observe(stats["eval_count"] / (stats["eval_duration"] * _NS))
+
+
+def connect_tracer(model: str) -> Callable:
+    """httpx ``trace`` extension that times pool acquisition + connect + TLS
+
+    Measured from the request being handed to the transport until its
+    headers start going out, so a reused keep-alive connection shows up as
+    (near) zero and pool exhaustion or slow connects stand out.
+    """
+    started = time.perf_counter()
+
+    async def trace(event_name: str, info: Dict[str, Any]) -> None:
+        if event_name in ("http11.send_request_headers.started", "http2.send_request_headers.started"):
+            observe_stage(model, "upstream_connect", time.perf_counter() - started)
+
+    return trace
+
+
+def metrics_response() -> Response:
+    """Render all metrics in the Prometheus text format"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request rate, latency and in-flight requests
+
+    Latency runs until the last body chunk is sent, so streaming responses
+    are measured in full. Requests are labelled with the matched route
+    template (``/api/v1/sessions/{session_id}``) rather than the raw path.
+    """
+
+    def __init__(self, app: ASGIApp, exclude_paths: Optional[set] = None):
+        self.app = app
+        self.exclude_paths = exclude_paths or {"/metrics"}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUESTS.labels(method=method, route=route_path, status=str(status)).inc()
+            HTTP_REQUEST_DURATION.labels(method=method, route=route_path).observe(time.perf_counter() - started)
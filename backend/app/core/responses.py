@@ -0,0 +1,70 @@
+from typing import Any, Callable, Dict, Optional
+
+import orjson
+from pydantic import BaseModel
+from starlette.responses import JSONResponse, Response
+
+_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+_UNSET = object()
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode to compact UTF-8 JSON with orjson (datetimes, numpy arrays and models included)"""
+    return orjson.dumps(content, default=_default, option=_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson
+
+    The app's default response class. Endpoints on hot paths return one
+    directly, which also skips FastAPI's ``jsonable_encoder`` pass and
+    response-model validation of data that is already well-formed.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class EncodedPayload:
+    """A JSON body kept encoded until the data it is built from changes
+
+    ``get(source, build)`` calls ``build`` and encodes its result only when
+    ``source`` is neither the object seen last time nor equal to it, so an
+    endpoint serving a slowly changing snapshot (health, model lists)
+    serializes it once per change instead of once per request. The last
+    source is held, so identity checks can't be fooled by a reused ``id``.
+    """
+
+    __slots__ = ("_source", "_body")
+
+    def __init__(self):
+        self._source: Any = _UNSET
+        self._body = b""
+
+    def get(self, source: Any, build: Callable[[], Any]) -> bytes:
+        if source is not self._source and source != self._source:
+            self._body = dumps(build())
+            self._source = source
+        return self._body
+
+    def response(
+        self,
+        source: Any,
+        build: Callable[[], Any],
+        status_code: int = 200,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Response:
+        return Response(
+            self.get(source, build),
+            status_code=status_code,
+            headers=headers,
+            media_type="application/json"
+        )
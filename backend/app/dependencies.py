@@ -1,9 +1,33 @@
 from functools import lru_cache
-from fastapi import Depends
+from typing import Optional
+from fastapi import FastAPI, Request
+from starlette.requests import HTTPConnection
 
 from .config import settings
 from .services.ollama_service import OllamaService
 from .services.chat_service import ChatService
+from .services.model_catalog import ModelCatalog
+from .services.admission import AdmissionController
+from .services.response_cache import ResponseCache, create_cache_backend
+from .services.coalescer import RequestCoalescer
+from .services.session_service import SessionStore
+from .services.chat_recorder import ChatRecorder
+from .services.job_queue import JobQueue, create_job_backend
+from .services.image_service import ImageService
+from .services.semantic_cache import SemanticCache
+from .services.rag_service import RagService
+from .services.health_monitor import HealthMonitor
+from .services.rate_limiter import RateLimiter
+from .services.usage_meter import UsageMeter
+from .services.shared_state import (
+    SharedAdmissionController,
+    SharedCacheBackend,
+    SharedRateLimiter,
+    SharedSessionStore,
+    SharedStateClient
+)
+from .core.database import create_engine, create_tables
+from .core import metrics
 
 
 @lru_cache()
@@ -12,15 +36,230 @@ def get_settings():
     return settings
 
 
-def get_ollama_service() -> OllamaService:
-    """Get Ollama service instance"""
-    return OllamaService(
-        base_url=settings.ollama_base_url
+async def _start_admission(app: FastAPI, shared_state: Optional[SharedStateClient]) -> None:
+    if shared_state is not None:
+        app.state.admission = SharedAdmissionController(shared_state)
+        await app.state.admission.start()
+    else:
+        app.state.admission = AdmissionController()
+    metrics.ADMISSION_QUEUED.set_function(lambda: app.state.admission.queued)
+    metrics.ADMISSION_ACTIVE.set_function(lambda: app.state.admission.active)
+
+
+async def _start_caches(app: FastAPI, ollama_service: OllamaService, shared_state: Optional[SharedStateClient]) -> None:
+    app.state.response_cache = None
+    if settings.response_cache_enabled:
+        if shared_state is not None and settings.response_cache_backend == "memory":
+            app.state.response_cache = ResponseCache(SharedCacheBackend(shared_state))
+        else:
+            app.state.response_cache = ResponseCache(create_cache_backend())
+    app.state.semantic_cache = None
+    if settings.semantic_cache_enabled:
+        app.state.semantic_cache = SemanticCache(ollama_service)
+        await app.state.semantic_cache.start()
+        metrics.SEMANTIC_CACHE_ENTRIES.set_function(lambda: len(app.state.semantic_cache))
+
+
+async def _start_database_services(app: FastAPI, ollama_service: OllamaService) -> None:
+    """The database engine, if anything needs it, and the services writing to it"""
+    app.state.db_engine = None
+    app.state.chat_recorder = None
+    app.state.usage_meter = None
+    app.state.rag_service = None
+    if not (
+        settings.persistence_enabled
+        or settings.job_backend == "database"
+        or settings.rag_enabled
+        or settings.usage_tracking_enabled
+    ):
+        return
+    app.state.db_engine = create_engine()
+    if settings.database_create_tables:
+        await create_tables(app.state.db_engine)
+    if settings.persistence_enabled:
+        app.state.chat_recorder = ChatRecorder(app.state.db_engine)
+        await app.state.chat_recorder.start()
+    if settings.usage_tracking_enabled:
+        app.state.usage_meter = UsageMeter(app.state.db_engine)
+        await app.state.usage_meter.start()
+    if settings.rag_enabled:
+        app.state.rag_service = RagService(ollama_service, app.state.db_engine)
+        await app.state.rag_service.start()
+
+
+async def startup_services(app: FastAPI) -> None:
+    """Create the application-scoped services and warm them up
+
+    An ``OllamaService`` already set on ``app.state.ollama_service`` is reused,
+    so tests can seed one built on a fake httpx transport before startup.
+    """
+    ollama_service: Optional[OllamaService] = getattr(app.state, "ollama_service", None)
+    if ollama_service is None:
+        ollama_service = OllamaService()
+    await ollama_service.start()
+
+    # Multi-worker mode: state that must be global lives in the supervisor
+    shared_state = None
+    if settings.shared_state_socket:
+        shared_state = SharedStateClient(settings.shared_state_socket)
+        await shared_state.connect()
+    app.state.shared_state = shared_state
+
+    model_catalog = ModelCatalog(ollama_service, store=shared_state)
+    await model_catalog.start()
+
+    app.state.ollama_service = ollama_service
+    app.state.model_catalog = model_catalog
+    await _start_admission(app, shared_state)
+    await _start_caches(app, ollama_service, shared_state)
+    app.state.rate_limiter = None
+    if settings.rate_limit_enabled:
+        app.state.rate_limiter = SharedRateLimiter(shared_state) if shared_state is not None else RateLimiter()
+    app.state.coalescer = RequestCoalescer() if settings.request_coalescing_enabled else None
+    if shared_state is not None:
+        app.state.session_store = SharedSessionStore(shared_state)
+        app.state.image_service = ImageService(cache=SharedCacheBackend(shared_state, prefix="image", images=True))
+    else:
+        app.state.session_store = SessionStore()
+        app.state.image_service = ImageService()
+    await _start_database_services(app, ollama_service)
+    app.state.chat_service = ChatService(
+        ollama_service=ollama_service,
+        model_catalog=model_catalog,
+        admission=app.state.admission,
+        response_cache=app.state.response_cache,
+        coalescer=app.state.coalescer,
+        session_store=app.state.session_store,
+        recorder=app.state.chat_recorder,
+        image_service=app.state.image_service,
+        semantic_cache=app.state.semantic_cache,
+        rag_service=app.state.rag_service,
+        rate_limiter=app.state.rate_limiter,
+        usage_meter=app.state.usage_meter
+    )
+    app.state.job_queue = JobQueue(
+        app.state.chat_service,
+        backend=create_job_backend(engine=app.state.db_engine)
+    )
+    await app.state.job_queue.start()
+    app.state.health_monitor = HealthMonitor(
+        ollama_service,
+        model_catalog,
+        app.state.admission,
+        engine=app.state.db_engine
     )
+    await app.state.health_monitor.start()
+
+
+async def shutdown_services(app: FastAPI) -> None:
+    """Drain in-flight requests, stop background tasks and close pools"""
+    # Readiness fails from here on, so load balancers stop sending traffic
+    await app.state.health_monitor.stop()
+    await app.state.job_queue.stop(timeout=settings.shutdown_drain_timeout)
+    await app.state.chat_service.drain(timeout=settings.shutdown_drain_timeout)
+    await app.state.model_catalog.stop()
+    app.state.image_service.close()
+    if app.state.chat_recorder is not None:
+        # Flush queued audit records before the pool goes away
+        await app.state.chat_recorder.stop()
+    if app.state.usage_meter is not None:
+        await app.state.usage_meter.stop()
+    if app.state.db_engine is not None:
+        await app.state.db_engine.dispose()
+    if app.state.response_cache is not None:
+        await app.state.response_cache.close()
+    if app.state.semantic_cache is not None:
+        await app.state.semantic_cache.stop()
+    if isinstance(app.state.admission, SharedAdmissionController):
+        await app.state.admission.stop()
+    if app.state.shared_state is not None:
+        await app.state.shared_state.close()
+    await app.state.ollama_service.close()
+
+
+def get_ollama_service(request: Request) -> OllamaService:
+    """Get the shared Ollama service instance"""
+    return request.app.state.ollama_service
+
+
+def get_model_catalog(request: Request) -> ModelCatalog:
+    """Get the shared model catalog"""
+    return request.app.state.model_catalog
+
+
+def get_admission_controller(request: Request) -> AdmissionController:
+    """Get the shared admission controller"""
+    return request.app.state.admission
+
+
+def get_response_cache(request: Request) -> Optional[ResponseCache]:
+    """Get the shared response cache (None when disabled)"""
+    return request.app.state.response_cache
+
+
+def get_semantic_cache(request: Request) -> Optional[SemanticCache]:
+    """Get the shared semantic cache (None when disabled)"""
+    return request.app.state.semantic_cache
+
+
+def get_coalescer(request: Request) -> Optional[RequestCoalescer]:
+    """Get the shared request coalescer (None when disabled)"""
+    return request.app.state.coalescer
+
+
+def get_session_store(request: Request) -> SessionStore:
+    """Get the shared conversation session store"""
+    return request.app.state.session_store
+
+
+def get_chat_recorder(request: Request) -> Optional[ChatRecorder]:
+    """Get the write-behind chat recorder (None when persistence is disabled)"""
+    return request.app.state.chat_recorder
+
+
+def get_image_service(request: Request) -> ImageService:
+    """Get the shared image processing service"""
+    return request.app.state.image_service
+
+
+def get_rag_service(request: Request) -> Optional[RagService]:
+    """Get the document retrieval service (None when RAG is disabled)"""
+    return request.app.state.rag_service
+
+
+def get_health_monitor(request: Request) -> HealthMonitor:
+    """Get the background health monitor"""
+    return request.app.state.health_monitor
+
+
+def get_job_queue(request: Request) -> JobQueue:
+    """Get the shared asynchronous job queue"""
+    return request.app.state.job_queue
+
+
+def get_rate_limiter(request: Request) -> Optional[RateLimiter]:
+    """Get the per-key rate limiter (None when rate limiting is disabled)"""
+    return request.app.state.rate_limiter
+
+
+def get_usage_meter(request: Request) -> Optional[UsageMeter]:
+    """Get the usage meter (None when usage tracking is disabled)"""
+    return request.app.state.usage_meter
+
+
+def get_chat_service(request: HTTPConnection) -> ChatService:
+    """Get the shared chat service instance"""
+    return request.app.state.chat_service
+
 
+def get_client_id(request: HTTPConnection) -> str:
+    """Identify the caller for fair queueing, rate limits and usage (API key ID, else client address)
 
-def get_chat_service(
-    ollama_service: OllamaService = Depends(get_ollama_service)
-) -> ChatService:
-    """Get chat service instance with dependencies"""
-    return ChatService(ollama_service=ollama_service)
+    Only a key verified by ``ApiKeyMiddleware`` counts: with auth disabled an
+    unchecked key header would let a client pick a new identity per request
+    and escape its limits.
+    """
+    client_id = getattr(request.state, "client_id", None)
+    if client_id:
+        return client_id
+    return f"ip:{request.client.host}" if request.client else "anonymous"
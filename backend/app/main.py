@@ -1,23 +1,48 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 
 from .config import settings
-from .core.logging import setup_logging
-from .routers import chat, health, models
+from .core.auth import RATE_LIMIT_HEADERS, ApiKeyMiddleware
+from .core.compression import CompressionMiddleware
+from .core.logging import RequestContextMiddleware, setup_logging
+from .core.metrics import MetricsMiddleware, metrics_response
+from .core.responses import EncodedPayload, FastJSONResponse
+from .dependencies import startup_services, shutdown_services
+from .routers import chat, documents, health, jobs, models, sessions
 
 # Setup logging
 setup_logging()
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application lifespan: owns the long-lived services and their pools"""
+    logger.info("Starting %s v%s", settings.app_name, settings.app_version)
+    logger.info("Ollama URL(s): %s", settings.ollama_base_urls or settings.ollama_base_url)
+    await startup_services(app)
+    try:
+        yield
+    finally:
+        logger.info("Shutting down %s", settings.app_name)
+        await shutdown_services(app)
+
+
 # Create FastAPI application
 app = FastAPI(
     title=settings.app_name,
     version=settings.app_version,
     description="A multimodal AI chat API using local Ollama models",
-    debug=settings.debug
+    debug=settings.debug,
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
+# API keys and rate-limit headers; inside CORS, so preflights pass and 401s carry CORS headers
+app.add_middleware(ApiKeyMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -25,46 +50,48 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", *RATE_LIMIT_HEADERS],
 )
 
+if settings.compression_enabled:
+    app.add_middleware(CompressionMiddleware)
+
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
+# Outermost, so every log line of a request carries its ID
+app.add_middleware(RequestContextMiddleware)
+
 # Include routers
 app.include_router(health.router, prefix="/api/v1")
 app.include_router(chat.router, prefix="/api/v1")
 app.include_router(models.router, prefix="/api/v1")
+app.include_router(sessions.router, prefix="/api/v1")
+app.include_router(jobs.router, prefix="/api/v1")
+app.include_router(documents.router, prefix="/api/v1")
+
+_root_payload = EncodedPayload()
+
 
 # Root endpoint
 @app.get("/")
 async def root():
     """Root endpoint with API information"""
-    return {
+    return _root_payload.response((settings.app_name, settings.app_version), lambda: {
         "message": f"{settings.app_name} is running!",
         "version": settings.app_version,
         "docs": "/docs",
         "health": "/api/v1/health"
-    }
-
-
-# Startup event
-@app.on_event("startup")
-async def startup_event():
-    """Application startup event"""
-    logger.info(f"Starting {settings.app_name} v{settings.app_version}")
-    logger.info(f"Ollama URL: {settings.ollama_base_url}")
+    })
 
 
-# Shutdown event
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Application shutdown event"""
-    logger.info(f"Shutting down {settings.app_name}")
+if settings.metrics_enabled:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """Prometheus metrics"""
+        return metrics_response()
 
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(
-        "app.main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=settings.debug,
-        log_level=settings.log_level.lower()
-    )
\ No newline at end of file
+    from .server import run
+    run()
\ No newline at end of file
@@ -0,0 +1,18 @@
+from .chat import BatchChatItem, BatchChatRequest, ChatMessage, ChatResponse, GenerationStats
+from .document import DocumentInfo, IngestResult, RetrievalOptions, RetrievedChunk
+from .health import HealthStatus
+from .job import JobRequest
+
+__all__ = [
+    "BatchChatItem",
+    "BatchChatRequest",
+    "ChatMessage",
+    "ChatResponse",
+    "DocumentInfo",
+    "GenerationStats",
+    "HealthStatus",
+    "IngestResult",
+    "JobRequest",
+    "RetrievalOptions",
+    "RetrievedChunk"
+]
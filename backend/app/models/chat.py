@@ -0,0 +1,74 @@
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, Field
+
+from .document import RetrievalOptions, RetrievedChunk
+
+
+class ChatMessage(BaseModel):
+    """Incoming chat message"""
+
+    message: str = Field(..., min_length=1, description="User message to send to the model")
+    model: str = Field(default="llama3.2", description="Ollama model name")
+    options: Optional[Dict[str, Any]] = Field(
+        default=None,
+        description="Ollama generation options (temperature, seed, num_predict, ...)"
+    )
+    session_id: Optional[str] = Field(
+        default=None,
+        description="Conversation session from POST /sessions/; history is kept server-side"
+    )
+    images: Optional[List[str]] = Field(
+        default=None,
+        description="IDs (SHA-256 of the file) of images uploaded via /chat/multimodal"
+    )
+    retrieval: Optional[RetrievalOptions] = Field(
+        default=None,
+        description="Add matching chunks of ingested documents to the prompt"
+    )
+
+
+class GenerationStats(BaseModel):
+    """Timing and token counters reported by Ollama on the final chunk
+
+    Durations are in nanoseconds, as returned by Ollama.
+    """
+
+    total_duration: Optional[int] = None
+    load_duration: Optional[int] = None
+    prompt_eval_count: Optional[int] = None
+    prompt_eval_duration: Optional[int] = None
+    eval_count: Optional[int] = None
+    eval_duration: Optional[int] = None
+
+
+class ChatResponse(BaseModel):
+    """AI chat response"""
+
+    response: str
+    model: str
+    cached: bool = False
+    session_id: Optional[str] = None
+    stats: Optional[GenerationStats] = None
+    sources: Optional[List[RetrievedChunk]] = None
+
+
+class BatchChatItem(BaseModel):
+    """One prompt in a batch"""
+
+    message: str = Field(..., min_length=1, description="User message to send to the model")
+    model: Optional[str] = Field(default=None, description="Ollama model name; defaults to the batch model")
+    options: Optional[Dict[str, Any]] = Field(default=None, description="Ollama generation options")
+    id: Optional[str] = Field(default=None, description="Caller's identifier, echoed in the result")
+
+
+class BatchChatRequest(BaseModel):
+    """Many prompts answered concurrently, streamed back as NDJSON"""
+
+    items: List[BatchChatItem] = Field(..., min_length=1)
+    model: str = Field(default="llama3.2", description="Model for items that don't name one")
+    options: Optional[Dict[str, Any]] = Field(default=None, description="Options for items that don't set any")
+    parallelism: Optional[int] = Field(
+        default=None,
+        ge=1,
+        description="Max items in flight at once (capped by the server limit)"
+    )
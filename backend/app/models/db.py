@@ -0,0 +1,145 @@
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import (
+    BigInteger, Boolean, Date, DateTime, Float, ForeignKey, Index, Integer, String, Text, UniqueConstraint, func
+)
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+
+class Base(DeclarativeBase):
+    """Declarative base for ORM models (used by Alembic autogenerate)"""
+
+
+class Conversation(Base):
+    """A conversation session"""
+
+    __tablename__ = "conversations"
+
+    id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    model: Mapped[Optional[str]] = mapped_column(String(128), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+
+class ChatRequest(Base):
+    """Audit record for one chat API request"""
+
+    __tablename__ = "chat_requests"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    conversation_id: Mapped[Optional[str]] = mapped_column(
+        String(64), ForeignKey("conversations.id"), nullable=True
+    )
+    client_id: Mapped[Optional[str]] = mapped_column(String(128), nullable=True)
+    model: Mapped[str] = mapped_column(String(128))
+    status_code: Mapped[int] = mapped_column(Integer)
+    streamed: Mapped[bool] = mapped_column(Boolean, default=False)
+    cached: Mapped[bool] = mapped_column(Boolean, default=False)
+    latency_ms: Mapped[float] = mapped_column(Float)
+    prompt_eval_count: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    eval_count: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+
+    __table_args__ = (
+        Index("ix_chat_requests_created_at", "created_at"),
+        Index("ix_chat_requests_conversation_id", "conversation_id"),
+    )
+
+
+class Document(Base):
+    """An ingested document; its chunk vectors live in the RAG vector file"""
+
+    __tablename__ = "documents"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    collection: Mapped[str] = mapped_column(String(128))
+    source: Mapped[str] = mapped_column(String(512))  # relative path or upload file name
+    sha256: Mapped[str] = mapped_column(String(64))
+    size: Mapped[int] = mapped_column(Integer)
+    chunk_count: Mapped[int] = mapped_column(Integer)
+    embedding_model: Mapped[str] = mapped_column(String(128))
+    created_at: Mapped[float] = mapped_column(Float)
+    updated_at: Mapped[float] = mapped_column(Float)
+
+    __table_args__ = (
+        UniqueConstraint("collection", "source", name="uq_documents_collection_source"),
+    )
+
+
+class DocumentChunk(Base):
+    """One chunk of a document; ``vector_row`` is its row in the vector file"""
+
+    __tablename__ = "document_chunks"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    document_id: Mapped[str] = mapped_column(String(36), ForeignKey("documents.id", ondelete="CASCADE"))
+    ordinal: Mapped[int] = mapped_column(Integer)
+    vector_row: Mapped[int] = mapped_column(Integer, unique=True)
+    content: Mapped[str] = mapped_column(Text)
+
+    __table_args__ = (
+        Index("ix_document_chunks_document_id", "document_id"),
+    )
+
+
+class Job(Base):
+    """A queued asynchronous chat job (durable job backend)"""
+
+    __tablename__ = "jobs"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    status: Mapped[str] = mapped_column(String(16))
+    priority: Mapped[int] = mapped_column(Integer, default=0)
+    client_id: Mapped[Optional[str]] = mapped_column(String(128), nullable=True)
+    request: Mapped[str] = mapped_column(Text)  # JSON-encoded JobRequest
+    result: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # JSON-encoded ChatResponse
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[float] = mapped_column(Float)
+    started_at: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    finished_at: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    deadline_at: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    expires_at: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    # Process running the job, and until when; others may take over after that
+    claimed_by: Mapped[Optional[str]] = mapped_column(String(128), nullable=True)
+    lease_expires_at: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+
+    __table_args__ = (
+        Index("ix_jobs_status", "status"),
+        Index("ix_jobs_expires_at", "expires_at"),
+    )
+
+
+class Message(Base):
+    """One transcript message (user prompt or assistant reply)"""
+
+    __tablename__ = "messages"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    request_id: Mapped[str] = mapped_column(String(36), ForeignKey("chat_requests.id"))
+    conversation_id: Mapped[Optional[str]] = mapped_column(
+        String(64), ForeignKey("conversations.id"), nullable=True
+    )
+    role: Mapped[str] = mapped_column(String(16))
+    content: Mapped[str] = mapped_column(Text)
+    model: Mapped[str] = mapped_column(String(128))
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+
+    __table_args__ = (
+        Index("ix_messages_conversation_id", "conversation_id"),
+        Index("ix_messages_request_id", "request_id"),
+    )
+
+
+class ApiUsage(Base):
+    """Requests and tokens per client (API key), model and UTC day"""
+
+    __tablename__ = "api_usage"
+
+    client_id: Mapped[str] = mapped_column(String(128), primary_key=True)
+    model: Mapped[str] = mapped_column(String(128), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    requests: Mapped[int] = mapped_column(Integer, default=0)
+    prompt_tokens: Mapped[int] = mapped_column(BigInteger, default=0)
+    completion_tokens: Mapped[int] = mapped_column(BigInteger, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
@@ -0,0 +1,48 @@
+from typing import Optional
+from pydantic import BaseModel, Field
+
+
+class RetrievalOptions(BaseModel):
+    """Ground a chat answer in ingested documents"""
+
+    top_k: int = Field(default=4, ge=1, le=20, description="Number of chunks added to the prompt")
+    collection: Optional[str] = Field(default=None, description="Only search this collection")
+    min_score: Optional[float] = Field(
+        default=None,
+        ge=-1,
+        le=1,
+        description="Drop chunks whose cosine similarity is below this"
+    )
+
+
+class RetrievedChunk(BaseModel):
+    """A document chunk matching a query"""
+
+    document_id: str
+    source: str
+    ordinal: int
+    score: float
+    content: str
+
+
+class DocumentInfo(BaseModel):
+    """An ingested document"""
+
+    id: str
+    collection: str
+    source: str
+    sha256: str
+    size: int
+    chunk_count: int
+    embedding_model: str
+    updated_at: float
+
+
+class IngestResult(BaseModel):
+    """Outcome of ingesting one document"""
+
+    source: str
+    status: str  # "ingested", "unchanged" or "failed"
+    document_id: Optional[str] = None
+    chunks: int = 0
+    error: Optional[str] = None
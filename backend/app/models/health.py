@@ -0,0 +1,32 @@
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+
+
+class ComponentHealth(BaseModel):
+    """Latest probe result for one dependency"""
+
+    status: str  # up, degraded or down
+    latency_ms: Optional[float] = None
+    checked_at: Optional[str] = None
+    error: Optional[str] = None
+    details: Dict[str, Any] = {}
+
+
+class HealthStatus(BaseModel):
+    """Service health status"""
+
+    status: str
+    ollama: str
+    timestamp: str
+    checks: Optional[Dict[str, ComponentHealth]] = None
+
+
+class ReadinessStatus(BaseModel):
+    """Whether the instance should receive traffic"""
+
+    ready: bool
+    reasons: List[str]
+    circuits: Dict[str, str]
+    queued: int
+    active: int
@@ -0,0 +1,20 @@
+from typing import Optional
+from pydantic import Field
+
+from .chat import ChatMessage
+
+
+class JobRequest(ChatMessage):
+    """A chat message to answer asynchronously as a job"""
+
+    priority: int = Field(default=0, description="Higher runs first")
+    deadline: Optional[float] = Field(
+        default=None,
+        gt=0,
+        description="Seconds from submission after which the job is abandoned"
+    )
+    result_ttl: Optional[float] = Field(
+        default=None,
+        gt=0,
+        description="Seconds the result is kept after the job finishes"
+    )
@@ -1,7 +1,10 @@
-from . import chat, health, models
+from . import chat, documents, health, jobs, models, sessions
 
 __all__ = [
     "chat",
+    "documents",
     "health", 
-    "models"
+    "jobs",
+    "models",
+    "sessions"
 ]
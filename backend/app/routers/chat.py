@@ -1,36 +1,201 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Request, WebSocket
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response, StreamingResponse
+from pydantic import ValidationError
+from typing import AsyncIterator, List, Optional
+import asyncio
+import json
 import logging
+import time
 
-from ..models.chat import ChatMessage, ChatResponse
+from ..models.chat import BatchChatRequest, ChatMessage, ChatResponse
 from ..services.chat_service import ChatService
-from ..dependencies import get_chat_service
+from ..services.chat_socket import ChatSocket
+from ..services.admission import AdmissionController
+from ..services.response_cache import ResponseCache
+from ..services.semantic_cache import SemanticCache
+from ..services.coalescer import RequestCoalescer
+from ..services.image_service import ImageService
+from ..utils.uploads import read_multipart
+from ..core import metrics
+from ..core.responses import EncodedPayload, dumps
+from ..dependencies import (
+    get_admission_controller,
+    get_chat_service,
+    get_client_id,
+    get_coalescer,
+    get_image_service,
+    get_response_cache,
+    get_semantic_cache
+)
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
+_models_payload = EncodedPayload()
+
 
 @router.post("/", response_model=ChatResponse)
 async def chat_with_ai(
     message: ChatMessage,
-    chat_service: ChatService = Depends(get_chat_service)
+    chat_service: ChatService = Depends(get_chat_service),
+    client_id: str = Depends(get_client_id)
 ):
     """Chat with AI using Ollama"""
+    logger.info("Received chat request for model: %s", message.model)
+    return await _chat_response(chat_service, message, client_id)
+
+
+async def _chat_response(chat_service: ChatService, message: ChatMessage, client_id: str) -> Response:
     try:
-        logger.info(f"Received chat request for model: {message.model}")
-        return await chat_service.process_chat_message(message)
+        response = await chat_service.process_chat_message(message, client_id=client_id)
+
+        # Serialize here (the model is already validated) so the stage is measured
+        started = time.perf_counter()
+        body = response.model_dump_json()
+        metrics.observe_stage(response.model, "serialization", time.perf_counter() - started)
+        return Response(content=body, media_type="application/json")
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error in chat endpoint: {str(e)}")
+        logger.error("Unexpected error in chat endpoint: %s", str(e))
         raise HTTPException(
             status_code=500,
             detail=settings.error_internal
         )
 
 
+@router.post("/stream")
+async def stream_chat_with_ai(
+    message: ChatMessage,
+    chat_service: ChatService = Depends(get_chat_service),
+    client_id: str = Depends(get_client_id)
+):
+    """Chat with AI, streaming tokens as Server-Sent Events"""
+    logger.info("Received streaming chat request for model: %s", message.model)
+    return await _sse_response(chat_service, message, client_id)
+
+
+@router.websocket("/ws")
+async def chat_over_websocket(
+    websocket: WebSocket,
+    chat_service: ChatService = Depends(get_chat_service),
+    client_id: str = Depends(get_client_id)
+):
+    """Chat over one WebSocket: concurrent conversations by ID, tokens as frames, cancel messages"""
+    await ChatSocket(websocket, chat_service, client_id).run()
+
+
+@router.post("/multimodal")
+async def chat_with_images(
+    request: Request,
+    chat_service: ChatService = Depends(get_chat_service),
+    image_service: ImageService = Depends(get_image_service),
+    client_id: str = Depends(get_client_id)
+):
+    """Chat about uploaded images (multipart/form-data)
+
+    Form fields: ``message``, ``model`` (defaults to the vision model),
+    ``options`` (JSON), ``session_id``, ``images`` (comma-separated IDs of
+    images uploaded earlier) and ``stream`` (``true`` for SSE), plus any
+    number of image files. Each file's ID is the SHA-256 of its bytes, so a
+    repeated image is served from the processed-image cache.
+    """
+    fields, files = await read_multipart(request)
+    image_ids = [image_id for image_id in fields.pop("images", "").split(",") if image_id]
+    image_ids += await asyncio.gather(*(image_service.add(file.data, file.digest) for file in files))
+
+    try:
+        message = ChatMessage(
+            message=fields.get("message", ""),
+            model=fields.get("model") or settings.default_vision_model,
+            options=json.loads(fields["options"]) if fields.get("options") else None,
+            session_id=fields.get("session_id") or None,
+            images=image_ids or None
+        )
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=422, detail="options must be a JSON object")
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+
+    logger.info("Received multimodal chat request for model: %s with %s images", message.model, len(image_ids))
+    if fields.get("stream", "").lower() in ("1", "true", "yes"):
+        return await _sse_response(chat_service, message, client_id)
+    return await _chat_response(chat_service, message, client_id)
+
+
+async def _sse_response(chat_service: ChatService, message: ChatMessage, client_id: str) -> StreamingResponse:
+    frames = chat_service.stream_chat_message(message, client_id=client_id)
+
+    # Pull the first frame before committing to a 200 so upstream failures
+    # (Ollama down, unknown model, timeouts) still map to an HTTP status.
+    try:
+        first_frame = await frames.__anext__()
+    except StopAsyncIteration:
+        first_frame = None
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Unexpected error in chat stream endpoint: %s", str(e))
+        raise HTTPException(
+            status_code=500,
+            detail=settings.error_internal
+        )
+
+    async def relay() -> AsyncIterator[str]:
+        # Starlette cancels this generator when the client disconnects;
+        # closing `frames` then closes the upstream Ollama request.
+        try:
+            if first_frame is not None:
+                yield first_frame
+                async for frame in frames:
+                    yield frame
+        finally:
+            await frames.aclose()
+
+    return StreamingResponse(
+        relay(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/batch")
+async def batch_chat_with_ai(
+    batch: BatchChatRequest,
+    chat_service: ChatService = Depends(get_chat_service),
+    client_id: str = Depends(get_client_id)
+):
+    """Answer many prompts concurrently, streaming one NDJSON result per item
+
+    Results arrive in completion order; each carries the item's ``index``
+    (and ``id`` if given). Failed items report ``status_code`` and ``error``
+    without failing the batch.
+    """
+    if len(batch.items) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: at most {settings.batch_max_items} items"
+        )
+    logger.info("Received batch chat request with %s items", len(batch.items))
+    results = chat_service.process_batch(batch, client_id=client_id)
+
+    async def relay() -> AsyncIterator[bytes]:
+        try:
+            async for result in results:
+                yield dumps(result) + b"\n"
+        finally:
+            await results.aclose()
+
+    return StreamingResponse(
+        relay(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/models")
 async def get_available_models(
     chat_service: ChatService = Depends(get_chat_service)
@@ -38,7 +203,29 @@ async def get_available_models(
     """Get available AI models"""
     try:
         models = await chat_service.get_available_models()
-        return {"models": models}
     except Exception as e:
-        logger.error(f"Error getting models: {str(e)}")
-        return {"models": settings.default_models}
+        logger.error("Error getting models: %s", str(e))
+        models = settings.default_models
+    return _models_payload.response(models, lambda: {"models": models})
+
+
+@router.get("/queue")
+async def get_queue_stats(
+    admission: AdmissionController = Depends(get_admission_controller),
+    coalescer: Optional[RequestCoalescer] = Depends(get_coalescer)
+):
+    """Get admission queue depth, wait times, limits and coalescing counters"""
+    stats = admission.stats()
+    stats["coalescing"] = coalescer.stats() if coalescer else {"enabled": False}
+    return stats
+
+
+@router.get("/cache")
+async def get_cache_stats(
+    response_cache: Optional[ResponseCache] = Depends(get_response_cache),
+    semantic_cache: Optional[SemanticCache] = Depends(get_semantic_cache)
+):
+    """Get exact-match and semantic cache hit rates and occupancy"""
+    stats = {"enabled": True, **response_cache.stats()} if response_cache else {"enabled": False}
+    stats["semantic"] = {"enabled": True, **semantic_cache.stats()} if semantic_cache is not None else {"enabled": False}
+    return stats
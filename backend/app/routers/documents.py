@@ -0,0 +1,95 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from typing import List, Optional
+import asyncio
+import logging
+
+from ..models.document import DocumentInfo, IngestResult, RetrievedChunk
+from ..services.rag_service import RagService
+from ..utils.uploads import read_multipart
+from ..dependencies import get_rag_service
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/documents", tags=["documents"])
+
+
+def require_rag_service(rag_service: Optional[RagService] = Depends(get_rag_service)) -> RagService:
+    """The RAG service, or 404 when retrieval is disabled"""
+    if rag_service is None:
+        raise HTTPException(status_code=404, detail=settings.error_retrieval_disabled)
+    return rag_service
+
+
+@router.post("/", response_model=List[IngestResult])
+async def upload_documents(
+    request: Request,
+    rag_service: RagService = Depends(require_rag_service)
+):
+    """Ingest uploaded text files (multipart/form-data)
+
+    Each file is stored under its file name in the ``collection`` form field
+    (default collection otherwise). Re-uploading an unchanged file is a
+    no-op; a changed one replaces the previous version's chunks.
+    """
+    fields, files = await read_multipart(
+        request,
+        max_file_bytes=settings.rag_max_upload_bytes,
+        max_files=settings.rag_max_upload_files
+    )
+    if not files:
+        raise HTTPException(status_code=422, detail="No files uploaded")
+    collection = fields.get("collection") or None
+    return await asyncio.gather(*(rag_service.ingest_upload(file, collection) for file in files))
+
+
+@router.post("/sync")
+async def sync_documents(
+    collection: Optional[str] = Query(default=None, description="Collection to sync into"),
+    rag_service: RagService = Depends(require_rag_service)
+):
+    """Incrementally ingest the configured source directory
+
+    New and changed files are embedded, unchanged ones skipped by content
+    hash, and documents whose file was removed are deleted.
+    """
+    if not settings.rag_source_dir:
+        raise HTTPException(status_code=400, detail="RAG_SOURCE_DIR is not configured")
+    return await rag_service.sync_directory(collection=collection)
+
+
+@router.get("/", response_model=List[DocumentInfo])
+async def list_documents(
+    collection: Optional[str] = Query(default=None),
+    rag_service: RagService = Depends(require_rag_service)
+):
+    """List ingested documents"""
+    return await rag_service.list_documents(collection)
+
+
+@router.get("/search", response_model=List[RetrievedChunk])
+async def search_documents(
+    q: str = Query(..., min_length=1, description="Query text"),
+    k: int = Query(default=4, ge=1, le=50),
+    collection: Optional[str] = Query(default=None),
+    rag_service: RagService = Depends(require_rag_service)
+):
+    """Find the chunks most similar to a query"""
+    return await rag_service.search(q, k, collection)
+
+
+@router.get("/stats")
+async def get_document_stats(rag_service: RagService = Depends(require_rag_service)):
+    """Get index size and ingestion counters"""
+    return rag_service.stats()
+
+
+@router.delete("/{document_id}")
+async def delete_document(
+    document_id: str,
+    rag_service: RagService = Depends(require_rag_service)
+):
+    """Delete a document and its chunks"""
+    if not await rag_service.delete(document_id):
+        raise HTTPException(status_code=404, detail="Document not found")
+    return {"deleted": True}
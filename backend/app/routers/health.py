@@ -1,38 +1,85 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import Response
 from datetime import datetime
 import logging
 
-from ..models.health import HealthStatus
+from ..core.responses import EncodedPayload, FastJSONResponse, dumps
+from ..models.health import HealthStatus, ReadinessStatus
+from ..services.health_monitor import HealthMonitor
 from ..services.ollama_service import OllamaService
-from ..dependencies import get_ollama_service
+from ..dependencies import get_health_monitor, get_ollama_service
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/health", tags=["health"])
 
+# Health bodies are encoded once per snapshot, not once per poll
+_ALIVE = dumps({"status": "alive"})
+_health_payload = EncodedPayload()
+
 
 @router.get("/", response_model=HealthStatus)
 async def health_check(
-    ollama_service: OllamaService = Depends(get_ollama_service)
+    health_monitor: HealthMonitor = Depends(get_health_monitor)
 ):
-    """Check if Ollama is running and service is healthy"""
-    try:
-        health_data = await ollama_service.check_health()
-        return HealthStatus(
-            status=health_data["status"],
-            ollama=health_data["ollama"],
-            timestamp=datetime.utcnow().isoformat()
-        )
-    except Exception as e:
-        logger.error(f"Health check error: {str(e)}")
-        return HealthStatus(
-            status="unhealthy",
-            ollama="not running",
-            timestamp=datetime.utcnow().isoformat()
-        )
+    """Service and dependency health from the latest background probes"""
+    snapshot = health_monitor.snapshot
+    return _health_payload.response(snapshot, lambda: HealthStatus(
+        status=snapshot["status"],
+        ollama="not running" if snapshot["checks"]["ollama"]["status"] == "down" else "running",
+        timestamp=snapshot["checked_at"],
+        checks=snapshot["checks"]
+    ))
+
+
+@router.get("/live")
+async def liveness():
+    """Liveness probe: the process is up and its event loop responds"""
+    return Response(_ALIVE, media_type="application/json")
+
+
+@router.get("/ready", response_model=ReadinessStatus, responses={503: {"model": ReadinessStatus}})
+async def readiness(
+    health_monitor: HealthMonitor = Depends(get_health_monitor)
+):
+    """Readiness probe: 503 while Ollama is unavailable, the queue is saturated or during shutdown"""
+    status = health_monitor.readiness()
+    return FastJSONResponse(status, status_code=200 if status["ready"] else 503)
 
 
 @router.get("/ping")
 async def ping():
     """Simple ping endpoint"""
     return {"message": "pong", "timestamp": datetime.utcnow().isoformat()}
+
+
+@router.get("/backends")
+async def get_backends(
+    ollama_service: OllamaService = Depends(get_ollama_service)
+):
+    """Per-backend routing state, latency and error stats"""
+    return {"backends": ollama_service.balancer.stats()}
+
+
+@router.post("/backends/drain")
+async def drain_backend(
+    url: str,
+    ollama_service: OllamaService = Depends(get_ollama_service)
+):
+    """Stop routing new requests to an Ollama backend"""
+    try:
+        return ollama_service.balancer.drain(url).stats()
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown backend: {url}")
+
+
+@router.post("/backends/undrain")
+async def undrain_backend(
+    url: str,
+    ollama_service: OllamaService = Depends(get_ollama_service)
+):
+    """Resume routing requests to a drained Ollama backend"""
+    try:
+        return ollama_service.balancer.undrain(url).stats()
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown backend: {url}")
@@ -0,0 +1,80 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator
+import logging
+
+from ..models.job import JobRequest
+from ..services.job_queue import Job, JobQueue
+from ..utils.helpers import format_sse
+from ..dependencies import get_client_id, get_job_queue
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+async def _get_owned_job(job_queue: JobQueue, job_id: str, client_id: str) -> Job:
+    """A job of this caller; other callers' jobs are 404 like missing ones"""
+    job = await job_queue.get(job_id)
+    if job is None or job.client_id != client_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/", status_code=202)
+async def create_job(
+    request: JobRequest,
+    job_queue: JobQueue = Depends(get_job_queue),
+    client_id: str = Depends(get_client_id)
+):
+    """Queue a chat generation and return its job ID immediately"""
+    job = await job_queue.submit(request, client_id=client_id)
+    return job.to_dict()
+
+
+@router.get("/{job_id}")
+async def get_job(
+    job_id: str,
+    wait: float = Query(default=0, ge=0, le=60, description="Long-poll up to this many seconds for the result"),
+    job_queue: JobQueue = Depends(get_job_queue),
+    client_id: str = Depends(get_client_id)
+):
+    """Get a job's status and, once finished, its result"""
+    job = await _get_owned_job(job_queue, job_id, client_id)
+    if wait:
+        job = await job_queue.wait(job_id, wait) or job
+    return job.to_dict()
+
+
+@router.get("/{job_id}/events")
+async def watch_job(
+    job_id: str,
+    job_queue: JobQueue = Depends(get_job_queue),
+    client_id: str = Depends(get_client_id)
+):
+    """Subscribe to a job's status changes as Server-Sent Events"""
+    job = await _get_owned_job(job_queue, job_id, client_id)
+
+    async def events() -> AsyncIterator[str]:
+        async for state in job_queue.watch(job):
+            yield format_sse(state, event=state["status"])
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.delete("/{job_id}")
+async def cancel_job(
+    job_id: str,
+    job_queue: JobQueue = Depends(get_job_queue),
+    client_id: str = Depends(get_client_id)
+):
+    """Cancel a queued or running job"""
+    await _get_owned_job(job_queue, job_id, client_id)
+    job = await job_queue.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
@@ -1,44 +1,81 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 import logging
 
 from ..services.chat_service import ChatService
-from ..dependencies import get_chat_service
+from ..services.model_catalog import ModelCatalog
+from ..services.ollama_service import OllamaService
+from ..core.responses import EncodedPayload, FastJSONResponse
+from ..dependencies import get_chat_service, get_model_catalog, get_ollama_service
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/models", tags=["models"])
 
+_models_payload = EncodedPayload()
+
 
 @router.get("/")
 async def get_available_models(
-    chat_service: ChatService = Depends(get_chat_service)
+    chat_service: ChatService = Depends(get_chat_service),
+    ollama_service: OllamaService = Depends(get_ollama_service)
 ):
-    """Get available AI models from Ollama"""
+    """Get available AI models from Ollama and which of them are loaded"""
     try:
         models = await chat_service.get_available_models()
-        return {"models": models}
     except Exception as e:
-        logger.error(f"Error fetching models: {str(e)}")
-        return {"models": settings.default_models}
+        logger.error("Error fetching models: %s", str(e))
+        models = settings.default_models
+    listing = {
+        "models": models,
+        "resident": ollama_service.resident_models(),
+        "hot": ollama_service.hot_models(),
+        "warming": sorted(ollama_service.warming)
+    }
+    return _models_payload.response(listing, lambda: listing)
 
 
-@router.get("/health")
-async def check_models_health(
-    chat_service: ChatService = Depends(get_chat_service)
+@router.post("/warm")
+async def warm_model(
+    model: str = Query(..., min_length=1, description="Model to load"),
+    ollama_service: OllamaService = Depends(get_ollama_service)
+):
+    """Load a model into memory now, with its configured keep_alive"""
+    if not await ollama_service.warm_model(model):
+        raise HTTPException(status_code=502, detail=f"Could not load model {model}")
+    return {"model": model, "loaded": True}
+
+
+@router.post("/unload")
+async def unload_model(
+    model: str = Query(..., min_length=1, description="Model to evict"),
+    ollama_service: OllamaService = Depends(get_ollama_service)
 ):
-    """Check if models are accessible"""
+    """Evict a model from memory on every node"""
     try:
-        models = await chat_service.get_available_models()
-        return {
-            "status": "healthy" if models else "unhealthy",
-            "model_count": len(models),
-            "models": models
-        }
+        await ollama_service.unload_model(model)
     except Exception as e:
-        logger.error(f"Error checking models health: {str(e)}")
-        return {
+        logger.error("Error unloading model %s: %s", model, str(e))
+        raise HTTPException(status_code=502, detail=f"Could not unload model {model}")
+    return {"model": model, "loaded": False}
+
+
+@router.get("/health")
+async def check_models_health(
+    model_catalog: ModelCatalog = Depends(get_model_catalog)
+):
+    """Check if models are accessible, from the background-refreshed catalog"""
+    models = model_catalog.cached_models()
+    if not models:
+        return FastJSONResponse({
             "status": "unhealthy",
             "model_count": 0,
-            "models": settings.default_models
-        }
+            "models": settings.default_models,
+            "age_seconds": model_catalog.age
+        })
+    return FastJSONResponse({
+        "status": "degraded" if model_catalog.is_stale else "healthy",
+        "model_count": len(models),
+        "models": models,
+        "age_seconds": model_catalog.age
+    })
@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Depends, HTTPException
+import logging
+
+from ..services.session_service import SessionStore
+from ..dependencies import get_client_id, get_session_store
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/sessions", tags=["sessions"])
+
+
+@router.post("/")
+async def create_session(
+    session_store: SessionStore = Depends(get_session_store),
+    client_id: str = Depends(get_client_id)
+):
+    """Start a new conversation session, owned by the caller"""
+    session = await session_store.create(client_id)
+    return {"session_id": session.id}
+
+
+@router.get("/{session_id}")
+async def get_session(
+    session_id: str,
+    session_store: SessionStore = Depends(get_session_store),
+    client_id: str = Depends(get_client_id)
+):
+    """Get a session's server-side history"""
+    session = await session_store.get(session_id, client_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=settings.error_session_not_found)
+    return session.to_dict()
+
+
+@router.delete("/{session_id}")
+async def delete_session(
+    session_id: str,
+    session_store: SessionStore = Depends(get_session_store),
+    client_id: str = Depends(get_client_id)
+):
+    """End a session and discard its history"""
+    if not await session_store.delete(session_id, client_id):
+        raise HTTPException(status_code=404, detail=settings.error_session_not_found)
+    return {"deleted": True}
@@ -0,0 +1,71 @@
+"""
+Serve the API with uvicorn, in one process or several workers
+
+With ``workers`` > 1 uvicorn's supervisor process starts the workers, and
+also hosts the shared-state server they coordinate through (model catalog,
+response cache, admission and rate limits, sessions, images). Uvicorn
+workers share one listening socket, so any of them may get a client's
+next request; features whose state can't be shared that way refuse to
+start in this mode. Signals to the supervisor:
+
+- SIGHUP restarts the workers one at a time (graceful reload: each
+  drains its in-flight requests while the others keep serving);
+- SIGTTIN / SIGTTOU add or remove a worker;
+- SIGINT / SIGTERM shut everything down.
+"""
+
+import os
+import shutil
+import tempfile
+from typing import List, Optional
+
+import uvicorn
+
+from .config import settings
+from .services.shared_state import start_server_thread
+
+
+def per_process_features() -> List[str]:
+    """Enabled features whose state lives in one worker process"""
+    features = []
+    if settings.rag_enabled:
+        # Vector rows are allocated in memory and written to one file
+        features.append("RAG_ENABLED=true (the document index)")
+    if settings.job_backend == "memory":
+        features.append("JOB_BACKEND=memory (use JOB_BACKEND=database)")
+    return features
+
+
+def run(host: Optional[str] = None, port: Optional[int] = None, workers: Optional[int] = None) -> None:
+    """Start uvicorn (blocking) with the configured host, port and worker count"""
+    workers = workers or settings.workers
+    socket_dir = None
+    # uvicorn ignores workers when reloading on code changes
+    if workers > 1 and not settings.debug:
+        unshared = per_process_features()
+        if unshared:
+            raise SystemExit(
+                f"WORKERS={workers} needs state shared by all workers, but these keep it per process: "
+                + "; ".join(unshared) + ". Run a single worker or change these settings."
+            )
+        if not settings.shared_state_socket:
+            socket_dir = tempfile.mkdtemp(prefix="chat-api-")
+            settings.shared_state_socket = os.path.join(socket_dir, "state.sock")
+        # Workers are spawned processes; they read the socket path from the environment
+        os.environ["SHARED_STATE_SOCKET"] = settings.shared_state_socket
+        start_server_thread(settings.shared_state_socket)
+
+    try:
+        uvicorn.run(
+            "app.main:app",
+            host=host or settings.host,
+            port=port or settings.port,
+            workers=workers,
+            reload=settings.debug,
+            log_level=settings.log_level.lower(),
+            access_log=True,
+            timeout_graceful_shutdown=int(settings.shutdown_drain_timeout)
+        )
+    finally:
+        if socket_dir is not None:
+            shutil.rmtree(socket_dir, ignore_errors=True)
@@ -1,7 +1,45 @@
 from .ollama_service import OllamaService
+from .model_catalog import ModelCatalog
+from .admission import AdmissionController
+from .response_cache import ResponseCache
+from .coalescer import RequestCoalescer
+from .chat_recorder import ChatRecorder
+from .image_service import ImageService
+from .semantic_cache import SemanticCache
+from .rag_service import RagService
 from .chat_service import ChatService
+from .chat_socket import ChatSocket
+from .job_queue import JobQueue
+from .health_monitor import HealthMonitor
+from .rate_limiter import RateLimiter
+from .usage_meter import UsageMeter
+from .shared_state import (
+    SharedStateServer,
+    SharedStateClient,
+    SharedAdmissionController,
+    SharedRateLimiter,
+    SharedSessionStore
+)
 
 __all__ = [
     "OllamaService",
-    "ChatService"
+    "ModelCatalog",
+    "AdmissionController",
+    "ResponseCache",
+    "RequestCoalescer",
+    "ChatRecorder",
+    "ImageService",
+    "SemanticCache",
+    "RagService",
+    "ChatService",
+    "ChatSocket",
+    "JobQueue",
+    "HealthMonitor",
+    "RateLimiter",
+    "UsageMeter",
+    "SharedStateServer",
+    "SharedStateClient",
+    "SharedAdmissionController",
+    "SharedRateLimiter",
+    "SharedSessionStore"
 ]
@@ -0,0 +1,280 @@
+import asyncio
+import contextvars
+import logging
+import math
+import time
+from collections import OrderedDict, defaultdict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from app.config import settings
+from ..core import metrics
+
+logger = logging.getLogger(__name__)
+
+# Set in tasks doing background work (jobs); their requests wait for slots
+# behind interactive ones, without the queue bound or timeout
+_background: contextvars.ContextVar[bool] = contextvars.ContextVar("admission_background", default=False)
+
+
+def set_background_admission() -> None:
+    """Admit the generations of the current task as background work"""
+    _background.set(True)
+
+
+def in_background_admission() -> bool:
+    """Whether the current task was marked with ``set_background_admission``"""
+    return _background.get()
+
+
+class _Waiter:
+    """A request queued for a generation slot"""
+
+    __slots__ = ("model", "client", "background", "future", "enqueued_at")
+
+    def __init__(self, model: str, client: str, background: bool = False):
+        self.model = model
+        self.client = client
+        self.background = background
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.monotonic()
+
+
+class AdmissionController:
+    """Global and per-model concurrency limits with a fair bounded wait queue
+
+    Requests that cannot start immediately wait in a per-client queue; freed
+    slots are handed out round-robin across clients so one busy API key
+    cannot starve the others. When the queue is full requests are rejected
+    with 429, and requests that wait longer than the queue timeout get 503,
+    both with a ``Retry-After`` estimate.
+
+    Background requests (see ``set_background_admission``) are served only
+    when no interactive request can use the slot. They wait as long as it
+    takes and don't count against the queue bound; the job workers
+    already bound how many there are.
+    """
+
+    def __init__(
+        self,
+        global_limit: Optional[int] = None,
+        per_model_limit: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        queue_timeout: Optional[float] = None,
+        model_limits: Optional[Dict[str, int]] = None
+    ):
+        self.global_limit = global_limit or settings.max_concurrent_generations
+        self.per_model_limit = per_model_limit or settings.max_concurrent_per_model
+        self.max_queue = max_queue if max_queue is not None else settings.max_queued_requests
+        self.queue_timeout = queue_timeout or settings.queue_timeout
+        self.model_limits = model_limits if model_limits is not None else settings.per_model_concurrency_limits
+
+        self._active = 0
+        self._active_by_model: Dict[str, int] = defaultdict(int)
+        # client -> waiters; dict order is the round-robin order
+        self._queues: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+        self._queued = 0
+        self._queued_background = 0
+
+        self._admitted = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._avg_wait = 0.0
+        self._max_wait = 0.0
+        self._avg_service = 0.0
+
+    def model_limit(self, model: str) -> int:
+        """Concurrency limit for a model"""
+        return self.model_limits.get(model, self.per_model_limit)
+
+    @property
+    def queued(self) -> int:
+        """Number of requests waiting for a slot"""
+        return self._queued
+
+    @property
+    def active(self) -> int:
+        """Number of generations currently running"""
+        return self._active
+
+    @asynccontextmanager
+    async def slot(self, model: str, client: str = "anonymous"):
+        """Hold a generation slot for ``model`` for the duration of the block"""
+        requested = time.monotonic()
+        await self.acquire(model, client)
+        started = time.monotonic()
+        metrics.observe_stage(model, "queue_wait", started - requested)
+        try:
+            yield
+        finally:
+            self.release(model, time.monotonic() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of queue depth, wait times and limits for capacity sizing"""
+        queued_by_model: Dict[str, int] = defaultdict(int)
+        for waiters in self._queues.values():
+            for waiter in waiters:
+                queued_by_model[waiter.model] += 1
+        oldest = min(
+            (waiters[0].enqueued_at for waiters in self._queues.values() if waiters),
+            default=None
+        )
+        return {
+            "active": self._active,
+            "active_by_model": dict(self._active_by_model),
+            "queued": self._queued,
+            "queued_background": self._queued_background,
+            "queued_by_model": dict(queued_by_model),
+            "queued_clients": len(self._queues),
+            "oldest_wait_ms": round((time.monotonic() - oldest) * 1000, 2) if oldest else 0.0,
+            "avg_wait_ms": round(self._avg_wait * 1000, 2),
+            "max_wait_ms": round(self._max_wait * 1000, 2),
+            "avg_service_ms": round(self._avg_service * 1000, 2),
+            "admitted": self._admitted,
+            "rejected": self._rejected,
+            "timed_out": self._timed_out,
+            "limits": {
+                "global": self.global_limit,
+                "per_model": self.per_model_limit,
+                "models": dict(self.model_limits),
+                "max_queue": self.max_queue,
+                "queue_timeout": self.queue_timeout
+            }
+        }
+
+    def retry_after(self) -> int:
+        """Rough seconds until a queued request would be served"""
+        service = self._avg_service or 1.0
+        return max(1, math.ceil(service * (self._queued + 1) / self.global_limit))
+
+    def _has_capacity(self, model: str) -> bool:
+        return (
+            self._active < self.global_limit
+            and self._active_by_model.get(model, 0) < self.model_limit(model)
+        )
+
+    def _admit(self, model: str, waited: float) -> None:
+        self._active += 1
+        self._active_by_model[model] += 1
+        self._admitted += 1
+        self._avg_wait = 0.9 * self._avg_wait + 0.1 * waited
+        self._max_wait = max(self._max_wait, waited)
+
+    async def acquire(self, model: str, client: str = "anonymous", background: Optional[bool] = None) -> None:
+        """Wait for a slot for ``model``; prefer ``slot()``, which also releases it
+
+        ``background`` defaults to whether the current task was marked with
+        ``set_background_admission``.
+        """
+        if background is None:
+            background = in_background_admission()
+        # Every release dispatches all admissible waiters, so anything still
+        # queued is blocked on capacity; if this model has room, go now.
+        if self._has_capacity(model):
+            self._admit(model, 0.0)
+            return
+
+        if background:
+            await self._wait_background(model, client)
+            return
+
+        if self._queued - self._queued_background >= self.max_queue:
+            self._rejected += 1
+            logger.warning("Admission queue full, rejecting request for model: %s", model)
+            raise HTTPException(
+                status_code=429,
+                detail=settings.error_queue_full,
+                headers={"Retry-After": str(self.retry_after())}
+            )
+
+        waiter = _Waiter(model, client)
+        self._queues.setdefault(client, deque()).append(waiter)
+        self._queued += 1
+
+        try:
+            await asyncio.wait_for(waiter.future, timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._remove(waiter)
+            self._timed_out += 1
+            logger.warning("Timed out waiting for a slot for model: %s", model)
+            raise HTTPException(
+                status_code=503,
+                detail=settings.error_queue_timeout,
+                headers={"Retry-After": str(self.retry_after())}
+            )
+        except BaseException:
+            # Caller went away; give back a slot we may have been handed
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release(model, 0.0)
+            else:
+                self._remove(waiter)
+            raise
+
+    async def _wait_background(self, model: str, client: str) -> None:
+        waiter = _Waiter(model, client, background=True)
+        self._queues.setdefault(client, deque()).append(waiter)
+        self._queued += 1
+        self._queued_background += 1
+        try:
+            await waiter.future
+        except BaseException:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release(model, 0.0)
+            else:
+                self._remove(waiter)
+            raise
+
+    def release(self, model: str, service_time: float) -> None:
+        """Give back a slot taken by ``acquire()``"""
+        self._active -= 1
+        self._active_by_model[model] -= 1
+        if self._active_by_model[model] <= 0:
+            del self._active_by_model[model]
+        if service_time:
+            if self._avg_service:
+                self._avg_service = 0.9 * self._avg_service + 0.1 * service_time
+            else:
+                self._avg_service = service_time
+        self._dispatch()
+
+    def _remove(self, waiter: _Waiter) -> None:
+        waiters = self._queues.get(waiter.client)
+        if waiters and waiter in waiters:
+            waiters.remove(waiter)
+            self._queued -= 1
+            self._queued_background -= waiter.background
+            if not waiters:
+                del self._queues[waiter.client]
+
+    def _dispatch(self) -> None:
+        """Hand free slots to waiting requests, round-robin across clients
+
+        Interactive requests go first; background ones get what is left.
+        """
+        while self._queued and self._active < self.global_limit:
+            found = self._next_waiter(background=False) or self._next_waiter(background=True)
+            if found is None:
+                return
+            client, waiter = found
+            waiters = self._queues[client]
+            waiters.remove(waiter)
+            self._queued -= 1
+            self._queued_background -= waiter.background
+            if waiters:
+                self._queues.move_to_end(client)
+            else:
+                del self._queues[client]
+            self._admit(waiter.model, time.monotonic() - waiter.enqueued_at)
+            waiter.future.set_result(None)
+
+    def _next_waiter(self, background: bool) -> Optional[Tuple[str, _Waiter]]:
+        """The first admissible waiter of the given class, in round-robin order"""
+        for client, waiters in self._queues.items():
+            waiter = next(
+                (w for w in waiters if w.background == background and self._has_capacity(w.model)),
+                None
+            )
+            if waiter is not None:
+                return client, waiter
+        return None
@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import Table, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from ..models.db import ChatRequest, Conversation, Message
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Tables in foreign-key order; each batch is written in this order
+_TABLES: List[Table] = [Conversation.__table__, ChatRequest.__table__, Message.__table__]
+
+# Conversation IDs remembered as written, to skip re-inserting them
+_KNOWN_CONVERSATIONS = 10_000
+
+# One request's rows: its conversation (if any), the request and its messages
+Record = List[Tuple[Table, Dict[str, Any]]]
+
+
+class ChatRecorder:
+    """Write-behind audit log for chat requests and transcripts
+
+    Records are queued in memory and a background task writes them in
+    batches, one bulk ``executemany`` INSERT per table, so persistence never
+    adds latency to the chat endpoints. Each request is queued as one
+    record holding all its rows, so when the queue is full a request is
+    dropped and counted as a whole rather than blocking, and a batch never
+    holds messages whose request is missing. A request's conversation row
+    is inserted with it (ignoring duplicates) until a write including it
+    has committed. Whatever is queued at shutdown is flushed.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        queue_size: Optional[int] = None
+    ):
+        self.engine = engine
+        self.batch_size = batch_size or settings.write_behind_batch_size
+        self.flush_interval = flush_interval or settings.write_behind_flush_interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or settings.write_behind_queue_size)
+        self._worker: Optional[asyncio.Task] = None
+        self._known_conversations: "OrderedDict[str, None]" = OrderedDict()
+        self.written = 0
+        self.dropped = 0
+        self.failed_batches = 0
+
+    async def start(self) -> None:
+        """Start the background writer"""
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Flush everything queued and stop the writer"""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        while not self._queue.empty():
+            await self._write(self._drain(self.batch_size))
+
+    def record_request(
+        self,
+        model: str,
+        status_code: int,
+        latency_ms: float,
+        prompt: Optional[str] = None,
+        reply: Optional[str] = None,
+        client_id: Optional[str] = None,
+        conversation_id: Optional[str] = None,
+        streamed: bool = False,
+        cached: bool = False,
+        prompt_eval_count: Optional[int] = None,
+        eval_count: Optional[int] = None,
+        error: Optional[str] = None
+    ) -> str:
+        """Queue an audit record (and transcript messages) for one request"""
+        request_id = str(uuid.uuid4())
+        now = datetime.now(timezone.utc)
+        record: Record = []
+        if conversation_id and conversation_id not in self._known_conversations:
+            record.append((Conversation.__table__, {"id": conversation_id, "model": model, "created_at": now}))
+        record.append((ChatRequest.__table__, {
+            "id": request_id,
+            "conversation_id": conversation_id,
+            "client_id": client_id,
+            "model": model,
+            "status_code": status_code,
+            "streamed": streamed,
+            "cached": cached,
+            "latency_ms": latency_ms,
+            "prompt_eval_count": prompt_eval_count,
+            "eval_count": eval_count,
+            "error": error,
+            "created_at": now
+        }))
+        for role, content in (("user", prompt), ("assistant", reply)):
+            if content:
+                record.append((Message.__table__, {
+                    "request_id": request_id,
+                    "conversation_id": conversation_id,
+                    "role": role,
+                    "content": content,
+                    "model": model,
+                    "created_at": now
+                }))
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self.dropped += 1
+        return request_id
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed_batches": self.failed_batches
+        }
+
+    def _drain(self, limit: int) -> List[Record]:
+        batch = []
+        while len(batch) < limit and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            try:
+                while len(batch) < self.batch_size:
+                    batch.extend(self._drain(self.batch_size - len(batch)))
+                    remaining = deadline - loop.time()
+                    if len(batch) >= self.batch_size or remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                    except asyncio.TimeoutError:
+                        break
+            except asyncio.CancelledError:
+                # Stopping: write what was already collected, stop() flushes the rest
+                await self._write(batch)
+                raise
+            # Shield so shutdown doesn't abort a batch mid-write
+            await asyncio.shield(self._write(batch))
+
+    async def _write(self, batch: List[Record]) -> None:
+        if not batch:
+            return
+        rows_by_table, conversations = self._group_rows(batch)
+        try:
+            async with self.engine.begin() as conn:
+                for table in _TABLES:
+                    rows = rows_by_table.get(table)
+                    if rows:
+                        await conn.execute(self._insert(table, conn.dialect.name), rows)
+        except Exception as e:
+            # Conversations stay unmarked, so later requests insert them again
+            self.failed_batches += 1
+            logger.error("Failed to persist %s chat records: %s", len(batch), str(e))
+            return
+        self.written += len(batch)
+        self._remember_conversations(conversations)
+
+    @staticmethod
+    def _group_rows(batch: List[Record]) -> Tuple[Dict[Table, List[Dict[str, Any]]], List[str]]:
+        """Rows of a batch by table, each conversation once, and the conversation ids"""
+        rows_by_table: Dict[Table, List[Dict[str, Any]]] = {}
+        conversations: Dict[str, Dict[str, Any]] = {}
+        for record in batch:
+            for table, row in record:
+                if table is Conversation.__table__:
+                    conversations.setdefault(row["id"], row)
+                else:
+                    rows_by_table.setdefault(table, []).append(row)
+        if conversations:
+            rows_by_table[Conversation.__table__] = list(conversations.values())
+        return rows_by_table, list(conversations)
+
+    def _remember_conversations(self, conversation_ids: List[str]) -> None:
+        for conversation_id in conversation_ids:
+            self._known_conversations[conversation_id] = None
+            self._known_conversations.move_to_end(conversation_id)
+        while len(self._known_conversations) > _KNOWN_CONVERSATIONS:
+            self._known_conversations.popitem(last=False)
+
+    @staticmethod
+    def _insert(table: Table, dialect: str):
+        if table is not Conversation.__table__:
+            return insert(table)
+        # Conversations are inserted with each request until known to be written
+        if dialect == "postgresql":
+            return postgresql.insert(table).on_conflict_do_nothing(index_elements=["id"])
+        if dialect == "sqlite":
+            return sqlite.insert(table).on_conflict_do_nothing(index_elements=["id"])
+        return insert(table)
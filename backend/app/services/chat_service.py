@@ -1,7 +1,26 @@
+import asyncio
 import logging
-from typing import Dict, Any
-from ..models.chat import ChatMessage, ChatResponse
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
+from fastapi import HTTPException
+from ..models.chat import BatchChatRequest, ChatMessage, ChatResponse, GenerationStats
+from ..models.document import RetrievedChunk
+from ..utils.helpers import format_sse
+from ..core import metrics
+from ..core.auth import set_rate_limit_headers
 from .ollama_service import OllamaService
+from .model_catalog import ModelCatalog
+from .admission import AdmissionController
+from .response_cache import ResponseCache
+from .coalescer import RequestCoalescer
+from .session_service import ConversationSession, SessionStore
+from .chat_recorder import ChatRecorder
+from .image_service import ImageService
+from .semantic_cache import SemanticCache
+from .rag_service import RagService
+from .rate_limiter import RateLimiter
+from .usage_meter import UsageMeter
 from app.config import settings
 
 logger = logging.getLogger(__name__)
@@ -9,49 +28,552 @@ logger = logging.getLogger(__name__)
 
 class ChatService:
     """Service for handling chat business logic"""
-    
-    def __init__(self, ollama_service: OllamaService):
+
+    def __init__(
+        self,
+        ollama_service: OllamaService,
+        model_catalog: ModelCatalog,
+        admission: AdmissionController,
+        response_cache: Optional[ResponseCache] = None,
+        coalescer: Optional[RequestCoalescer] = None,
+        session_store: Optional[SessionStore] = None,
+        recorder: Optional[ChatRecorder] = None,
+        image_service: Optional[ImageService] = None,
+        semantic_cache: Optional[SemanticCache] = None,
+        rag_service: Optional[RagService] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        usage_meter: Optional[UsageMeter] = None
+    ):
         self.ollama_service = ollama_service
-    
-    async def process_chat_message(self, message: ChatMessage) -> ChatResponse:
-        """Process a chat message and return AI response"""
+        self.model_catalog = model_catalog
+        self.admission = admission
+        self.response_cache = response_cache
+        self.coalescer = coalescer
+        self.session_store = session_store if session_store is not None else SessionStore()
+        self.recorder = recorder
+        self.image_service = image_service
+        self.semantic_cache = semantic_cache
+        self.rag_service = rag_service
+        self.rate_limiter = rate_limiter
+        self.usage_meter = usage_meter
+        self._inflight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @property
+    def inflight(self) -> int:
+        """Number of chat requests currently being processed"""
+        return self._inflight
+
+    @asynccontextmanager
+    async def _track(self):
+        """Count a request as in flight for graceful draining"""
+        self._inflight += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self._inflight -= 1
+            if self._inflight == 0:
+                self._idle.set()
+
+    async def drain(self, timeout: float) -> bool:
+        """Wait for in-flight requests to finish; return False on timeout"""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning("Shutdown with %s chat requests still in flight", self._inflight)
+            return False
+
+    async def process_chat_message(
+        self,
+        message: ChatMessage,
+        client_id: str = "anonymous",
+        timeout: Optional[float] = None
+    ) -> ChatResponse:
+        """Process a chat message and return AI response
+
+        ``timeout`` overrides the upstream read timeout (used by jobs).
+        """
+        async with self._track():
+            started = time.perf_counter()
+            try:
+                response = await self._process_chat_message(message, client_id, timeout)
+            except Exception as e:
+                self._record(message, client_id, started, error=e)
+                raise
+            self._record(message, client_id, started, response=response)
+            return response
+
+    async def _process_chat_message(
+        self,
+        message: ChatMessage,
+        client_id: str,
+        timeout: Optional[float] = None
+    ) -> ChatResponse:
         try:
-            logger.info(f"Processing chat message for model: {message.model}")
-            
-            # Validate model exists
-            available_models = await self.ollama_service.get_available_models()
-            if available_models and message.model not in available_models:
-                logger.warning(f"Model {message.model} not available, using default")
-                message.model = settings.default_models[0]  # fallback to first default model
-            
-            # Generate AI response
-            ollama_response = await self.ollama_service.generate_response(
-                model=message.model,
-                prompt=message.message,
-                stream=False
+            logger.info("Processing chat message for model: %s", message.model)
+
+            await self._resolve_model(message)
+            await self._check_rate_limit(message, client_id)
+
+            sources = None
+            if message.retrieval is not None:
+                message, sources = await self._retrieve(message)
+
+            response = await self._respond(message, client_id, timeout)
+            response.sources = sources
+            return response
+
+        except Exception as e:
+            logger.error("Error processing chat message: %s", str(e))
+            raise
+
+    async def _respond(
+        self,
+        message: ChatMessage,
+        client_id: str,
+        timeout: Optional[float] = None
+    ) -> ChatResponse:
+        """Answer from a cache or by generating, for a validated model"""
+        if message.session_id:
+            return await self._process_session_turn(message, client_id, timeout)
+
+        # Deterministic requests may be answered from the response cache
+        cache_key = await self._cache_key(message)
+        if cache_key:
+            cached = await self.response_cache.get(cache_key)
+            if cached is not None:
+                logger.info("Response cache hit for model: %s", message.model)
+                return ChatResponse(
+                    response=cached["response"],
+                    model=message.model,
+                    cached=True
+                )
+
+        # Paraphrases of earlier prompts may be answered from the semantic cache
+        partition = await self._semantic_partition(message)
+        embedding = None
+        if partition:
+            cached_response, embedding = await self.semantic_cache.lookup(
+                partition, message.model, message.message
             )
-            
-            # Extract response text
+            if cached_response is not None:
+                logger.info("Semantic cache hit for model: %s", message.model)
+                return ChatResponse(
+                    response=cached_response,
+                    model=message.model,
+                    cached=True
+                )
+
+        # Generate AI response once a slot for the model is free
+        ollama_response = await self._generate(message, client_id, timeout)
+
+        # Extract response text
+        ai_response = ollama_response.get("response", "")
+
+        if not ai_response:
+            logger.warning("Empty response from Ollama")
+            ai_response = settings.error_empty_response
+        else:
+            if cache_key:
+                await self.response_cache.set(cache_key, {"response": ai_response})
+            if embedding is not None:
+                self.semantic_cache.add(partition, embedding, ai_response)
+
+        return ChatResponse(
+            response=ai_response,
+            model=message.model,
+            stats=GenerationStats(**ollama_response)
+        )
+
+    async def _process_session_turn(
+        self,
+        message: ChatMessage,
+        client_id: str,
+        timeout: Optional[float] = None
+    ) -> ChatResponse:
+        """Generate the next turn of a conversation session
+
+        Turns of one session are serialized so each sees the previous reply.
+        Session turns bypass the response cache and request coalescing since
+        their prompt depends on the conversation state.
+        """
+        async with self._session_turn(message.session_id, client_id) as session:
+            prompt, context = session.build_request(message.message, message.model, message.options)
+            images = await self._images(message)
+            async with self.admission.slot(message.model, client_id):
+                ollama_response = await self.ollama_service.generate_response(
+                    model=message.model,
+                    prompt=prompt,
+                    stream=False,
+                    options=message.options,
+                    context=context,
+                    timeout=timeout,
+                    images=images
+                )
+
             ai_response = ollama_response.get("response", "")
-            
             if not ai_response:
                 logger.warning("Empty response from Ollama")
                 ai_response = settings.error_empty_response
-            
-            return ChatResponse(
-                response=ai_response,
-                model=message.model
+            else:
+                session.record_turn(message.message, ai_response, message.model, ollama_response.get("context"))
+
+        return ChatResponse(
+            response=ai_response,
+            model=message.model,
+            session_id=session.id,
+            stats=GenerationStats(**ollama_response)
+        )
+
+    async def stream_chat_message(self, message: ChatMessage, client_id: str = "anonymous") -> AsyncIterator[str]:
+        """Process a chat message and stream the AI response as SSE frames
+
+        Emits one ``token`` event per Ollama chunk and a final ``done`` event
+        carrying Ollama's timing counters plus the measured time-to-first-token.
+        Errors raised before the first frame propagate to the caller so they
+        can still become a proper HTTP status; later errors become an
+        ``error`` event.
+        """
+        async with self._track():
+            serialization = 0.0
+            async for event, data in self._stream_events(message, client_id):
+                encode_started = time.perf_counter()
+                frame = format_sse(data, event=event)
+                serialization += time.perf_counter() - encode_started
+                yield frame
+            metrics.observe_stage(message.model, "serialization", serialization)
+
+    async def stream_chat_events(
+        self,
+        message: ChatMessage,
+        client_id: str = "anonymous"
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """The events of ``stream_chat_message`` as ``(event, data)`` pairs, for other transports"""
+        async with self._track():
+            async for event in self._stream_events(message, client_id):
+                yield event
+
+    async def _stream_events(
+        self,
+        message: ChatMessage,
+        client_id: str
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        logger.info("Streaming chat message for model: %s", message.model)
+        started = time.perf_counter()
+        first_token_at = None
+        reply = []
+        stats = None
+
+        request, sources = await self._prepare_stream(message, client_id, started)
+        chunks = self._stream_chunks(request, client_id)
+        error: Optional[BaseException] = None
+        try:
+            async for chunk in chunks:
+                token = chunk.get("response", "")
+                if token:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        metrics.TIME_TO_FIRST_TOKEN.labels(model=message.model).observe(first_token_at - started)
+                    reply.append(token)
+                    yield "token", {"token": token}
+
+                if chunk.get("done"):
+                    stats = GenerationStats(**chunk)
+                    yield "done", self._done_event(message, stats, started, first_token_at, sources)
+        except HTTPException as e:
+            error = e
+            if first_token_at is None:
+                raise
+            logger.error("Stream interrupted: %s", e.detail)
+            yield "error", {"message": e.detail, "status_code": e.status_code}
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            await chunks.aclose()
+            self._record(
+                message, client_id, started,
+                response=ChatResponse(
+                    response="".join(reply),
+                    model=message.model,
+                    session_id=message.session_id,
+                    stats=stats,
+                    sources=sources
+                ),
+                streamed=True,
+                error=error
             )
-            
+
+    async def _prepare_stream(
+        self,
+        message: ChatMessage,
+        client_id: str,
+        started: float
+    ) -> Tuple[ChatMessage, Optional[List[RetrievedChunk]]]:
+        """Checks before the first token; a failure is recorded and raised"""
+        try:
+            await self._resolve_model(message)
+            await self._check_rate_limit(message, client_id)
+            if message.retrieval is not None:
+                return await self._retrieve(message)
         except Exception as e:
-            logger.error(f"Error processing chat message: {str(e)}")
+            self._record(message, client_id, started, streamed=True, error=e)
             raise
-    
+        return message, None
+
+    @staticmethod
+    def _done_event(
+        message: ChatMessage,
+        stats: GenerationStats,
+        started: float,
+        first_token_at: Optional[float],
+        sources: Optional[List[RetrievedChunk]]
+    ) -> Dict[str, Any]:
+        ttft_ms = None
+        if first_token_at is not None:
+            ttft_ms = round((first_token_at - started) * 1000, 2)
+        done = {
+            "model": message.model,
+            "session_id": message.session_id,
+            "time_to_first_token_ms": ttft_ms,
+            **stats.model_dump()
+        }
+        if sources is not None:
+            done["sources"] = [source.model_dump() for source in sources]
+        return done
+
+    async def process_batch(self, batch: BatchChatRequest, client_id: str = "anonymous") -> AsyncIterator[Dict[str, Any]]:
+        """Answer every item of a batch concurrently, yielding results as they finish
+
+        At most ``parallelism`` items are in flight at once; each still goes
+        through admission control, the cache and coalescing like a single
+        chat request. A failing item yields an error result instead of
+        aborting the batch. Stopping iteration cancels the remaining items.
+        """
+        parallelism = min(batch.parallelism or settings.batch_parallelism, settings.batch_max_parallelism)
+        semaphore = asyncio.Semaphore(parallelism)
+        results: asyncio.Queue = asyncio.Queue()
+
+        async def run(index: int) -> None:
+            item = batch.items[index]
+            result: Dict[str, Any] = {"index": index, "id": item.id}
+            async with semaphore:
+                message = ChatMessage(
+                    message=item.message,
+                    model=item.model or batch.model,
+                    options=item.options if item.options is not None else batch.options
+                )
+                started = time.perf_counter()
+                try:
+                    response = await self.process_chat_message(message, client_id=client_id)
+                    result.update(status_code=200, **response.model_dump(exclude={"session_id"}))
+                except HTTPException as e:
+                    result.update(status_code=e.status_code, model=message.model, error=e.detail)
+                except Exception as e:
+                    logger.error("Error processing batch item %s: %s", index, str(e))
+                    result.update(status_code=500, model=message.model, error=settings.error_internal)
+                result["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            results.put_nowait(result)
+
+        logger.info("Processing batch of %s items with parallelism %s", len(batch.items), parallelism)
+        tasks = [asyncio.create_task(run(index)) for index in range(len(batch.items))]
+        try:
+            for _ in tasks:
+                yield await results.get()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _record(
+        self,
+        message: ChatMessage,
+        client_id: str,
+        started: float,
+        response: Optional[ChatResponse] = None,
+        streamed: bool = False,
+        error: Optional[BaseException] = None
+    ) -> None:
+        """Record the request's metrics and queue its audit record"""
+        latency = time.perf_counter() - started
+        status_code = 200
+        if isinstance(error, HTTPException):
+            status_code = error.status_code
+        elif isinstance(error, (asyncio.CancelledError, GeneratorExit)):
+            status_code = 499  # client went away
+        elif error is not None:
+            status_code = 500
+        endpoint = "stream" if streamed else "chat"
+        metrics.CHAT_REQUESTS.labels(model=message.model, endpoint=endpoint, status=str(status_code)).inc()
+        metrics.CHAT_REQUEST_DURATION.labels(model=message.model, endpoint=endpoint).observe(latency)
+
+        stats = response.stats if response and response.stats else GenerationStats()
+        prompt_tokens, completion_tokens = stats.prompt_eval_count or 0, stats.eval_count or 0
+        if self.rate_limiter is not None and prompt_tokens + completion_tokens:
+            self.rate_limiter.charge(client_id, message.model, prompt_tokens + completion_tokens)
+        if self.usage_meter is not None:
+            self.usage_meter.record(client_id, message.model, prompt_tokens, completion_tokens)
+
+        if self.recorder is None:
+            return
+        self.recorder.record_request(
+            model=message.model,
+            status_code=status_code,
+            latency_ms=round(latency * 1000, 2),
+            prompt=message.message,
+            reply=response.response if response else None,
+            client_id=client_id,
+            conversation_id=message.session_id,
+            streamed=streamed,
+            cached=response.cached if response else False,
+            prompt_eval_count=stats.prompt_eval_count,
+            eval_count=stats.eval_count,
+            error=str(getattr(error, "detail", None) or error or "") or None
+        )
+
+    async def _generate(
+        self,
+        message: ChatMessage,
+        client_id: str,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Run one non-streaming generation, sharing it with identical in-flight requests"""
+        async def generate() -> Dict[str, Any]:
+            images = await self._images(message)
+            async with self.admission.slot(message.model, client_id):
+                return await self.ollama_service.generate_response(
+                    model=message.model,
+                    prompt=message.message,
+                    stream=False,
+                    options=message.options,
+                    timeout=timeout,
+                    images=images
+                )
+
+        if self.coalescer is None:
+            return await generate()
+        key = self.coalescer.make_key(message.model, message.message, message.options, message.images)
+        return await self.coalescer.run(key, generate)
+
+    def _stream_chunks(self, message: ChatMessage, client_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Stream raw Ollama chunks, sharing the stream with identical in-flight requests"""
+        if message.session_id:
+            return self._session_stream_chunks(message, client_id)
+
+        async def upstream() -> AsyncIterator[Dict[str, Any]]:
+            images = await self._images(message)
+            async with self.admission.slot(message.model, client_id):
+                async for chunk in self.ollama_service.stream_response(
+                    model=message.model,
+                    prompt=message.message,
+                    options=message.options,
+                    images=images
+                ):
+                    yield chunk
+
+        if self.coalescer is None:
+            return upstream()
+        key = self.coalescer.make_key(message.model, message.message, message.options, message.images)
+        return self.coalescer.stream(key, upstream)
+
+    async def _session_stream_chunks(self, message: ChatMessage, client_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Stream the next turn of a session, recording it once Ollama is done"""
+        async with self._session_turn(message.session_id, client_id) as session:
+            prompt, context = session.build_request(message.message, message.model, message.options)
+            images = await self._images(message)
+            reply = []
+            async with self.admission.slot(message.model, client_id):
+                async for chunk in self.ollama_service.stream_response(
+                    model=message.model,
+                    prompt=prompt,
+                    options=message.options,
+                    context=context,
+                    images=images
+                ):
+                    reply.append(chunk.get("response", ""))
+                    if chunk.get("done"):
+                        session.record_turn(message.message, "".join(reply), message.model, chunk.get("context"))
+                    yield chunk
+
+    @asynccontextmanager
+    async def _session_turn(self, session_id: str, client_id: str) -> AsyncIterator[ConversationSession]:
+        """Hold the caller's session for one turn, or 404 (also for sessions of other callers)"""
+        async with self.session_store.turn(session_id, client_id) as session:
+            if session is None:
+                raise HTTPException(status_code=404, detail=settings.error_session_not_found)
+            yield session
+
+    async def _cache_key(self, message: ChatMessage) -> Optional[str]:
+        """Response cache key for deterministic requests, else None"""
+        if self.response_cache is None or not self.response_cache.is_cacheable(message.options):
+            return None
+        entry = await self.model_catalog.get_model(message.model)
+        digest = entry.get("digest") if entry else None
+        return self.response_cache.make_key(message.model, digest, message.message, message.options, message.images)
+
+    async def _semantic_partition(self, message: ChatMessage) -> Optional[str]:
+        """Semantic cache partition for text-only requests without retrieval, else None"""
+        # Retrieved context changes as documents do, so it isn't safe to match on
+        if self.semantic_cache is None or message.images or message.retrieval is not None:
+            return None
+        entry = await self.model_catalog.get_model(message.model)
+        digest = entry.get("digest") if entry else None
+        return self.semantic_cache.make_partition(message.model, digest, message.options)
+
+    async def _retrieve(self, message: ChatMessage) -> Tuple[ChatMessage, List[RetrievedChunk]]:
+        """A copy of the message with matching document chunks added to its prompt"""
+        if self.rag_service is None:
+            raise HTTPException(status_code=400, detail=settings.error_retrieval_disabled)
+        started = time.perf_counter()
+        prompt, sources = await self.rag_service.build_prompt(message.message, message.retrieval)
+        metrics.observe_stage(message.model, "retrieval", time.perf_counter() - started)
+        return message.model_copy(update={"message": prompt}), sources
+
+    async def _images(self, message: ChatMessage) -> Optional[List[bytes]]:
+        """Base64 payloads for the images the message refers to"""
+        if not message.images:
+            return None
+        if self.image_service is None:
+            raise HTTPException(status_code=422, detail=settings.error_image_not_found)
+        return await self.image_service.get_encoded(message.images)
+
+    async def _check_rate_limit(self, message: ChatMessage, client_id: str) -> None:
+        """Take a request from the client's limits for the model, or raise 429"""
+        if self.rate_limiter is not None:
+            set_rate_limit_headers(await self.rate_limiter.check(client_id, message.model))
+
+    async def _resolve_model(self, message: ChatMessage) -> None:
+        """Validate the requested model, falling back to a default model
+
+        Fails fast with 503 while every Ollama node's circuit is open, before
+        the request queues for a generation slot.
+        """
+        self.ollama_service.balancer.ensure_available()
+        started = time.perf_counter()
+        available_models = await self.model_catalog.get_models()
+        if available_models and message.model not in available_models:
+            fallback = self._fallback_model(available_models)
+            logger.warning("Model %s not available, using %s", message.model, fallback)
+            message.model = fallback
+        metrics.observe_stage(message.model, "model_validation", time.perf_counter() - started)
+
+    def _fallback_model(self, available_models: List[str]) -> str:
+        """First default model that is installed, preferring one already loaded"""
+        candidates = [model for model in settings.default_models if model in available_models]
+        candidates = candidates or settings.default_models
+        for model in candidates:
+            if self.ollama_service.is_resident(model):
+                return model
+        return candidates[0]
+
     async def get_available_models(self) -> list[str]:
         """Get list of available AI models"""
         try:
-            return await self.ollama_service.get_available_models()
+            return await self.model_catalog.get_models()
         except Exception as e:
-            logger.error(f"Error getting available models: {str(e)}")
+            logger.error("Error getting available models: %s", str(e))
             # Return fallback models
             return settings.default_models
@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+import orjson
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+
+from ..core import metrics
+from ..core.responses import dumps
+from ..models.chat import ChatMessage
+from .chat_service import ChatService
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Close codes; 4408 mirrors HTTP 408 in the application range
+CLOSE_IDLE = 1000
+CLOSE_SLOW_CLIENT = 1008
+CLOSE_HEARTBEAT_TIMEOUT = 4408
+
+
+class ChatSocket:
+    """One client's chat WebSocket, carrying several conversations at once
+
+    Client messages are JSON objects:
+
+    - ``{"type": "chat", "id": "<conversation>", "message": ..., ...}``
+      streams an answer; the other fields are those of ``ChatMessage``;
+    - ``{"type": "cancel", "id": ...}`` stops a conversation's answer and
+      the Ollama generation behind it;
+    - ``{"type": "ping"}`` is answered with a pong; ``{"type": "pong"}``
+      answers the server's pings.
+
+    The server sends ``token``, ``done``, ``error`` and ``cancelled`` frames
+    tagged with the conversation ``id``, carrying the data of the SSE
+    events. After ``ws_heartbeat_interval`` seconds without sending it
+    pings, and a client that sends nothing back within
+    ``ws_heartbeat_timeout`` is disconnected, as is one that has had no
+    conversation running for ``ws_idle_timeout``.
+
+    Frames go out one at a time, each waiting for the server's flow
+    control. A slow reader therefore holds its conversations up, and with
+    them the reads from Ollama: each buffers at most one frame here, plus
+    ``coalescing_stream_window`` chunks when its generation is shared.
+    A client that stops reading for ``ws_send_timeout`` is disconnected.
+    Timeouts are handled in the receive loop, so an idle connection costs
+    one coroutine and no tasks.
+    """
+
+    def __init__(self, websocket: WebSocket, chat_service: ChatService, client_id: str):
+        self.websocket = websocket
+        self.chat_service = chat_service
+        self.client_id = client_id
+        self.streams: Dict[str, asyncio.Task] = {}
+        self._send_lock = asyncio.Lock()
+        self._closed = False
+        self._close_reason: Optional[str] = None
+        now = time.monotonic()
+        self._last_sent = now
+        self._last_active = now
+        self._ping_sent_at: Optional[float] = None
+
+    async def run(self) -> None:
+        """Serve the connection until the client leaves or times out"""
+        await self.websocket.accept()
+        metrics.WEBSOCKET_CONNECTIONS.inc()
+        try:
+            await self._receive_loop()
+        finally:
+            self._closed = True
+            metrics.WEBSOCKET_CONNECTIONS.dec()
+            metrics.WEBSOCKET_CLOSES.labels(reason=self._close_reason or "client").inc()
+            streams = list(self.streams.values())
+            for task in streams:
+                task.cancel()
+            await asyncio.gather(*streams, return_exceptions=True)
+
+    async def _receive_loop(self) -> None:
+        while not self._closed:
+            try:
+                message = await asyncio.wait_for(
+                    self.websocket.receive(),
+                    timeout=max(0.0, self._deadline() - time.monotonic())
+                )
+            except asyncio.TimeoutError:
+                await self._on_timeout()
+                continue
+            if message["type"] == "websocket.disconnect":
+                return
+            self._ping_sent_at = None
+            text = message.get("text")
+            if text is None:
+                text = (message.get("bytes") or b"").decode("utf-8", "replace")
+            await self._handle(text)
+
+    def _deadline(self) -> float:
+        """When the receive loop next needs to act without client input"""
+        if self._ping_sent_at is not None:
+            deadline = self._ping_sent_at + settings.ws_heartbeat_timeout
+        else:
+            deadline = self._last_sent + settings.ws_heartbeat_interval
+        if not self.streams:
+            deadline = min(deadline, self._last_active + settings.ws_idle_timeout)
+        return deadline
+
+    async def _on_timeout(self) -> None:
+        now = time.monotonic()
+        if self._ping_sent_at is not None and now >= self._ping_sent_at + settings.ws_heartbeat_timeout:
+            await self._close(CLOSE_HEARTBEAT_TIMEOUT, "heartbeat timeout", "heartbeat_timeout")
+        elif not self.streams and now >= self._last_active + settings.ws_idle_timeout:
+            await self._close(CLOSE_IDLE, "idle timeout", "idle")
+        elif self._ping_sent_at is None and now >= self._last_sent + settings.ws_heartbeat_interval:
+            self._ping_sent_at = now
+            await self._send({"type": "ping"})
+
+    async def _handle(self, text: str) -> None:
+        try:
+            request = orjson.loads(text)
+        except orjson.JSONDecodeError:
+            request = None
+        if not isinstance(request, dict):
+            await self._error(None, 400, "Messages must be JSON objects")
+            return
+
+        kind, stream_id = request.get("type"), request.get("id")
+        if kind == "chat":
+            await self._start(stream_id, request)
+        elif kind == "cancel":
+            self._last_active = time.monotonic()
+            task = self.streams.get(stream_id)
+            if task is not None:
+                task.cancel()
+        elif kind == "ping":
+            await self._send({"type": "pong"})
+        elif kind != "pong":
+            await self._error(stream_id, 400, f"Unknown message type: {kind}")
+
+    async def _start(self, stream_id: Any, request: Dict[str, Any]) -> None:
+        if not isinstance(stream_id, str) or not stream_id:
+            await self._error(None, 422, "Chat messages need a string id")
+            return
+        if stream_id in self.streams:
+            await self._error(stream_id, 409, "This conversation is already streaming an answer")
+            return
+        if len(self.streams) >= settings.ws_max_streams:
+            await self._error(stream_id, 429, f"At most {settings.ws_max_streams} conversations at once")
+            return
+        try:
+            message = ChatMessage.model_validate({
+                name: value for name, value in request.items() if name not in ("type", "id")
+            })
+        except ValidationError as e:
+            await self._error(stream_id, 422, e.errors(include_url=False, include_context=False))
+            return
+        self._last_active = time.monotonic()
+        self.streams[stream_id] = asyncio.create_task(self._stream(stream_id, message))
+
+    async def _stream(self, stream_id: str, message: ChatMessage) -> None:
+        """Relay one conversation's answer; cancelling the task stops the generation"""
+        metrics.WEBSOCKET_STREAMS.inc()
+        events = self.chat_service.stream_chat_events(message, client_id=self.client_id)
+        try:
+            async for event, data in events:
+                if not await self._send({"type": event, "id": stream_id, **data}):
+                    break
+        except asyncio.CancelledError:
+            await self._send({"type": "cancelled", "id": stream_id})
+        except HTTPException as e:
+            await self._error(stream_id, e.status_code, e.detail, (e.headers or {}).get("Retry-After"))
+        except Exception as e:
+            logger.error("Unexpected error in chat WebSocket stream: %s", str(e))
+            await self._error(stream_id, 500, settings.error_internal)
+        finally:
+            await events.aclose()
+            self.streams.pop(stream_id, None)
+            self._last_active = time.monotonic()
+            metrics.WEBSOCKET_STREAMS.dec()
+
+    async def _error(
+        self,
+        stream_id: Optional[str],
+        status_code: int,
+        message: Any,
+        retry_after: Optional[str] = None
+    ) -> None:
+        frame = {"type": "error", "id": stream_id, "status_code": status_code, "message": message}
+        if retry_after is not None:
+            frame["retry_after"] = int(retry_after)
+        await self._send(frame)
+
+    async def _send(self, frame: Dict[str, Any]) -> bool:
+        """Send one frame; False once the connection is closing or gone"""
+        async with self._send_lock:
+            if self._closed:
+                return False
+            try:
+                await asyncio.wait_for(
+                    self.websocket.send_text(dumps(frame).decode()),
+                    timeout=settings.ws_send_timeout
+                )
+            except asyncio.TimeoutError:
+                logger.warning("Closing chat WebSocket of %s: client stopped reading", self.client_id)
+                await self._close(CLOSE_SLOW_CLIENT, "client too slow", "slow_client")
+                return False
+            except (WebSocketDisconnect, RuntimeError):
+                self._closed = True
+                return False
+            self._last_sent = time.monotonic()
+            return True
+
+    async def _close(self, code: int, reason: str, label: str) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._close_reason = label
+        try:
+            await self.websocket.close(code, reason)
+        except (WebSocketDisconnect, RuntimeError):
+            pass
@@ -0,0 +1,214 @@
+import asyncio
+import itertools
+import logging
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional
+
+from ..utils.helpers import generation_key
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class _SharedCall:
+    """One upstream generation awaited by several identical requests"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class _SharedStream:
+    """One upstream stream fanned out to several subscribers
+
+    At most ``window`` chunks are buffered: the pump waits before reading
+    further from upstream while the slowest subscriber is that far behind,
+    so a stalled client holds the generation back instead of letting it
+    pile up in memory. Late joiners replay the buffer and then follow the
+    live stream, which is possible until the first chunk is dropped.
+    """
+
+    def __init__(self, window: int):
+        self.window = max(1, window)
+        self.chunks: Deque[Dict[str, Any]] = deque()
+        self.start = 0  # stream position of chunks[0]
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.task: Optional[asyncio.Task] = None
+        self._positions: Dict[int, int] = {}
+        self._ids = itertools.count()
+        self._changed = asyncio.Event()
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._positions)
+
+    @property
+    def joinable(self) -> bool:
+        """Whether a new subscriber can still replay the stream from its start"""
+        return self.start == 0
+
+    @property
+    def produced(self) -> int:
+        return self.start + len(self.chunks)
+
+    def join(self) -> int:
+        subscriber = next(self._ids)
+        self._positions[subscriber] = self.start
+        return subscriber
+
+    def leave(self, subscriber: int) -> None:
+        self._positions.pop(subscriber, None)
+        self._notify()
+
+    async def publish(self, chunk: Dict[str, Any]) -> None:
+        """Buffer a chunk once the slowest subscriber is less than a window behind"""
+        while self.produced - min(self._positions.values(), default=self.produced) >= self.window:
+            await self._changed.wait()
+        if len(self.chunks) >= self.window:
+            # Drop what every subscriber has read; the stream stops being joinable
+            slowest = min(self._positions.values(), default=self.produced)
+            while self.start < slowest:
+                self.chunks.popleft()
+                self.start += 1
+        self.chunks.append(chunk)
+        self._notify()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self.done = True
+        self.error = error
+        self._notify()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def subscribe(self, subscriber: int) -> AsyncIterator[Dict[str, Any]]:
+        while True:
+            position = self._positions[subscriber]
+            if position < self.produced:
+                self._positions[subscriber] = position + 1
+                self._notify()
+                yield self.chunks[position - self.start]
+            elif self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            else:
+                await self._changed.wait()
+
+
+class RequestCoalescer:
+    """Single-flight deduplication of identical in-flight generations
+
+    Concurrent requests with the same model, prompt and options share one
+    upstream call. The shared call runs in its own task so one caller
+    disconnecting does not cancel it for the others; it is cancelled only
+    when every caller has gone away. Shared streams buffer at most
+    ``stream_window`` chunks and move at the pace of their slowest reader.
+    """
+
+    def __init__(self, stream_window: Optional[int] = None):
+        self.stream_window = stream_window if stream_window is not None else settings.coalescing_stream_window
+        self._calls: Dict[str, _SharedCall] = {}
+        self._streams: Dict[str, _SharedStream] = {}
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(
+        model: str,
+        prompt: str,
+        options: Optional[Dict[str, Any]],
+        images: Optional[List[str]] = None
+    ) -> str:
+        """Identity of a generation request"""
+        if images:
+            return generation_key(model, prompt, options or {}, images)
+        return generation_key(model, prompt, options or {})
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``factory`` once per key and share its result with all callers"""
+        call = self._calls.get(key)
+        if call is None:
+            call = _SharedCall(asyncio.create_task(factory()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget_call(key, call))
+        else:
+            self.coalesced += 1
+            logger.debug("Joined in-flight generation %s", key[:12])
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Forget it now: the task only finishes on a later loop turn,
+                # and an identical request arriving meanwhile must not join it
+                self._forget_call(key, call)
+                call.task.cancel()
+
+    def _forget_call(self, key: str, call: _SharedCall) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    async def stream(
+        self,
+        key: str,
+        factory: Callable[[], AsyncIterator[Dict[str, Any]]]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Share one upstream stream per key; late joiners replay, then follow live
+
+        A stream that has already dropped its first chunks can't be replayed,
+        so a request arriving after that starts a stream of its own.
+        """
+        shared = self._streams.get(key)
+        if shared is None or not shared.joinable:
+            shared = _SharedStream(self.stream_window)
+            self._streams[key] = shared
+            shared.task = asyncio.create_task(self._pump(key, shared, factory))
+        else:
+            self.coalesced += 1
+            logger.debug("Joined in-flight stream %s", key[:12])
+
+        subscriber = shared.join()
+        try:
+            async for chunk in shared.subscribe(subscriber):
+                yield chunk
+        finally:
+            shared.leave(subscriber)
+            if shared.subscribers == 0 and not shared.task.done():
+                # Nobody is listening any more: close the upstream request,
+                # and start afresh for anyone asking before the pump has stopped
+                self._forget_stream(key, shared)
+                shared.task.cancel()
+
+    async def _pump(
+        self,
+        key: str,
+        shared: _SharedStream,
+        factory: Callable[[], AsyncIterator[Dict[str, Any]]]
+    ) -> None:
+        try:
+            async for chunk in factory():
+                await shared.publish(chunk)
+            shared.finish()
+        except asyncio.CancelledError:
+            shared.finish(asyncio.CancelledError())
+            raise
+        except Exception as e:
+            shared.finish(e)
+        finally:
+            self._forget_stream(key, shared)
+
+    def _forget_stream(self, key: str, shared: _SharedStream) -> None:
+        if self._streams.get(key) is shared:
+            del self._streams[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """In-flight shared generations and how many requests joined one"""
+        return {
+            "inflight_calls": len(self._calls),
+            "inflight_streams": len(self._streams),
+            "coalesced": self.coalesced
+        }
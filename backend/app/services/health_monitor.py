@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .admission import AdmissionController
+from .model_catalog import ModelCatalog
+from .ollama_service import OllamaService
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+UP, DEGRADED, DOWN = "up", "degraded", "down"
+
+
+def _timestamp(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+
+
+class HealthMonitor:
+    """Keeps the health of upstream dependencies in memory
+
+    A background task refreshes a snapshot every ``health_probe_interval``
+    seconds, so health endpoints never wait on upstreams, however often
+    load balancers and orchestrators poll them. Ollama is not probed
+    again here. Its status comes from the load balancer's own /api/ps
+    probes and circuit breakers. The database gets a ``SELECT 1`` with a
+    timeout.
+
+    Readiness is computed on demand from in-memory state only: some Ollama
+    node must be healthy with its circuit not open, the database (if used)
+    must answer, the admission queue must not be close to full, and the
+    service must not be shutting down.
+    """
+
+    def __init__(
+        self,
+        ollama_service: OllamaService,
+        model_catalog: ModelCatalog,
+        admission: AdmissionController,
+        engine: Optional[AsyncEngine] = None,
+        interval: Optional[float] = None
+    ):
+        self.ollama_service = ollama_service
+        self.model_catalog = model_catalog
+        self.admission = admission
+        self.engine = engine
+        self.interval = interval or settings.health_probe_interval
+        self.shutting_down = False
+        self._database: Optional[Dict[str, Any]] = None
+        self._snapshot: Dict[str, Any] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Take a first snapshot and keep refreshing it in the background"""
+        await self.refresh()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Report not ready from now on and stop refreshing"""
+        self.shutting_down = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def snapshot(self) -> Dict[str, Any]:
+        """Latest overall status and per-dependency checks"""
+        return self._snapshot
+
+    async def refresh(self) -> None:
+        """Probe what needs probing and rebuild the snapshot"""
+        if self.engine is not None:
+            self._database = await self._check_database()
+        checks = {"ollama": self._check_ollama(), "model_catalog": self._check_catalog()}
+        if self._database is not None:
+            checks["database"] = self._database
+        if checks["ollama"]["status"] == DOWN:
+            status = "unhealthy"
+        elif any(check["status"] != UP for check in checks.values()):
+            status = "degraded"
+        else:
+            status = "healthy"
+        self._snapshot = {"status": status, "checked_at": _timestamp(time.time()), "checks": checks}
+
+    def readiness(self) -> Dict[str, Any]:
+        """Whether to send traffic here, with the reasons if not"""
+        reasons: List[str] = []
+        if self.shutting_down:
+            reasons.append("shutting down")
+        backends = self.ollama_service.balancer.backends
+        if not any(backend.available and backend.breaker.allows() for backend in backends):
+            reasons.append("no Ollama node available (unhealthy or circuit open)")
+        if self._database is not None and self._database["status"] != UP:
+            reasons.append("database unreachable")
+        limit = self.admission.max_queue * settings.readiness_queue_threshold
+        if self.admission.max_queue and self.admission.queued >= limit:
+            reasons.append(f"admission queue saturated ({self.admission.queued}/{self.admission.max_queue})")
+        return {
+            "ready": not reasons,
+            "reasons": reasons,
+            "circuits": {backend.url: backend.breaker.state for backend in backends},
+            "queued": self.admission.queued,
+            "active": self.admission.active
+        }
+
+    def _check_ollama(self) -> Dict[str, Any]:
+        backends = self.ollama_service.balancer.backends
+        healthy = [backend for backend in backends if backend.healthy]
+        latencies = [backend.probe_latency for backend in healthy if backend.probe_latency is not None]
+        probed = [backend.last_probe for backend in backends if backend.last_probe is not None]
+        errors = [f"{backend.url}: {backend.last_error}" for backend in backends if not backend.healthy]
+        return {
+            "status": DOWN if not healthy else UP if len(healthy) == len(backends) else DEGRADED,
+            "latency_ms": round(min(latencies) * 1000, 2) if latencies else None,
+            "checked_at": _timestamp(time.time() - (time.monotonic() - max(probed))) if probed else None,
+            "error": "; ".join(errors) or None,
+            "details": {
+                "healthy_backends": len(healthy),
+                "backends": len(backends),
+                "circuits": {backend.url: backend.breaker.state for backend in backends}
+            }
+        }
+
+    def _check_catalog(self) -> Dict[str, Any]:
+        if not self.model_catalog.populated:
+            status = DOWN
+        else:
+            status = DEGRADED if self.model_catalog.is_stale else UP
+        return {
+            "status": status,
+            "latency_ms": None,
+            "checked_at": None,
+            "error": None,
+            "details": {"models": len(self.model_catalog.cached_models() or []), "age_seconds": self.model_catalog.age}
+        }
+
+    async def _check_database(self) -> Dict[str, Any]:
+        started = time.perf_counter()
+        error = None
+        try:
+            await asyncio.wait_for(self._select_one(), timeout=settings.health_probe_timeout)
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            if self._database is None or self._database["status"] == UP:
+                logger.warning("Database health probe failed: %s", error)
+        return {
+            "status": DOWN if error else UP,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+            "checked_at": _timestamp(time.time()),
+            "error": error,
+            "details": {}
+        }
+
+    async def _select_one(self) -> None:
+        async with self.engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error("Health refresh failed: %s", str(e))
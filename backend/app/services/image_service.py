@@ -0,0 +1,147 @@
+import asyncio
+import binascii
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from app.config import settings
+from .response_cache import CacheBackend, MemoryCacheBackend
+
+logger = logging.getLogger(__name__)
+
+# Multiple of 3 so chunks encode without padding and concatenate cleanly
+_B64_CHUNK = 3 * 64 * 1024
+
+ALLOWED_FORMATS = {"JPEG", "PNG", "WEBP", "GIF", "BMP"}
+
+
+def b64encode_chunked(data: bytes) -> bytes:
+    """Base64-encode into one preallocated buffer, a chunk at a time
+
+    Slices of a memoryview avoid copying the input, and the output is
+    written in place, so peak memory stays at input + output size.
+    """
+    view = memoryview(data)
+    encoded = bytearray(4 * ((len(data) + 2) // 3))
+    position = 0
+    for offset in range(0, len(view), _B64_CHUNK):
+        chunk = binascii.b2a_base64(view[offset:offset + _B64_CHUNK], newline=False)
+        encoded[position:position + len(chunk)] = chunk
+        position += len(chunk)
+    return bytes(encoded)
+
+
+def process_image(data: bytes, max_side: int, quality: int, max_pixels: int) -> bytes:
+    """Decode, orient, downscale and re-encode an image as base64 JPEG
+
+    CPU-bound; runs in the image worker pool. Vision models work at a few
+    hundred pixels per side, so shrinking uploads first cuts the bytes
+    sent to Ollama and its decode time.
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+    except UnidentifiedImageError:
+        raise HTTPException(status_code=415, detail="Unsupported image format")
+    if image.format not in ALLOWED_FORMATS:
+        raise HTTPException(status_code=415, detail=f"Unsupported image format: {image.format}")
+    if image.width * image.height > max_pixels:
+        raise HTTPException(status_code=413, detail="Image dimensions too large")
+
+    # Let the JPEG decoder downscale by a power of two while decoding
+    image.draft("RGB", (max_side, max_side))
+    image = ImageOps.exif_transpose(image)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=quality, optimize=True)
+    return b64encode_chunked(output.getbuffer())
+
+
+class ImageService:
+    """Prepares uploaded images for Ollama's ``images`` field
+
+    Processing runs on a thread pool (Pillow releases the GIL while
+    decoding and resampling) so the event loop is never blocked. Results
+    are cached by the SHA-256 of the uploaded bytes, so the same image sent
+    again, e.g. later in a conversation, is neither re-processed nor
+    re-encoded; clients can also reference it by that hash. The cache is
+    in-process unless another backend is given (with several workers, the
+    shared-state server's, so an image uploaded to one worker can be used
+    through any other).
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        max_side: Optional[int] = None,
+        quality: Optional[int] = None,
+        cache: Optional[CacheBackend] = None
+    ):
+        self.max_side = max_side or settings.image_max_side
+        self.quality = quality or settings.image_jpeg_quality
+        self.max_pixels = settings.image_max_pixels
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers or settings.image_workers or min(4, os.cpu_count() or 1),
+            thread_name_prefix="image"
+        )
+        self._cache = cache if cache is not None else MemoryCacheBackend(
+            max_entries=settings.image_cache_max_entries,
+            max_bytes=settings.image_cache_max_bytes
+        )
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.processed = 0
+        self.hits = 0
+
+    async def add(self, data: bytes, digest: str) -> str:
+        """Process an uploaded image (unless cached) and return its ID (content hash)"""
+        if await self._cache.get(digest) is not None:
+            self.hits += 1
+            return digest
+        pending = self._pending.get(digest)
+        if pending is not None:
+            # Same image already being processed by a concurrent request
+            self.hits += 1
+            await asyncio.shield(pending)
+            return digest
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self._executor, process_image, bytes(data), self.max_side, self.quality, self.max_pixels
+        )
+        self._pending[digest] = future
+        try:
+            encoded = await asyncio.shield(future)
+        finally:
+            self._pending.pop(digest, None)
+        await self._cache.set(digest, encoded)
+        self.processed += 1
+        return digest
+
+    async def get_encoded(self, image_ids: List[str]) -> List[bytes]:
+        """Base64 payloads for previously added images"""
+        encoded = []
+        for image_id in image_ids:
+            value = await self._cache.get(image_id)
+            if value is None:
+                raise HTTPException(status_code=422, detail=f"{settings.error_image_not_found}: {image_id}")
+            encoded.append(value)
+        return encoded
+
+    def close(self) -> None:
+        """Shut down the worker pool"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "processed": self.processed,
+            "cache_hits": self.hits,
+            "processing": len(self._pending),
+            "cache": self._cache.stats()
+        }
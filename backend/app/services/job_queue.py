@@ -0,0 +1,647 @@
+import asyncio
+import heapq
+import importlib
+import itertools
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import suppress
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set
+
+import structlog
+from fastapi import HTTPException
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from ..models.chat import ChatMessage
+from ..models.db import Job as JobRow
+from ..models.job import JobRequest
+from ..core.database import create_session_factory
+from .admission import set_background_admission
+from .chat_service import ChatService
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+EXPIRED = "expired"  # deadline passed before the job could finish
+
+FINISHED = (SUCCEEDED, FAILED, CANCELLED, EXPIRED)
+
+
+class Job:
+    """One asynchronous chat generation and its lifecycle
+
+    Timestamps are Unix times. Watchers wait on ``changed()``, which fires on
+    every status transition.
+    """
+
+    def __init__(
+        self,
+        request: JobRequest,
+        client_id: str = "anonymous",
+        job_id: Optional[str] = None,
+        created_at: Optional[float] = None
+    ):
+        self.id = job_id or str(uuid.uuid4())
+        self.request = request
+        self.client_id = client_id
+        self.priority = request.priority
+        self.status = QUEUED
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = created_at or time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.deadline_at = self.created_at + request.deadline if request.deadline else None
+        self.expires_at: Optional[float] = None
+        self.claimed_by: Optional[str] = None
+        self.lease_expires_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def changed(self) -> asyncio.Event:
+        """Event set on the next status transition"""
+        return self._changed
+
+    def transition(self, status: str, error: Optional[str] = None) -> None:
+        now = time.time()
+        self.status = status
+        if status == RUNNING:
+            self.started_at = now
+        elif status in FINISHED:
+            self.finished_at = now
+            self.error = error
+            self.expires_at = now + (self.request.result_ttl or settings.job_result_ttl)
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "priority": self.priority,
+            "model": self.request.model,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "deadline_at": self.deadline_at,
+            "expires_at": self.expires_at
+        }
+
+
+class JobBackend(ABC):
+    """Durable storage for jobs so queued work and results survive restarts
+
+    A backend used by several processes at once (``shared``) must make
+    ``claim``, ``renew`` and ``update`` atomic, so that a job runs in one
+    process at a time and a process that lost a job can't overwrite it.
+    The defaults suit storage private to one process.
+    """
+
+    shared = False
+
+    @abstractmethod
+    async def save(self, job: Job) -> None:
+        """Insert or update a job"""
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Optional[Job]:
+        """Load a job by ID"""
+
+    @abstractmethod
+    async def load_unfinished(self) -> List[Job]:
+        """Jobs waiting to run: queued, or running under a lease that expired"""
+
+    @abstractmethod
+    async def purge_expired(self, now: float) -> int:
+        """Delete finished jobs whose result TTL has passed"""
+
+    async def claim(self, job: Job) -> bool:
+        """Write a job just marked running under its ``claimed_by`` lease
+
+        False if it is no longer queued or another process holds it.
+        """
+        await self.save(job)
+        return True
+
+    async def renew(self, job_ids: Iterable[str], owner: str, lease_until: float) -> Set[str]:
+        """Extend ``owner``'s leases; returns the IDs it still holds"""
+        return set(job_ids)
+
+    async def update(self, job: Job, owner: Optional[str]) -> bool:
+        """Write an unfinished job's new state if ``owner`` (None: nobody) still holds it"""
+        await self.save(job)
+        return True
+
+    async def close(self) -> None:
+        """Release backend resources"""
+
+
+class MemoryJobBackend(JobBackend):
+    """In-process storage; nothing survives a restart"""
+
+    def __init__(self):
+        self._jobs: Dict[str, Job] = {}
+
+    async def save(self, job: Job) -> None:
+        self._jobs[job.id] = job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    async def load_unfinished(self) -> List[Job]:
+        return [job for job in self._jobs.values() if not job.finished]
+
+    async def purge_expired(self, now: float) -> int:
+        expired = [job_id for job_id, job in self._jobs.items() if job.expires_at and job.expires_at <= now]
+        for job_id in expired:
+            del self._jobs[job_id]
+        return len(expired)
+
+
+class DatabaseJobBackend(JobBackend):
+    """Jobs stored in the ``jobs`` table (SQLite locally, PostgreSQL in production)
+
+    Several processes can share the table: a job is claimed with a
+    conditional UPDATE that only succeeds while it is queued or its
+    previous holder's lease has expired, and writes by a holder only land
+    while it still holds the job.
+    """
+
+    shared = True
+
+    def __init__(self, engine: AsyncEngine):
+        self._sessions = create_session_factory(engine)
+
+    async def save(self, job: Job) -> None:
+        async with self._sessions() as session:
+            await session.merge(JobRow(
+                id=job.id,
+                priority=job.priority,
+                client_id=job.client_id,
+                request=job.request.model_dump_json(),
+                created_at=job.created_at,
+                deadline_at=job.deadline_at,
+                **self._state(job)
+            ))
+            await session.commit()
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        async with self._sessions() as session:
+            row = await session.get(JobRow, job_id)
+        return self._to_job(row) if row else None
+
+    async def load_unfinished(self) -> List[Job]:
+        async with self._sessions() as session:
+            rows = await session.scalars(select(JobRow).where(or_(
+                JobRow.status == QUEUED,
+                and_(JobRow.status == RUNNING, self._lease_expired(time.time()))
+            )))
+            return [self._to_job(row) for row in rows]
+
+    async def claim(self, job: Job) -> bool:
+        return await self._execute(
+            update(JobRow)
+            .where(
+                JobRow.id == job.id,
+                or_(JobRow.status == QUEUED, and_(JobRow.status == RUNNING, self._lease_expired(time.time())))
+            )
+            .values(**self._state(job))
+        ) == 1
+
+    async def renew(self, job_ids: Iterable[str], owner: str, lease_until: float) -> Set[str]:
+        job_ids = list(job_ids)
+        if not job_ids:
+            return set()
+        held = (JobRow.id.in_(job_ids), JobRow.claimed_by == owner, JobRow.status == RUNNING)
+        async with self._sessions() as session:
+            await session.execute(
+                update(JobRow).where(*held).values(lease_expires_at=lease_until),
+                execution_options={"synchronize_session": False}
+            )
+            still_held = set(await session.scalars(select(JobRow.id).where(*held)))
+            await session.commit()
+        return still_held
+
+    async def update(self, job: Job, owner: Optional[str]) -> bool:
+        holder = JobRow.claimed_by.is_(None) if owner is None else JobRow.claimed_by == owner
+        return await self._execute(
+            update(JobRow)
+            .where(JobRow.id == job.id, JobRow.status.in_([QUEUED, RUNNING]), holder)
+            .values(**self._state(job))
+        ) == 1
+
+    async def _execute(self, statement) -> int:
+        async with self._sessions() as session:
+            result = await session.execute(statement, execution_options={"synchronize_session": False})
+            await session.commit()
+            return result.rowcount or 0
+
+    @staticmethod
+    def _lease_expired(now: float):
+        # Rows without a lease were written before leases existed
+        return or_(JobRow.lease_expires_at.is_(None), JobRow.lease_expires_at < now)
+
+    @staticmethod
+    def _state(job: Job) -> Dict[str, Any]:
+        """The columns that change over a job's lifecycle"""
+        return {
+            "status": job.status,
+            "result": json.dumps(job.result) if job.result is not None else None,
+            "error": job.error,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+            "expires_at": job.expires_at,
+            "claimed_by": job.claimed_by,
+            "lease_expires_at": job.lease_expires_at
+        }
+
+    async def purge_expired(self, now: float) -> int:
+        async with self._sessions() as session:
+            result = await session.execute(delete(JobRow).where(JobRow.expires_at <= now))
+            await session.commit()
+            return result.rowcount or 0
+
+    @staticmethod
+    def _to_job(row: JobRow) -> Job:
+        job = Job(JobRequest.model_validate_json(row.request), row.client_id, row.id, row.created_at)
+        job.status = row.status
+        job.result = json.loads(row.result) if row.result else None
+        job.error = row.error
+        job.started_at = row.started_at
+        job.finished_at = row.finished_at
+        job.deadline_at = row.deadline_at
+        job.expires_at = row.expires_at
+        job.claimed_by = row.claimed_by
+        job.lease_expires_at = row.lease_expires_at
+        return job
+
+
+def create_job_backend(spec: Optional[str] = None, engine: Optional[AsyncEngine] = None) -> JobBackend:
+    """Build the configured backend: ``memory``, ``database`` or a ``module:Class`` path
+
+    Custom backends are constructed with no arguments.
+    """
+    spec = spec or settings.job_backend
+    if spec == "memory":
+        return MemoryJobBackend()
+    if spec == "database":
+        if engine is None:
+            raise ValueError("The database job backend needs a database engine")
+        return DatabaseJobBackend(engine)
+    module_name, _, class_name = spec.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+class JobQueue:
+    """Priority queue of chat jobs drained by a fixed pool of worker tasks
+
+    Submitting returns immediately; workers take the highest-priority job
+    (FIFO within a priority) and run it through ``ChatService`` with a long
+    upstream timeout, so generations are not bound by the client's HTTP
+    timeout. Every transition is written to the backend; with a durable
+    backend, jobs queued or running at shutdown are picked up again on the
+    next start. Finished jobs are kept until their result TTL passes.
+
+    With a backend shared by several processes, a worker claims a job
+    before running it and renews its lease while it runs. Jobs are only
+    taken over, at start and on every sweep, once their lease has expired,
+    so a job still running elsewhere is never started twice.
+    """
+
+    def __init__(
+        self,
+        chat_service: ChatService,
+        backend: Optional[JobBackend] = None,
+        workers: Optional[int] = None,
+        max_queued: Optional[int] = None
+    ):
+        self.chat_service = chat_service
+        self.backend = backend or MemoryJobBackend()
+        self.workers = workers or settings.job_workers
+        self.max_queued = max_queued or settings.job_max_queued
+        self.lease = settings.job_lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._jobs: Dict[str, Job] = {}
+        self._heap: List[Any] = []
+        self._seq = itertools.count()
+        self._available = asyncio.Condition()
+        self._queued = 0
+        self._tasks: List[asyncio.Task] = []
+        self._sweeper: Optional[asyncio.Task] = None
+        self._renewer: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    async def start(self) -> None:
+        """Recover unfinished jobs from the backend and start the workers"""
+        recovered = await self._recover()
+        if recovered:
+            logger.info("Recovered %s unfinished jobs", recovered)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._sweeper = asyncio.create_task(self._sweep_loop())
+        if self.backend.shared:
+            self._renewer = asyncio.create_task(self._renew_loop())
+
+    async def stop(self, timeout: float = 0) -> None:
+        """Stop the workers, giving running jobs up to ``timeout`` seconds
+
+        Jobs still running after that are interrupted and saved as queued so
+        a durable backend runs them again after the restart.
+        """
+        self._stopping = True
+        running = [job.task for job in self._jobs.values() if job.task and not job.task.done()]
+        if running and timeout:
+            await asyncio.wait(running, timeout=timeout)
+        tasks = self._tasks + [task for task in (self._sweeper, self._renewer) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._sweeper = self._renewer = None
+        for job in self._jobs.values():
+            if job.status == RUNNING and job.claimed_by == self.owner:
+                job.status = QUEUED
+                job.claimed_by = job.lease_expires_at = None
+                await self._write(job, self.owner)
+        await self.backend.close()
+
+    async def submit(self, request: JobRequest, client_id: str = "anonymous") -> Job:
+        """Queue a job and return it immediately"""
+        if self._queued >= self.max_queued:
+            raise HTTPException(status_code=429, detail=settings.error_job_queue_full)
+        job = Job(request, client_id)
+        self._jobs[job.id] = job
+        await self.backend.save(job)
+        await self._enqueue(job)
+        logger.info("Queued job %s for model %s with priority %s", job.id, request.model, job.priority)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        """Look up a job (falling back to the durable backend)
+
+        With a shared backend, a job queued here may have been claimed by
+        another process, so only the backend's copy is current.
+        """
+        job = self._jobs.get(job_id)
+        if job is None or (self.backend.shared and job.status == QUEUED):
+            job = await self.backend.get(job_id) or job
+        if job is not None and job.expires_at and job.expires_at <= time.time():
+            return None
+        return job
+
+    async def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a queued or running job; finished jobs are returned unchanged"""
+        job = self._jobs.get(job_id)
+        if job is not None and job.status == RUNNING and job.task is not None:
+            job.task.cancel()
+            return job
+        if job is not None and job.status == QUEUED:
+            self._queued -= 1  # its heap entry is skipped when popped
+            job.transition(CANCELLED)
+            if await self._write(job, None) is not False:
+                return job
+            # Another process claimed it meanwhile
+            self._forget(job)
+        if self.backend.shared:
+            return await self._cancel_elsewhere(job_id)
+        return await self.get(job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Job]:
+        """Long-poll: return the job once finished or after ``timeout`` seconds"""
+        job = await self.get(job_id)
+        deadline = time.monotonic() + timeout
+        while job is not None and not job.finished:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            await self._next_change(job.changed(), remaining)
+            job = await self.get(job_id) or job
+        return job
+
+    async def watch(self, job: Job) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the job's state now and after every change until it finishes"""
+        state = job.to_dict()
+        yield state
+        while not job.finished:
+            changed = job.changed()
+            if job.to_dict() == state:
+                await self._next_change(changed)
+            job = await self.get(job.id) or job
+            if job.to_dict() != state:
+                state = job.to_dict()
+                yield state
+
+    def stats(self) -> Dict[str, Any]:
+        by_status: Dict[str, int] = {}
+        for job in self._jobs.values():
+            by_status[job.status] = by_status.get(job.status, 0) + 1
+        return {"queued": self._queued, "workers": self.workers, "jobs": by_status}
+
+    async def _next_change(self, changed: asyncio.Event, timeout: Optional[float] = None) -> None:
+        """Wait for a transition here, or, with a shared backend, at most a poll interval
+
+        Transitions made by other processes don't fire local events, so
+        jobs there are re-read from the backend instead.
+        """
+        if self.backend.shared:
+            timeout = min(timeout or settings.job_poll_interval, settings.job_poll_interval)
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(changed.wait(), timeout=timeout)
+
+    async def _cancel_elsewhere(self, job_id: str) -> Optional[Job]:
+        """Cancel a job in the shared backend that this process doesn't run
+
+        Its holder notices on the next lease renewal and stops it.
+        """
+        for _ in range(3):
+            job = await self.backend.get(job_id)
+            if job is None or job.finished:
+                break
+            holder = job.claimed_by
+            job.claimed_by = job.lease_expires_at = None
+            job.transition(CANCELLED)
+            if await self._write(job, holder) is not False:
+                return job
+        # Finished meanwhile, or kept changing hands
+        return await self.get(job_id)
+
+    async def _enqueue(self, job: Job) -> None:
+        async with self._available:
+            heapq.heappush(self._heap, (-job.priority, next(self._seq), job.id))
+            self._queued += 1
+            self._available.notify()
+
+    async def _next_job(self) -> Job:
+        async with self._available:
+            while True:
+                while not self._heap or self._stopping:
+                    await self._available.wait()
+                _, _, job_id = heapq.heappop(self._heap)
+                job = self._jobs.get(job_id)
+                if job is not None and job.status == QUEUED:
+                    self._queued -= 1
+                    return job
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._next_job()
+            if job.deadline_at is not None and job.deadline_at <= time.time():
+                job.transition(EXPIRED, settings.error_job_deadline)
+                if await self._write(job, None) is False:
+                    self._forget(job)
+                continue
+            if not await self._claim(job):
+                continue
+            job.task = asyncio.create_task(self._execute(job))
+            try:
+                await asyncio.shield(job.task)
+            except asyncio.CancelledError:
+                if not job.task.done():
+                    # The worker itself is being stopped
+                    job.task.cancel()
+                    await asyncio.gather(job.task, return_exceptions=True)
+                raise
+
+    async def _execute(self, job: Job) -> None:
+        # Runs in its own task, so these stay local to this job: its log
+        # binding, and waiting for generation slots behind interactive
+        # requests instead of failing on the interactive queue limits
+        structlog.contextvars.bind_contextvars(job_id=job.id)
+        set_background_admission()
+        remaining = job.deadline_at - time.time() if job.deadline_at is not None else None
+        message = ChatMessage(**job.request.model_dump(include=set(ChatMessage.model_fields)))
+        try:
+            response = await asyncio.wait_for(
+                self.chat_service.process_chat_message(
+                    message,
+                    client_id=job.client_id,
+                    timeout=settings.job_ollama_timeout
+                ),
+                timeout=remaining
+            )
+        except asyncio.TimeoutError:
+            job.transition(EXPIRED, settings.error_job_deadline)
+        except asyncio.CancelledError:
+            if self._stopping:
+                raise
+            job.transition(CANCELLED)
+        except HTTPException as e:
+            job.transition(FAILED, e.detail)
+        except Exception as e:
+            logger.error("Job %s failed: %s", job.id, str(e))
+            job.transition(FAILED, settings.error_internal)
+        else:
+            job.result = response.model_dump()
+            job.transition(SUCCEEDED)
+        # Persist from inside the job task so stop() waiting on it sees the save
+        job.claimed_by = job.lease_expires_at = None
+        written = await self._write(job, self.owner)
+        if written is None and job.status != FAILED:
+            job.result = None
+            job.transition(FAILED, settings.error_job_not_saved)
+            written = await self._write(job, self.owner)
+        if written is False:
+            logger.warning("Job %s was cancelled or taken over elsewhere; discarding its outcome here", job.id)
+            self._forget(job)
+
+    async def _claim(self, job: Job) -> bool:
+        """Take a popped job to run here, recording it as running under a lease"""
+        job.claimed_by, job.lease_expires_at = self.owner, time.time() + self.lease
+        job.transition(RUNNING)
+        try:
+            claimed = await self.backend.claim(job)
+        except Exception as e:
+            logger.error("Failed to claim job %s: %s", job.id, str(e))
+            # Not recorded as running, so a restart couldn't recover it either
+            job.claimed_by = job.lease_expires_at = None
+            job.transition(FAILED, settings.error_job_not_saved)
+            await self._write(job, None)
+            return False
+        if not claimed:
+            # Another process is running it, or it was cancelled there
+            self._forget(job)
+        return claimed
+
+    async def _write(self, job: Job, owner: Optional[str]) -> Optional[bool]:
+        """Write a job held by ``owner`` (None: nobody) to the backend
+
+        Returns False if another process holds the job now, and None
+        (logged) on storage errors. Those must not escape into a worker
+        task, or each one would permanently take a worker out of the pool.
+        """
+        try:
+            return await self.backend.update(job, owner)
+        except Exception as e:
+            logger.error("Failed to save job %s: %s", job.id, str(e))
+            return None
+
+    def _forget(self, job: Job) -> None:
+        """Drop the local copy of a job another process has taken"""
+        if self._jobs.get(job.id) is job:
+            del self._jobs[job.id]
+
+    async def _recover(self) -> int:
+        """Queue the backend's jobs that nobody runs: queued, or with an expired lease"""
+        recovered = 0
+        for job in await self.backend.load_unfinished():
+            if job.id in self._jobs:
+                continue
+            job.status = QUEUED  # its holder stopped renewing the lease; run it again
+            job.claimed_by = job.lease_expires_at = None
+            self._jobs[job.id] = job
+            await self._enqueue(job)
+            recovered += 1
+        return recovered
+
+    async def _renew_loop(self) -> None:
+        """Extend the leases of jobs running here; stop those another process took over"""
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            running = {
+                job.id: job for job in self._jobs.values()
+                if job.status == RUNNING and job.claimed_by == self.owner
+            }
+            if not running:
+                continue
+            lease_until = time.time() + self.lease
+            try:
+                held = await self.backend.renew(running, self.owner, lease_until)
+            except Exception as e:
+                logger.warning("Failed to renew job leases: %s", str(e))
+                continue
+            for job_id, job in running.items():
+                if job_id in held:
+                    job.lease_expires_at = lease_until
+                elif job.task is not None and not job.task.done():
+                    logger.warning("Job %s is no longer held by this process; stopping it", job_id)
+                    job.task.cancel()
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.job_sweep_interval)
+            now = time.time()
+            for job_id in [job_id for job_id, job in self._jobs.items() if job.expires_at and job.expires_at <= now]:
+                del self._jobs[job_id]
+            try:
+                await self.backend.purge_expired(now)
+                if self.backend.shared:
+                    recovered = await self._recover()
+                    if recovered:
+                        logger.info("Took over %s jobs from other processes", recovered)
+            except Exception as e:
+                logger.warning("Failed to purge or recover jobs: %s", str(e))
@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Collection, Dict, List, Optional, Set
+
+import httpx
+from fastapi import HTTPException
+from app.config import settings
+from ..core import metrics
+from .resilience import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+
+class Backend:
+    """One Ollama node and its routing state"""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.healthy = True
+        self.draining = False
+        self.loaded_models: Set[str] = set()
+        self.resident: Dict[str, Dict[str, Any]] = {}  # /api/ps entries by model name
+        self.consecutive_failures = 0
+        self.requests = 0
+        self.errors = 0
+        self.avg_latency = 0.0
+        self.last_error: Optional[str] = None
+        self.last_probe: Optional[float] = None
+        self.probe_latency: Optional[float] = None
+        self.breaker = CircuitBreaker(self.url)
+
+    @property
+    def available(self) -> bool:
+        """Whether new requests may be routed here"""
+        return self.healthy and not self.draining
+
+    def record_success(self, latency: float) -> None:
+        self.requests += 1
+        self.consecutive_failures = 0
+        if self.avg_latency:
+            self.avg_latency = 0.8 * self.avg_latency + 0.2 * latency
+        else:
+            self.avg_latency = latency
+
+    def record_failure(self, error: str) -> None:
+        self.requests += 1
+        self.errors += 1
+        self.consecutive_failures += 1
+        self.last_error = error
+        if self.healthy and self.consecutive_failures >= settings.lb_failure_threshold:
+            self.healthy = False
+            logger.warning("Ejecting Ollama backend %s after %s failures", self.url, self.consecutive_failures)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "draining": self.draining,
+            "outstanding": self.outstanding,
+            "loaded_models": sorted(self.loaded_models),
+            "requests": self.requests,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.requests, 4) if self.requests else 0.0,
+            "avg_latency_ms": round(self.avg_latency * 1000, 2),
+            "probe_latency_ms": round(self.probe_latency * 1000, 2) if self.probe_latency is not None else None,
+            "last_error": self.last_error,
+            "circuit": self.breaker.stats()
+        }
+
+
+def _is_backend_failure(error: BaseException) -> bool:
+    """Whether an error says something about the node rather than the request"""
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    if isinstance(error, HTTPException):
+        return error.status_code >= 500
+    return False
+
+
+class LoadBalancer:
+    """Health-aware routing across several Ollama nodes
+
+    Requests go to an available node that already has the model loaded when
+    possible (avoiding a cold load), otherwise to the node with the fewest
+    outstanding requests. Nodes are ejected after repeated failures or a
+    failed probe and re-admitted by the next successful probe. Draining
+    nodes finish their in-flight work but receive nothing new.
+
+    Each node also has a circuit breaker. While every node's circuit is
+    open, requests fail immediately with 503 instead of waiting on a node
+    that keeps erroring or timing out.
+    """
+
+    def __init__(self, urls: List[str], probe_interval: Optional[float] = None):
+        if not urls:
+            raise ValueError("LoadBalancer needs at least one backend URL")
+        self.backends = [Backend(url) for url in urls]
+        self.probe_interval = probe_interval or settings.lb_probe_interval
+        self._prober: Optional[asyncio.Task] = None
+
+    def get(self, url: str) -> Backend:
+        """Look up a backend by URL"""
+        url = url.rstrip("/")
+        for backend in self.backends:
+            if backend.url == url:
+                return backend
+        raise KeyError(url)
+
+    def select(self, model: Optional[str] = None, exclude: Collection[str] = ()) -> Backend:
+        """Pick the best backend for a request (503 if every circuit is open)"""
+        admissible = [b for b in self.backends if b.url not in exclude and b.breaker.allows()]
+        if not admissible:
+            self._reject()
+        candidates = [b for b in admissible if b.available]
+        if not candidates:
+            # Everything looks down; try the non-draining nodes anyway
+            candidates = [b for b in admissible if not b.draining] or admissible
+        if model:
+            warm = [b for b in candidates if model in b.loaded_models]
+            if warm:
+                candidates = warm
+        return min(candidates, key=lambda b: (b.outstanding, b.avg_latency))
+
+    def ensure_available(self) -> None:
+        """Raise 503 right away if every node's circuit is open"""
+        if not any(b.breaker.allows() for b in self.backends):
+            self._reject()
+
+    def _reject(self) -> None:
+        metrics.CIRCUIT_REJECTIONS.inc()
+        retry_after = min(b.breaker.retry_after for b in self.backends)
+        raise HTTPException(
+            status_code=503,
+            detail=settings.error_ollama_unavailable,
+            headers={"Retry-After": str(max(1, round(retry_after)))}
+        )
+
+    def has_alternative(self, exclude: Collection[str]) -> bool:
+        """Whether a healthy node outside ``exclude`` could take a request"""
+        return any(b.available and b.breaker.allows() for b in self.backends if b.url not in exclude)
+
+    @asynccontextmanager
+    async def route(self, model: Optional[str] = None, exclude: Collection[str] = ()) -> AsyncIterator[Backend]:
+        """Hold a backend for one upstream call and record its outcome"""
+        backend = self.select(model, exclude)
+        trial = backend.breaker.acquire()
+        backend.outstanding += 1
+        started = time.monotonic()
+        try:
+            yield backend
+        except BaseException as e:
+            if _is_backend_failure(e):
+                backend.record_failure(str(e) or type(e).__name__)
+                backend.breaker.record_failure(trial)
+            else:
+                backend.breaker.release(trial)
+            raise
+        else:
+            backend.record_success(time.monotonic() - started)
+            backend.breaker.record_success(trial)
+            if model:
+                backend.loaded_models.add(model)
+        finally:
+            backend.outstanding -= 1
+
+    def drain(self, url: str) -> Backend:
+        """Stop routing new requests to a backend"""
+        backend = self.get(url)
+        backend.draining = True
+        logger.info("Draining Ollama backend %s", backend.url)
+        return backend
+
+    def undrain(self, url: str) -> Backend:
+        """Resume routing to a drained backend"""
+        backend = self.get(url)
+        backend.draining = False
+        logger.info("Resuming Ollama backend %s", backend.url)
+        return backend
+
+    async def start(self, probe: Callable[[Backend], Awaitable[None]]) -> None:
+        """Probe every backend now and then periodically in the background"""
+        await self.probe_all(probe)
+        if self._prober is None:
+            self._prober = asyncio.create_task(self._probe_loop(probe))
+
+    async def stop(self) -> None:
+        """Stop background probing"""
+        if self._prober is not None:
+            self._prober.cancel()
+            try:
+                await self._prober
+            except asyncio.CancelledError:
+                pass
+            self._prober = None
+
+    async def probe_all(self, probe: Callable[[Backend], Awaitable[None]]) -> None:
+        """Run ``probe`` against every backend, updating health state"""
+        await asyncio.gather(*(self._probe(backend, probe) for backend in self.backends))
+
+    async def _probe(self, backend: Backend, probe: Callable[[Backend], Awaitable[None]]) -> None:
+        backend.last_probe = time.monotonic()
+        try:
+            await probe(backend)
+            backend.probe_latency = time.monotonic() - backend.last_probe
+        except Exception as e:
+            if backend.healthy:
+                logger.warning("Ollama backend %s failed health probe: %s", backend.url, str(e))
+            backend.healthy = False
+            backend.last_error = str(e) or type(e).__name__
+            return
+        if not backend.healthy:
+            logger.info("Ollama backend %s is healthy again", backend.url)
+        backend.healthy = True
+        backend.consecutive_failures = 0
+
+    async def _probe_loop(self, probe: Callable[[Backend], Awaitable[None]]) -> None:
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            await self.probe_all(probe)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per-backend routing, latency and error counters"""
+        return [backend.stats() for backend in self.backends]
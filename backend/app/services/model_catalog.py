@@ -0,0 +1,171 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from .ollama_service import OllamaService
+from .shared_state import SharedStateClient
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_SHARED_KEY = "model_catalog"
+
+
+class ModelCatalog:
+    """Shared, TTL-cached view of the models available in Ollama
+
+    The catalog is refreshed by a background task and served from memory.
+    Stale entries are returned while a refresh runs (stale-while-revalidate),
+    and concurrent refreshes are collapsed into a single /api/tags call.
+
+    With a shared-state ``store`` (multi-worker mode) the catalog is shared
+    between workers: a worker adopts the copy another one fetched unless
+    it is older than the refresh interval, and a lock lets only one worker
+    call /api/tags per interval.
+    """
+
+    def __init__(
+        self,
+        ollama_service: OllamaService,
+        ttl: Optional[float] = None,
+        refresh_interval: Optional[float] = None,
+        store: Optional[SharedStateClient] = None
+    ):
+        self.ollama_service = ollama_service
+        self.store = store
+        self.ttl = ttl if ttl is not None else settings.catalog_ttl
+        self.refresh_interval = (
+            refresh_interval if refresh_interval is not None
+            else settings.catalog_refresh_interval
+        )
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self._fetched_at: float = 0.0
+        self._inflight: Optional[asyncio.Task] = None
+        self._refresher: Optional[asyncio.Task] = None
+
+    @property
+    def populated(self) -> bool:
+        """Whether the catalog has been fetched successfully at least once"""
+        return self._entries is not None
+
+    @property
+    def age(self) -> Optional[float]:
+        """Seconds since the last successful fetch (None if never fetched)"""
+        if self._entries is None:
+            return None
+        return round(time.monotonic() - self._fetched_at, 1)
+
+    @property
+    def is_stale(self) -> bool:
+        """Whether the cached catalog is older than its TTL"""
+        return time.monotonic() - self._fetched_at > self.ttl
+
+    async def start(self) -> None:
+        """Prefetch the catalog and start the background refresher"""
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.warning("Initial model catalog fetch failed: %s", str(e))
+        if self._refresher is None:
+            self._refresher = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        """Stop the background refresher"""
+        for task in (self._refresher, self._inflight):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._refresher = None
+        self._inflight = None
+
+    async def refresh(self) -> None:
+        """Refresh the catalog, joining any refresh already in flight"""
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self._fetch())
+        # Shield so a cancelled caller doesn't abort the shared refresh
+        await asyncio.shield(self._inflight)
+
+    async def get_models(self) -> List[str]:
+        """Return model names, falling back to defaults if never populated"""
+        entries = await self._get_entries()
+        if entries is None:
+            return settings.default_models
+        return list(entries)
+
+    def cached_models(self) -> Optional[List[str]]:
+        """Model names as last fetched, without triggering a refresh"""
+        return None if self._entries is None else list(self._entries)
+
+    async def get_model(self, name: str) -> Optional[Dict[str, Any]]:
+        """Return the raw /api/tags entry for a model, if known"""
+        entries = await self._get_entries()
+        return entries.get(name) if entries else None
+
+    async def _get_entries(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        if self._entries is None:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning("Model catalog unavailable: %s", str(e))
+        elif self.is_stale:
+            self._refresh_in_background()
+        return self._entries
+
+    def _refresh_in_background(self) -> None:
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self._fetch())
+            self._inflight.add_done_callback(self._log_refresh_failure)
+
+    @staticmethod
+    def _log_refresh_failure(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Background model catalog refresh failed: %s", str(task.exception()))
+
+    async def _fetch(self) -> None:
+        if self.store is not None and await self._adopt_shared():
+            return
+        models = await self.ollama_service.list_models()
+        self._entries = {model['name']: model for model in models}
+        self._fetched_at = time.monotonic()
+        logger.debug("Model catalog refreshed: %s models", len(self._entries))
+        if self.store is not None:
+            await self._publish()
+
+    async def _adopt_shared(self) -> bool:
+        """Take the catalog another worker fetched, unless this worker should refresh it"""
+        try:
+            raw = await self.store.get(_SHARED_KEY)
+            if raw is None:
+                return False
+            shared = json.loads(raw)
+            age = max(0.0, time.time() - shared["fetched_at"])
+            if age >= self.refresh_interval and await self.store.lock(f"{_SHARED_KEY}:refresh", self.refresh_interval):
+                return False
+        except Exception as e:
+            logger.warning("Shared model catalog unavailable: %s", str(e))
+            return False
+        self._entries = shared["entries"]
+        self._fetched_at = time.monotonic() - age
+        return True
+
+    async def _publish(self) -> None:
+        payload = {"fetched_at": time.time(), "entries": self._entries}
+        try:
+            await self.store.set(_SHARED_KEY, json.dumps(payload).encode())
+        except Exception as e:
+            logger.warning("Failed to share model catalog: %s", str(e))
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Model catalog refresh failed: %s", str(e))
@@ -1,93 +1,620 @@
-import requests
+import asyncio
+import httpx
 import logging
-from typing import Dict, List, Any, Optional
+import orjson
+import re
+import time
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Any, Optional, Set, TypeVar, Union
 from fastapi import HTTPException
 from app.config import settings
+from ..core.http import create_http_client
+from ..core import metrics
+from .load_balancer import Backend, LoadBalancer
+from .resilience import RetryBudget, backoff_delay
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Ollama reports nanosecond timestamps; datetime takes at most microseconds
+_FRACTION = re.compile(r"(\.\d{6})\d+")
+
+
+def _parse_expires_at(value: Optional[str]) -> Optional[float]:
+    """Epoch seconds from an /api/ps ``expires_at`` timestamp"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(_FRACTION.sub(r"\1", value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def _is_retryable(error: BaseException) -> bool:
+    """Transport failures and 5xx answers; anything else would fail again"""
+    if isinstance(error, httpx.TransportError):
+        return True
+    return isinstance(error, httpx.HTTPStatusError) and error.response.status_code >= 500
+
+
+def _model_aliases(name: str) -> Set[str]:
+    """A model name plus its untagged form (``llama3.2:latest`` is also ``llama3.2``)"""
+    if name.endswith(":latest"):
+        return {name, name[:-len(":latest")]}
+    return {name}
+
+
+async def _prepend(first: "asyncio.Future", rest: AsyncIterator[T]) -> AsyncIterator[T]:
+    """Yield the result of an already started ``__anext__`` call, then the rest"""
+    try:
+        yield await first
+        async for item in rest:
+            yield item
+    except StopAsyncIteration:
+        return
+    finally:
+        await rest.aclose()
+
 
 class OllamaService:
-    """Service for interacting with Ollama API"""
-    
-    def __init__(self, base_url: str = None):
-        self.base_url = base_url or settings.ollama_base_url
+    """Service for interacting with Ollama API
+
+    Requests are spread over one or more Ollama nodes by a LoadBalancer;
+    with a single URL it simply always picks that node.
+
+    It also manages model lifecycle so cold loads stay off the request
+    path: configured models are preloaded at startup, generate calls carry
+    a per-model ``keep_alive``, and a background task re-warms hot models
+    that were evicted or are about to expire. Resident models are tracked
+    from each node's /api/ps, refreshed by the health probe.
+
+    Upstream failures are contained: every node has a circuit breaker
+    (see LoadBalancer), idempotent calls (/api/tags, probes) are retried
+    with jittered backoff within a shared retry budget, and with several
+    nodes a stream that has produced no token after ``ollama_hedge_after``
+    seconds is raced against a copy on another node.
+    """
+
+    def __init__(
+        self,
+        base_url: str = None,
+        client: Optional[httpx.AsyncClient] = None,
+        base_urls: Optional[List[str]] = None
+    ):
+        urls = base_urls or ([base_url] if base_url else None) or settings.ollama_base_urls or [settings.ollama_base_url]
+        self.base_url = urls[0]
         self.timeout = settings.ollama_timeout
-    
-    async def generate_response(self, model: str, prompt: str, stream: bool = False) -> Dict[str, Any]:
-        """Generate AI response using Ollama"""
+        self.balancer = LoadBalancer(urls)
+        self.retry_budget = RetryBudget()
+        # Pooled client; injected (e.g. a fake transport in tests) or created in start()
+        self.client = client
+        self._owns_client = False
+        self._last_used: Dict[str, float] = {}
+        self._warming: Dict[str, asyncio.Task] = {}
+        self._keep_warm: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Create the connection pool if needed, probe every node and keep probing
+
+        The first probe also warms a keep-alive connection to each node.
+        """
+        if self.client is None:
+            self.client = create_http_client()
+            self._owns_client = True
+        await self.balancer.start(self._probe)
+        for model in settings.preload_models:
+            self._warm_in_background(model, reason="preload")
+        if self._keep_warm is None and (settings.preload_models or settings.keep_warm_window > 0):
+            self._keep_warm = asyncio.create_task(self._keep_warm_loop())
+
+    async def close(self) -> None:
+        """Stop probing and close the connection pool if this service created it"""
+        tasks = [task for task in (self._keep_warm, *self._warming.values()) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._keep_warm = None
+        await self.balancer.stop()
+        if self.client is not None and self._owns_client:
+            await self.client.aclose()
+            self.client = None
+            self._owns_client = False
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the shared HTTP client"""
+        if self.client is None:
+            raise RuntimeError("OllamaService used before start()")
+        return self.client
+
+    @staticmethod
+    def _encode_body(data: Dict[str, Any], images: Optional[List[bytes]] = None) -> bytes:
+        """JSON request body, splicing in already base64-encoded images
+
+        Base64 needs no JSON escaping, so image payloads (often megabytes) are
+        joined in as bytes instead of being decoded to str and re-scanned by
+        the JSON encoder.
+        """
+        body = orjson.dumps(data)
+        if not images:
+            return body
+        parts = [body[:-1], b', "images": ["', b'", "'.join(images), b'"]}']
+        return b"".join(parts)
+
+    @staticmethod
+    def _timeout(read_timeout: Optional[float]):
+        """Per-call timeout: the client default, or a longer read timeout"""
+        if read_timeout is None:
+            return httpx.USE_CLIENT_DEFAULT
+        return httpx.Timeout(
+            connect=settings.ollama_connect_timeout,
+            read=read_timeout,
+            write=read_timeout,
+            pool=settings.ollama_pool_timeout
+        )
+
+    async def _retrying(self, operation: str, call: Callable[[], Awaitable[T]]) -> T:
+        """Run an idempotent call, retrying transient failures within the retry budget"""
+        self.retry_budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                return await call()
+            except Exception as e:
+                if not _is_retryable(e) or attempt >= settings.ollama_retry_attempts:
+                    raise
+                if not self.retry_budget.withdraw():
+                    metrics.UPSTREAM_RETRIES.labels(operation=operation, outcome="budget_exhausted").inc()
+                    raise
+                attempt += 1
+                metrics.UPSTREAM_RETRIES.labels(operation=operation, outcome="retried").inc()
+                delay = backoff_delay(attempt)
+                logger.debug("Retrying Ollama %s in %.2fs after: %s", operation, delay, str(e) or type(e).__name__)
+                await asyncio.sleep(delay)
+
+    async def _probe(self, backend: Backend) -> None:
+        """Health probe: list the models resident on a node via /api/ps"""
+        async def fetch() -> httpx.Response:
+            response = await self._get_client().get(
+                f"{backend.url}/api/ps",
+                timeout=settings.ollama_tags_timeout
+            )
+            response.raise_for_status()
+            return response
+
+        response = await self._retrying("probe", fetch)
+        backend.resident = {model['name']: model for model in response.json().get('models', [])}
+        backend.loaded_models = {alias for name in backend.resident for alias in _model_aliases(name)}
+
+    def keep_alive(self, model: str) -> Optional[Union[int, str]]:
+        """``keep_alive`` to send for a model: a duration string or seconds"""
+        value = settings.ollama_keep_alive_overrides.get(model, settings.ollama_keep_alive)
+        if value is None:
+            return None
+        # Ollama parses strings as Go durations, so bare numbers must go as numbers
+        try:
+            return int(value)
+        except ValueError:
+            return value
+
+    def _request_body(self, model: str, **fields: Any) -> Dict[str, Any]:
+        data = {"model": model, **fields}
+        keep_alive = self.keep_alive(model)
+        if keep_alive is not None:
+            data["keep_alive"] = keep_alive
+        self._last_used[model] = time.monotonic()
+        return data
+
+    def is_resident(self, model: str) -> bool:
+        """Whether a healthy node reported the model loaded at its last probe"""
+        return any(model in backend.loaded_models for backend in self.balancer.backends if backend.available)
+
+    def resident_models(self) -> List[Dict[str, Any]]:
+        """Models loaded on each node, per /api/ps at the last probe"""
+        resident: Dict[str, Dict[str, Any]] = {}
+        for backend in self.balancer.backends:
+            for name, entry in backend.resident.items():
+                info = resident.setdefault(name, {
+                    "name": name,
+                    "backends": [],
+                    "size_vram": entry.get("size_vram"),
+                    "expires_at": entry.get("expires_at")
+                })
+                info["backends"].append(backend.url)
+                if (_parse_expires_at(entry.get("expires_at")) or 0) > (_parse_expires_at(info["expires_at"]) or 0):
+                    info["expires_at"] = entry.get("expires_at")
+        return sorted(resident.values(), key=lambda info: info["name"])
+
+    @property
+    def warming(self) -> List[str]:
+        """Models with a warm-up in progress"""
+        return list(self._warming)
+
+    def hot_models(self) -> List[str]:
+        """Preloaded models plus those used within ``keep_warm_window``"""
+        now = time.monotonic()
+        recent = [
+            model for model, used_at in self._last_used.items()
+            if now - used_at < settings.keep_warm_window
+        ]
+        return list(dict.fromkeys([*settings.preload_models, *recent]))
+
+    async def warm_model(self, model: str, reason: str = "manual") -> bool:
+        """Load a model into memory ahead of requests
+
+        Uses Ollama's empty request (generate without a prompt, or an empty
+        embed for embedding models), which loads the model and returns.
+        """
+        if model in (settings.embedding_model, settings.rag_embedding_model):
+            path, data = "/api/embed", {"model": model, "input": ""}
+        else:
+            path, data = "/api/generate", {"model": model}
+        keep_alive = self.keep_alive(model)
+        if keep_alive is not None:
+            data["keep_alive"] = keep_alive
+        started = time.perf_counter()
+        try:
+            async with self.balancer.route(model) as backend:
+                response = await self._get_client().post(
+                    f"{backend.url}{path}",
+                    json=data,
+                    timeout=self._timeout(settings.ollama_load_timeout)
+                )
+                response.raise_for_status()
+        except Exception as e:
+            metrics.MODEL_WARMUPS.labels(model=model, reason=reason, status="error").inc()
+            logger.warning("Failed to warm model %s: %s", model, str(e) or type(e).__name__)
+            return False
+        metrics.MODEL_WARMUPS.labels(model=model, reason=reason, status="ok").inc()
+        logger.info("Warmed model %s on %s in %.2fs (%s)", model, backend.url, time.perf_counter() - started, reason)
+        return True
+
+    async def unload_model(self, model: str) -> None:
+        """Ask every node to evict a model now (``keep_alive`` 0)"""
+        async def unload(backend: Backend) -> None:
+            response = await self._get_client().post(
+                f"{backend.url}/api/generate",
+                json={"model": model, "keep_alive": 0},
+                timeout=settings.ollama_tags_timeout
+            )
+            response.raise_for_status()
+            backend.resident = {name: entry for name, entry in backend.resident.items() if model not in _model_aliases(name)}
+            backend.loaded_models -= _model_aliases(model) | {f"{model}:latest"}
+
+        await asyncio.gather(*(unload(backend) for backend in self.balancer.backends if backend.available))
+
+    def _warm_in_background(self, model: str, reason: str) -> None:
+        """Start warming a model unless that is already under way"""
+        if model in self._warming:
+            return
+        task = asyncio.create_task(self.warm_model(model, reason))
+        self._warming[model] = task
+        task.add_done_callback(lambda _: self._warming.pop(model, None))
+
+    def _needs_warming(self, model: str) -> bool:
+        """Not resident anywhere, or expiring before the next keep-warm round"""
+        horizon = time.time() + 2 * settings.keep_warm_interval
+        for backend in self.balancer.backends:
+            if not backend.available:
+                continue
+            for name, entry in backend.resident.items():
+                if model in _model_aliases(name):
+                    expires_at = _parse_expires_at(entry.get("expires_at"))
+                    if expires_at is None or expires_at > horizon:
+                        return False
+        return True
+
+    async def _keep_warm_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.keep_warm_interval)
+            for model in self.hot_models():
+                if self._needs_warming(model):
+                    self._warm_in_background(model, reason="keep_warm")
+
+    async def generate_response(
+        self,
+        model: str,
+        prompt: str,
+        stream: bool = False,
+        options: Optional[Dict[str, Any]] = None,
+        context: Optional[List[int]] = None,
+        timeout: Optional[float] = None,
+        images: Optional[List[bytes]] = None
+    ) -> Dict[str, Any]:
+        """Generate AI response using Ollama
+
+        ``timeout`` overrides the client's read timeout for this call (e.g. for
+        long-running jobs). ``images`` are base64-encoded, for vision models.
+        """
         try:
-            url = f"{self.base_url}/api/generate"
-            data = {
-                "model": model,
-                "prompt": prompt,
-                "stream": stream
-            }
-            
-            logger.info(f"Generating response for model: {model}")
-            response = requests.post(url, json=data, timeout=self.timeout)
-            
+            data = self._request_body(model, prompt=prompt, stream=stream)
+            if options:
+                data["options"] = options
+            if context:
+                data["context"] = context
+
+            logger.info("Generating response for model: %s", model)
+            async with self.balancer.route(model) as backend:
+                with metrics.GENERATIONS_IN_FLIGHT.labels(model=model).track_inprogress():
+                    response = await self._get_client().post(
+                        f"{backend.url}/api/generate",
+                        content=self._encode_body(data, images),
+                        headers=JSON_HEADERS,
+                        timeout=self._timeout(timeout),
+                        extensions={"trace": metrics.connect_tracer(model)}
+                    )
+                if response.status_code >= 500:
+                    logger.error("Ollama API error from %s: %s", backend.url, response.status_code)
+                    raise HTTPException(
+                        status_code=500,
+                        detail=settings.error_ollama_api
+                    )
+
             if response.status_code == 200:
-                return response.json()
+                # Parsed from bytes, skipping the text decode of response.json()
+                result = orjson.loads(response.content)
+                metrics.observe_generation(model, result)
+                return result
             else:
-                logger.error(f"Ollama API error: {response.status_code}")
+                logger.error("Ollama API error: %s", response.status_code)
                 raise HTTPException(
-                    status_code=500, 
+                    status_code=500,
                     detail=settings.error_ollama_api
                 )
-                
-        except requests.exceptions.ConnectionError:
+
+        except HTTPException:
+            metrics.UPSTREAM_ERRORS.labels(operation="generate", kind="http_status").inc()
+            raise
+        except httpx.ConnectError:
+            metrics.UPSTREAM_ERRORS.labels(operation="generate", kind="connect_error").inc()
+            logger.error("Cannot connect to Ollama service")
+            raise HTTPException(
+                status_code=503,
+                detail=settings.error_ollama_not_running
+            )
+        except httpx.TimeoutException:
+            metrics.UPSTREAM_ERRORS.labels(operation="generate", kind="timeout").inc()
+            logger.error("Ollama request timeout")
+            raise HTTPException(
+                status_code=504,
+                detail=settings.error_ollama_timeout
+            )
+        except Exception as e:
+            metrics.UPSTREAM_ERRORS.labels(operation="generate", kind="other").inc()
+            logger.error("Unexpected error: %s", str(e))
+            raise HTTPException(
+                status_code=500,
+                detail=str(e)
+            )
+
+    async def stream_response(
+        self,
+        model: str,
+        prompt: str,
+        options: Optional[Dict[str, Any]] = None,
+        context: Optional[List[int]] = None,
+        images: Optional[List[bytes]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream generation chunks from Ollama as they are produced
+
+        Ollama answers with NDJSON, one object per token batch. Chunks are read
+        from the socket only as fast as the caller consumes them, and closing
+        the generator closes the upstream connection, which makes Ollama stop
+        generating.
+        """
+        data = self._request_body(model, prompt=prompt, stream=True)
+        if options:
+            data["options"] = options
+        if context:
+            data["context"] = context
+
+        logger.info("Streaming response for model: %s", model)
+        content = self._encode_body(data, images)
+        try:
+            chunks = await self._open_stream(model, content)
+            try:
+                async for chunk in chunks:
+                    yield chunk
+            finally:
+                await chunks.aclose()
+
+        except HTTPException:
+            metrics.UPSTREAM_ERRORS.labels(operation="stream", kind="http_status").inc()
+            raise
+        except httpx.ConnectError:
+            metrics.UPSTREAM_ERRORS.labels(operation="stream", kind="connect_error").inc()
             logger.error("Cannot connect to Ollama service")
             raise HTTPException(
-                status_code=503, 
+                status_code=503,
                 detail=settings.error_ollama_not_running
             )
-        except requests.exceptions.Timeout:
+        except httpx.TimeoutException:
+            metrics.UPSTREAM_ERRORS.labels(operation="stream", kind="timeout").inc()
             logger.error("Ollama request timeout")
             raise HTTPException(
-                status_code=504, 
+                status_code=504,
                 detail=settings.error_ollama_timeout
             )
         except Exception as e:
-            logger.error(f"Unexpected error: {str(e)}")
+            metrics.UPSTREAM_ERRORS.labels(operation="stream", kind="other").inc()
+            logger.error("Unexpected streaming error: %s", str(e))
             raise HTTPException(
-                status_code=500, 
+                status_code=500,
                 detail=str(e)
             )
-    
+
+    async def _open_stream(self, model: str, content: bytes) -> AsyncIterator[Dict[str, Any]]:
+        """The chunks of one node, hedged on a second node when configured"""
+        used: Set[str] = set()
+        chunks = self._stream_from_node(model, content, used)
+        if settings.ollama_hedge_after is not None and len(self.balancer.backends) > 1:
+            chunks = await self._hedge(model, content, chunks, used)
+        return chunks
+
+    async def _stream_from_node(
+        self,
+        model: str,
+        content: bytes,
+        used: Set[str]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream one generation from a node not in ``used``, adding it to ``used``"""
+        async with self.balancer.route(model, exclude=used) as backend:
+            used.add(backend.url)
+            url = f"{backend.url}/api/generate"
+            trace = metrics.connect_tracer(model)
+            with metrics.GENERATIONS_IN_FLIGHT.labels(model=model).track_inprogress():
+                async with self._get_client().stream(
+                    "POST",
+                    url,
+                    content=content,
+                    headers=JSON_HEADERS,
+                    extensions={"trace": trace}
+                ) as response:
+                    if response.status_code != 200:
+                        logger.error("Ollama API error from %s: %s", backend.url, response.status_code)
+                        upstream_status = response.status_code
+                    else:
+                        upstream_status = None
+                        async for line in response.aiter_lines():
+                            if not line:
+                                continue
+                            chunk = orjson.loads(line)
+                            if "error" in chunk:
+                                logger.error("Ollama stream error: %s", chunk['error'])
+                                raise HTTPException(
+                                    status_code=500,
+                                    detail=settings.error_ollama_api
+                                )
+                            if chunk.get("done"):
+                                metrics.observe_generation(model, chunk)
+                            yield chunk
+                            if chunk.get("done"):
+                                break
+            if upstream_status is not None and upstream_status >= 500:
+                raise HTTPException(
+                    status_code=500,
+                    detail=settings.error_ollama_api
+                )
+        if upstream_status is not None:
+            # Client-side errors (e.g. unknown model) don't count against the node
+            raise HTTPException(
+                status_code=500,
+                detail=settings.error_ollama_api
+            )
+
+    async def _hedge(
+        self,
+        model: str,
+        content: bytes,
+        primary: AsyncIterator[Dict[str, Any]],
+        used: Set[str]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Race ``primary`` against a copy on another node if its first chunk is slow
+
+        Returns the stream that produced a first chunk first (that chunk
+        included); the other one is closed, which stops its generation.
+        """
+        first = asyncio.ensure_future(primary.__anext__())
+        attempts = {first: primary}
+        winner = None
+        try:
+            done, _ = await asyncio.wait({first}, timeout=settings.ollama_hedge_after)
+            if done or not self.balancer.has_alternative(used):
+                winner = first
+                return _prepend(first, primary)
+
+            hedge = self._stream_from_node(model, content, used)
+            attempts[asyncio.ensure_future(hedge.__anext__())] = hedge
+            pending = set(attempts)
+            while winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # Prefer a copy that produced a chunk; if both failed, surface the last failure
+                winner = next((task for task in done if task.exception() is None), None)
+                if winner is None and not pending:
+                    winner = done.pop()
+            metrics.HEDGED_REQUESTS.labels(model=model, winner="primary" if winner is first else "hedge").inc()
+            return _prepend(winner, attempts[winner])
+        finally:
+            for task, stream in attempts.items():
+                if task is not winner:
+                    task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
+                    await stream.aclose()
+
+    async def embed(self, model: str, prompt: str) -> List[float]:
+        """Embed a text with an embedding model via /api/embeddings
+
+        Transport and status errors propagate as httpx exceptions; callers
+        treat embeddings as best-effort.
+        """
+        async with self.balancer.route(model) as backend:
+            response = await self._get_client().post(
+                f"{backend.url}/api/embeddings",
+                json=self._request_body(model, prompt=prompt)
+            )
+            response.raise_for_status()
+            return orjson.loads(response.content)["embedding"]
+
+    async def embed_batch(self, model: str, texts: List[str]) -> List[List[float]]:
+        """Embed many texts in one request via /api/embed"""
+        async with self.balancer.route(model) as backend:
+            response = await self._get_client().post(
+                f"{backend.url}/api/embed",
+                json=self._request_body(model, input=texts)
+            )
+            response.raise_for_status()
+            return orjson.loads(response.content)["embeddings"]
+
+    async def list_models(self) -> List[Dict[str, Any]]:
+        """Fetch raw model entries (name, digest, size, ...) from /api/tags
+
+        Unlike get_available_models this does not fall back to defaults;
+        transport and status errors propagate as httpx exceptions (after
+        retries), an open circuit as a 503 HTTPException.
+        """
+        async def fetch() -> List[Dict[str, Any]]:
+            # Routed per attempt, so a retry may land on another node
+            async with self.balancer.route() as backend:
+                response = await self._get_client().get(
+                    f"{backend.url}/api/tags",
+                    timeout=settings.ollama_tags_timeout
+                )
+                response.raise_for_status()
+                return response.json().get('models', [])
+
+        return await self._retrying("tags", fetch)
+
     async def get_available_models(self) -> List[str]:
         """Get list of available models from Ollama"""
         try:
-            url = f"{self.base_url}/api/tags"
-            response = requests.get(url, timeout=5)
-            
-            if response.status_code == 200:
-                models_data = response.json()
-                return [model['name'] for model in models_data.get('models', [])]
-            else:
-                logger.warning("Could not fetch models from Ollama")
-                return []
-                
-        except requests.exceptions.ConnectionError:
+            return [model['name'] for model in await self.list_models()]
+
+        except httpx.HTTPStatusError:
+            logger.warning("Could not fetch models from Ollama")
+            return []
+        except httpx.ConnectError:
             logger.warning("Cannot connect to Ollama for model list")
             return settings.default_models
         except Exception as e:
-            logger.error(f"Error fetching models: {str(e)}")
+            logger.error("Error fetching models: %s", str(e))
             return settings.default_models
-    
+
     async def check_health(self) -> Dict[str, Any]:
-        """Check if Ollama service is healthy"""
+        """Check if Ollama service is healthy (any node answering its probe)
+
+        Answers from the background probes' latest results rather than
+        calling every node again.
+        """
         try:
-            url = f"{self.base_url}/api/tags"
-            response = requests.get(url, timeout=5)
-            
-            if response.status_code == 200:
-                return {"status": "healthy", "ollama": "running"}
+            backends = self.balancer.stats()
+
+            if any(backend["healthy"] for backend in backends):
+                return {"status": "healthy", "ollama": "running", "backends": backends}
             else:
-                return {"status": "unhealthy", "ollama": "not running"}
-                
-        except requests.exceptions.RequestException:
-            return {"status": "unhealthy", "ollama": "not running"}
+                return {"status": "unhealthy", "ollama": "not running", "backends": backends}
+
         except Exception as e:
-            logger.error(f"Health check error: {str(e)}")
+            logger.error("Health check error: %s", str(e))
             return {"status": "unhealthy", "ollama": "not running"}
@@ -0,0 +1,368 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import settings
+from ..core.database import create_session_factory
+from ..models.db import Document, DocumentChunk
+from ..models.document import DocumentInfo, IngestResult, RetrievalOptions, RetrievedChunk
+from ..utils.chunking import chunk_stream
+from ..utils.uploads import UploadedFile
+from .ollama_service import OllamaService
+from .vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+_READ_BLOCK = 256 * 1024
+
+
+def _hash_file(path: str) -> Tuple[str, int]:
+    """SHA-256 and size of a file, read in blocks"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(_READ_BLOCK)
+            if not block:
+                return digest.hexdigest(), size
+            digest.update(block)
+            size += len(block)
+
+
+async def _file_blocks(path: str) -> AsyncIterator[bytes]:
+    """Read a file block by block without blocking the event loop"""
+    f = await asyncio.to_thread(open, path, "rb")
+    try:
+        while True:
+            block = await asyncio.to_thread(f.read, _READ_BLOCK)
+            if not block:
+                return
+            yield block
+    finally:
+        f.close()
+
+
+async def _memory_blocks(data: bytes) -> AsyncIterator[bytes]:
+    view = memoryview(data)
+    for offset in range(0, len(view), _READ_BLOCK):
+        yield view[offset:offset + _READ_BLOCK]
+
+
+class RagService:
+    """Document ingestion and vector search for retrieval-augmented chat
+
+    Ingestion streams a document through an incremental UTF-8 decoder and
+    chunker, and embeds the chunks through Ollama in batches, several
+    batches in flight at once (bounded across all ingestions). Vectors go
+    to a memory-mapped ``VectorStore``; documents and chunk texts go to the
+    database. A document whose content hash and embedding model are
+    unchanged is skipped, so re-syncing a directory only embeds what
+    changed.
+    """
+
+    def __init__(
+        self,
+        ollama_service: OllamaService,
+        engine: AsyncEngine,
+        index_dir: Optional[str] = None,
+        embedding_model: Optional[str] = None
+    ):
+        self.ollama_service = ollama_service
+        self.embedding_model = embedding_model or settings.rag_embedding_model or settings.embedding_model
+        self.store = VectorStore(index_dir or settings.rag_index_dir)
+        self._sessions = create_session_factory(engine)
+        self._embed_slots = asyncio.Semaphore(settings.rag_embed_concurrency)
+        self._source_locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+        self.ingested = 0
+        self.unchanged = 0
+        self.failed = 0
+        self.chunks_embedded = 0
+        self.searches = 0
+
+    async def start(self) -> None:
+        """Map the vector file and mark the rows of stored chunks live"""
+        async with self._sessions() as session:
+            rows = (await session.execute(
+                select(DocumentChunk.vector_row, Document.collection)
+                .join(Document, DocumentChunk.document_id == Document.id)
+            )).all()
+        await asyncio.to_thread(self.store.open, rows)
+        logger.info("Opened RAG index with %s chunks", len(rows))
+
+    async def ingest_upload(self, upload: UploadedFile, collection: Optional[str] = None) -> IngestResult:
+        """Ingest a file received by ``read_multipart`` (already hashed while streaming)"""
+        return await self.ingest(
+            collection or settings.rag_default_collection,
+            upload.filename or upload.digest,
+            upload.digest,
+            len(upload.data),
+            lambda: _memory_blocks(upload.data)
+        )
+
+    async def ingest_path(self, path: str, source: str, collection: Optional[str] = None) -> IngestResult:
+        """Ingest a local file; it is read twice (hash, then chunk) only if it changed"""
+        digest, size = await asyncio.to_thread(_hash_file, path)
+        return await self.ingest(
+            collection or settings.rag_default_collection, source, digest, size, lambda: _file_blocks(path)
+        )
+
+    async def ingest(
+        self,
+        collection: str,
+        source: str,
+        digest: str,
+        size: int,
+        blocks
+    ) -> IngestResult:
+        """Chunk, embed and store one document unless it is unchanged
+
+        ``blocks`` is called (only when the document must be embedded) to
+        get an async iterator over its bytes. Re-ingesting a source replaces
+        its chunks atomically: searches see either the old or the new ones.
+        """
+        # Concurrent ingests of the same source would race on its chunks
+        async with self._source_locks.setdefault((collection, source), asyncio.Lock()):
+            try:
+                existing = await self._find(collection, source)
+                if existing and existing.sha256 == digest and existing.embedding_model == self.embedding_model:
+                    self.unchanged += 1
+                    return IngestResult(
+                        source=source, status="unchanged", document_id=existing.id, chunks=existing.chunk_count
+                    )
+                document_id = existing.id if existing else str(uuid.uuid4())
+                texts, vectors = await self._embed_document(blocks())
+                await self._store(document_id, collection, source, digest, size, texts, vectors, existing)
+            except HTTPException as e:
+                self.failed += 1
+                logger.error("Failed to ingest %s/%s: %s", collection, source, e.detail)
+                return IngestResult(source=source, status="failed", error=str(e.detail))
+            except Exception as e:
+                self.failed += 1
+                logger.error("Failed to ingest %s/%s: %s", collection, source, str(e))
+                return IngestResult(source=source, status="failed", error=str(e))
+        self.ingested += 1
+        self.chunks_embedded += len(texts)
+        return IngestResult(source=source, status="ingested", document_id=document_id, chunks=len(texts))
+
+    async def sync_directory(self, directory: Optional[str] = None, collection: Optional[str] = None) -> Dict[str, Any]:
+        """Ingest every matching file under a directory and drop documents whose file is gone"""
+        directory = directory or settings.rag_source_dir
+        collection = collection or settings.rag_default_collection
+        started = time.perf_counter()
+        paths = await asyncio.to_thread(self._walk, directory)
+        slots = asyncio.Semaphore(settings.rag_ingest_concurrency)
+
+        async def ingest(source: str, path: str) -> IngestResult:
+            async with slots:
+                return await self.ingest_path(path, source, collection)
+
+        results = await asyncio.gather(*(ingest(source, path) for source, path in paths.items()))
+
+        deleted = 0
+        for document in await self.list_documents(collection):
+            if document.source not in paths and await self.delete(document.id):
+                deleted += 1
+
+        elapsed = time.perf_counter() - started
+        ingested = sum(1 for result in results if result.status == "ingested")
+        return {
+            "collection": collection,
+            "files": len(results),
+            "ingested": ingested,
+            "unchanged": sum(1 for result in results if result.status == "unchanged"),
+            "deleted": deleted,
+            "chunks": sum(result.chunks for result in results if result.status == "ingested"),
+            "failed": [result.model_dump(include={"source", "error"}) for result in results if result.status == "failed"],
+            "seconds": round(elapsed, 3),
+            "documents_per_second": round(ingested / elapsed, 2) if elapsed else 0.0
+        }
+
+    async def delete(self, document_id: str) -> bool:
+        """Remove a document and free its vector rows"""
+        async with self._sessions() as session:
+            rows = list(await session.scalars(
+                select(DocumentChunk.vector_row).where(DocumentChunk.document_id == document_id)
+            ))
+            await session.execute(delete(DocumentChunk).where(DocumentChunk.document_id == document_id))
+            result = await session.execute(delete(Document).where(Document.id == document_id))
+            await session.commit()
+        self.store.release(rows)
+        return bool(result.rowcount)
+
+    async def list_documents(self, collection: Optional[str] = None) -> List[DocumentInfo]:
+        query = select(Document).order_by(Document.collection, Document.source)
+        if collection:
+            query = query.where(Document.collection == collection)
+        async with self._sessions() as session:
+            documents = await session.scalars(query)
+            return [DocumentInfo.model_validate(document, from_attributes=True) for document in documents]
+
+    async def search(
+        self,
+        query: str,
+        top_k: int = 4,
+        collection: Optional[str] = None,
+        min_score: Optional[float] = None
+    ) -> List[RetrievedChunk]:
+        """Chunks most similar to the query, best first"""
+        self.searches += 1
+        vector = (await self._embed([query]))[0]
+        rows, scores = await asyncio.to_thread(self.store.search, vector, top_k, collection)
+        if min_score is not None:
+            keep = scores >= min_score
+            rows, scores = rows[keep], scores[keep]
+        if not len(rows):
+            return []
+
+        async with self._sessions() as session:
+            found = (await session.execute(
+                select(DocumentChunk, Document.source)
+                .join(Document, DocumentChunk.document_id == Document.id)
+                .where(DocumentChunk.vector_row.in_([int(row) for row in rows]))
+            )).all()
+        by_row = {chunk.vector_row: (chunk, source) for chunk, source in found}
+        results = []
+        for row, score in zip(rows.tolist(), scores.tolist()):
+            if row in by_row:
+                chunk, source = by_row[row]
+                results.append(RetrievedChunk(
+                    document_id=chunk.document_id,
+                    source=source,
+                    ordinal=chunk.ordinal,
+                    score=round(score, 4),
+                    content=chunk.content
+                ))
+        return results
+
+    async def build_prompt(self, question: str, options: RetrievalOptions) -> Tuple[str, List[RetrievedChunk]]:
+        """The question wrapped in the retrieval prompt template, plus its sources"""
+        chunks = await self.search(question, options.top_k, options.collection, options.min_score)
+        if not chunks:
+            return question, []
+        context = "\n\n".join(f"[{index}] {chunk.source}\n{chunk.content}" for index, chunk in enumerate(chunks, 1))
+        return settings.rag_prompt_template.format(context=context, question=question), chunks
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "embedding_model": self.embedding_model,
+            "chunks": self.store.size,
+            "dimension": self.store.dimension,
+            "capacity": self.store.capacity,
+            "documents_ingested": self.ingested,
+            "documents_unchanged": self.unchanged,
+            "documents_failed": self.failed,
+            "chunks_embedded": self.chunks_embedded,
+            "searches": self.searches
+        }
+
+    async def _find(self, collection: str, source: str) -> Optional[Document]:
+        async with self._sessions() as session:
+            return await session.scalar(
+                select(Document).where(Document.collection == collection, Document.source == source)
+            )
+
+    async def _embed_document(self, blocks: AsyncIterator[bytes]) -> Tuple[List[str], Optional[np.ndarray]]:
+        """Chunk a byte stream and embed it, batches going out while the rest is still read"""
+        texts: List[str] = []
+        tasks: List[asyncio.Task] = []
+        batch: List[str] = []
+        try:
+            async for chunk in chunk_stream(blocks, settings.rag_chunk_size, settings.rag_chunk_overlap):
+                batch.append(chunk)
+                if len(batch) == settings.rag_embed_batch_size:
+                    tasks.append(asyncio.create_task(self._embed(batch)))
+                    texts.extend(batch)
+                    batch = []
+            if batch:
+                tasks.append(asyncio.create_task(self._embed(batch)))
+                texts.extend(batch)
+            embedded = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        if not texts:
+            return texts, None
+        return texts, np.concatenate(embedded)
+
+    async def _embed(self, texts: List[str]) -> np.ndarray:
+        async with self._embed_slots:
+            try:
+                embeddings = await self.ollama_service.embed_batch(self.embedding_model, texts)
+            except Exception as e:
+                logger.error("Embedding %s texts failed: %s", len(texts), str(e))
+                raise HTTPException(status_code=502, detail=settings.error_embedding)
+        return np.asarray(embeddings, dtype=np.float32)
+
+    async def _store(
+        self,
+        document_id: str,
+        collection: str,
+        source: str,
+        digest: str,
+        size: int,
+        texts: List[str],
+        vectors: Optional[np.ndarray],
+        existing: Optional[Document]
+    ) -> None:
+        """Write vectors, then swap the document's chunks in one transaction"""
+        rows = self.store.allocate(len(texts))
+        try:
+            if rows:
+                await asyncio.to_thread(self.store.write, rows, vectors)
+            now = time.time()
+            async with self._sessions() as session:
+                old_rows = []
+                if existing:
+                    old_rows = list(await session.scalars(
+                        select(DocumentChunk.vector_row).where(DocumentChunk.document_id == document_id)
+                    ))
+                    await session.execute(delete(DocumentChunk).where(DocumentChunk.document_id == document_id))
+                values = {
+                    "sha256": digest,
+                    "size": size,
+                    "chunk_count": len(texts),
+                    "embedding_model": self.embedding_model,
+                    "updated_at": now
+                }
+                if existing:
+                    await session.execute(update(Document).where(Document.id == document_id).values(**values))
+                else:
+                    await session.execute(insert(Document).values(
+                        id=document_id, collection=collection, source=source, created_at=now, **values
+                    ))
+                if rows:
+                    await session.execute(insert(DocumentChunk), [
+                        {"document_id": document_id, "ordinal": ordinal, "vector_row": row, "content": text}
+                        for ordinal, (row, text) in enumerate(zip(rows, texts))
+                    ])
+                await session.commit()
+        except BaseException:
+            self.store.release(rows)
+            raise
+        self.store.activate(rows, collection)
+        self.store.release(old_rows)
+
+    @staticmethod
+    def _walk(directory: str) -> Dict[str, str]:
+        """Matching files under ``directory``, keyed by their relative path"""
+        if not directory or not os.path.isdir(directory):
+            raise HTTPException(status_code=400, detail=f"Not a directory: {directory}")
+        extensions = {extension.lower() for extension in settings.rag_file_extensions}
+        paths = {}
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if os.path.splitext(name)[1].lower() in extensions:
+                    path = os.path.join(root, name)
+                    paths[os.path.relpath(path, directory).replace(os.sep, "/")] = path
+        return paths
@@ -0,0 +1,196 @@
+import logging
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.config import settings
+from ..core import metrics
+from ..core.auth import api_key_id
+
+logger = logging.getLogger(__name__)
+
+_SWEEP_EVERY = 1000  # checks between sweeps of idle entries
+_IDLE_TTL = 86400.0  # an entry idle this long has nothing left to enforce
+
+
+def _seconds_to_midnight() -> float:
+    now = datetime.now(timezone.utc)
+    midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (midnight - now).total_seconds()
+
+
+class TokenBucket:
+    """``capacity`` tokens, refilled continuously over ``period`` seconds
+
+    ``charge`` may take the balance below zero (for costs only known
+    afterwards); the bucket then admits nothing until it refills.
+    """
+
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity: float, period: float):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until ``amount`` tokens are available (after ``refill``)"""
+        return max(0.0, (amount - self.tokens) / self.rate)
+
+    def reset_time(self) -> float:
+        """Seconds until the bucket is full again (after ``refill``)"""
+        return (self.capacity - self.tokens) / self.rate
+
+    def charge(self, amount: float) -> None:
+        self.tokens -= amount
+
+
+class _Limits:
+    """Buckets and daily budget of one client and model"""
+
+    __slots__ = ("requests", "tokens", "day_limit", "day_used", "day", "last_seen")
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int, tokens_per_day: int):
+        self.requests = TokenBucket(requests_per_minute, 60.0) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute, 60.0) if tokens_per_minute else None
+        self.day_limit = tokens_per_day
+        self.day_used = 0
+        self.day = datetime.now(timezone.utc).date()
+        self.last_seen = time.monotonic()
+
+    def refresh(self, now: float) -> None:
+        self.last_seen = now
+        for bucket in (self.requests, self.tokens):
+            if bucket is not None:
+                bucket.refill(now)
+        today = datetime.now(timezone.utc).date()
+        if today != self.day:
+            self.day, self.day_used = today, 0
+
+
+class RateLimiter:
+    """Request and token limits per client (API key) and model
+
+    Each client/model pair gets a token bucket of requests per minute, one
+    of LLM tokens per minute and a token budget per UTC day. A request
+    takes one request token and needs a positive token balance. The tokens
+    it actually used (Ollama's ``prompt_eval_count`` plus ``eval_count``)
+    are charged once the response is done, since they aren't known up
+    front, so a long answer can take the balance negative and the client
+    then waits until it refills. A limit of 0 is not enforced;
+    ``rate_limit_overrides`` sets other limits for particular keys.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        tokens_per_day: Optional[int] = None,
+        overrides: Optional[Dict[str, Dict[str, int]]] = None
+    ):
+        self.defaults = {
+            "requests_per_minute": (
+                requests_per_minute if requests_per_minute is not None else settings.rate_limit_requests_per_minute
+            ),
+            "tokens_per_minute": (
+                tokens_per_minute if tokens_per_minute is not None else settings.rate_limit_tokens_per_minute
+            ),
+            "tokens_per_day": tokens_per_day if tokens_per_day is not None else settings.rate_limit_tokens_per_day
+        }
+        # Overrides are configured by API key; clients are identified by key ID
+        overrides = overrides if overrides is not None else settings.rate_limit_overrides
+        self.overrides = {f"key:{api_key_id(key)}": limits for key, limits in overrides.items()}
+        self._entries: Dict[Tuple[str, str], _Limits] = {}
+        self._checks = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    async def check(self, client: str, model: str) -> Dict[str, str]:
+        """Admit one request or raise 429; returns the rate-limit headers"""
+        now = time.monotonic()
+        limits = self._limits(client, model, now)
+        limits.refresh(now)
+
+        if limits.requests is not None and limits.requests.tokens < 1:
+            self._reject(limits, "requests", limits.requests.wait_time(1), settings.error_rate_limited)
+        if limits.tokens is not None and limits.tokens.tokens <= 0:
+            self._reject(limits, "tokens_per_minute", limits.tokens.wait_time(1), settings.error_rate_limited)
+        if limits.day_limit and limits.day_used >= limits.day_limit:
+            self._reject(limits, "tokens_per_day", _seconds_to_midnight(), settings.error_token_quota)
+
+        if limits.requests is not None:
+            limits.requests.charge(1)
+        self.admitted += 1
+        return self._headers(limits)
+
+    def charge(self, client: str, model: str, tokens: int) -> None:
+        """Charge the tokens a finished request used"""
+        now = time.monotonic()
+        limits = self._limits(client, model, now)
+        limits.refresh(now)
+        if limits.tokens is not None:
+            limits.tokens.charge(tokens)
+        limits.day_used += tokens
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tracked": len(self._entries),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "limits": {"default": self.defaults, "overrides": len(self.overrides)}
+        }
+
+    def _limits(self, client: str, model: str, now: float) -> _Limits:
+        self._checks += 1
+        if self._checks % _SWEEP_EVERY == 0:
+            self._entries = {
+                key: limits for key, limits in self._entries.items() if now - limits.last_seen < _IDLE_TTL
+            }
+        limits = self._entries.get((client, model))
+        if limits is None:
+            config = {**self.defaults, **self.overrides.get(client, {})}
+            limits = _Limits(config["requests_per_minute"], config["tokens_per_minute"], config["tokens_per_day"])
+            self._entries[(client, model)] = limits
+        return limits
+
+    def _reject(self, limits: _Limits, limit: str, retry_after: float, detail: str) -> None:
+        self.rejected += 1
+        metrics.RATE_LIMITED.labels(limit=limit).inc()
+        raise HTTPException(
+            status_code=429,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after))), **self._headers(limits)}
+        )
+
+    @staticmethod
+    def _headers(limits: _Limits) -> Dict[str, str]:
+        """``RateLimit-*`` for requests, ``X-RateLimit-*-Tokens`` for the tighter token limit"""
+        headers = {}
+        if limits.requests is not None:
+            headers.update({
+                "RateLimit-Limit": str(int(limits.requests.capacity)),
+                "RateLimit-Remaining": str(max(0, int(limits.requests.tokens))),
+                "RateLimit-Reset": str(math.ceil(limits.requests.reset_time()))
+            })
+        candidates = []
+        if limits.tokens is not None:
+            candidates.append((limits.tokens.tokens, limits.tokens.capacity, limits.tokens.reset_time()))
+        if limits.day_limit:
+            candidates.append((limits.day_limit - limits.day_used, limits.day_limit, _seconds_to_midnight()))
+        if candidates:
+            remaining, limit, reset = min(candidates)
+            headers.update({
+                "X-RateLimit-Limit-Tokens": str(int(limit)),
+                "X-RateLimit-Remaining-Tokens": str(max(0, int(remaining))),
+                "X-RateLimit-Reset-Tokens": str(math.ceil(reset))
+            })
+        return headers
@@ -0,0 +1,189 @@
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from app.config import settings
+from ..core import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker driven by the recent failure rate
+
+    Outcomes are counted in one-second buckets over a sliding ``window``.
+    Once at least ``min_requests`` were seen and the share of failures
+    (errors and timeouts) reaches ``failure_rate``, the breaker opens and
+    requests are refused without touching the network. After
+    ``open_duration`` it lets ``half_open_requests`` trial requests
+    through: a success closes it, a failure opens it again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: Optional[float] = None,
+        min_requests: Optional[int] = None,
+        window: Optional[float] = None,
+        open_duration: Optional[float] = None,
+        half_open_requests: Optional[int] = None,
+        enabled: Optional[bool] = None
+    ):
+        self.name = name
+        self.failure_rate = failure_rate if failure_rate is not None else settings.circuit_failure_rate
+        self.min_requests = min_requests if min_requests is not None else settings.circuit_min_requests
+        self.window = window if window is not None else settings.circuit_window
+        self.open_duration = open_duration if open_duration is not None else settings.circuit_open_duration
+        self.half_open_requests = (
+            half_open_requests if half_open_requests is not None else settings.circuit_half_open_requests
+        )
+        self.enabled = enabled if enabled is not None else settings.circuit_breaker_enabled
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._buckets: Deque[List[int]] = deque()  # [second, requests, failures]
+        self._trials = 0
+        metrics.CIRCUIT_STATE.labels(backend=name).set(_STATE_VALUES[CLOSED])
+
+    def allows(self) -> bool:
+        """Whether a request may be sent now (does not change state)"""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            return time.monotonic() >= self.opened_at + self.open_duration
+        return self._trials < self.half_open_requests
+
+    def acquire(self) -> bool:
+        """Register a request that ``allows()`` admitted; True if it is a trial"""
+        if self.state == OPEN:
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            self._trials += 1
+            return True
+        return False
+
+    def record_success(self, trial: bool = False) -> None:
+        if trial:
+            self._trials -= 1
+            if self.state == HALF_OPEN:
+                self._buckets.clear()
+                self._transition(CLOSED)
+            return
+        self._count(failed=False)
+
+    def record_failure(self, trial: bool = False) -> None:
+        if trial:
+            self._trials -= 1
+            if self.state == HALF_OPEN:
+                self._open()
+            return
+        self._count(failed=True)
+        if self.state == CLOSED and self._tripped():
+            self._open()
+
+    def release(self, trial: bool = False) -> None:
+        """Forget a request that ended without a verdict on the node (cancelled, 4xx)"""
+        if trial:
+            self._trials -= 1
+
+    @property
+    def retry_after(self) -> float:
+        """Seconds until an open breaker lets a trial through"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.open_duration - time.monotonic())
+
+    def stats(self) -> Dict[str, Any]:
+        self._expire(int(time.monotonic()))
+        requests = sum(bucket[1] for bucket in self._buckets)
+        failures = sum(bucket[2] for bucket in self._buckets)
+        return {
+            "state": self.state,
+            "window_requests": requests,
+            "window_failure_rate": round(failures / requests, 4) if requests else 0.0,
+            "retry_after": round(self.retry_after, 2)
+        }
+
+    def _count(self, failed: bool) -> None:
+        now = int(time.monotonic())
+        if not self._buckets or self._buckets[-1][0] != now:
+            self._buckets.append([now, 0, 0])
+        bucket = self._buckets[-1]
+        bucket[1] += 1
+        bucket[2] += failed
+        self._expire(now)
+
+    def _expire(self, now: int) -> None:
+        while self._buckets and self._buckets[0][0] <= now - self.window:
+            self._buckets.popleft()
+
+    def _tripped(self) -> bool:
+        requests = sum(bucket[1] for bucket in self._buckets)
+        failures = sum(bucket[2] for bucket in self._buckets)
+        return requests >= self.min_requests and failures >= self.failure_rate * requests
+
+    def _open(self) -> None:
+        if not self.enabled:
+            return
+        self.opened_at = time.monotonic()
+        self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            return
+        logger.warning("Circuit for Ollama backend %s: %s -> %s", self.name, self.state, state)
+        self.state = state
+        metrics.CIRCUIT_STATE.labels(backend=self.name).set(_STATE_VALUES[state])
+
+
+class RetryBudget:
+    """Token bucket that caps retries at a fraction of recent calls
+
+    Every call deposits ``ratio`` tokens and every retry spends one, so
+    retries can add at most ``ratio`` extra load however bad things get; a
+    ``min_per_second`` trickle keeps retries possible at low traffic. The
+    bucket is capped so a quiet period can't bank a retry storm.
+    """
+
+    def __init__(
+        self,
+        ratio: Optional[float] = None,
+        min_per_second: Optional[float] = None,
+        capacity: Optional[float] = None
+    ):
+        self.ratio = ratio if ratio is not None else settings.ollama_retry_budget_ratio
+        self.min_per_second = (
+            min_per_second if min_per_second is not None else settings.ollama_retry_budget_min_per_second
+        )
+        self.capacity = capacity if capacity is not None else settings.ollama_retry_budget_capacity
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def deposit(self) -> None:
+        """Credit one call"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        """Spend a token for one retry, if the budget allows it"""
+        self._refill()
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+
+def backoff_delay(attempt: int, base: Optional[float] = None, cap: Optional[float] = None) -> float:
+    """Exponential backoff with full jitter for the ``attempt``-th retry (1-based)"""
+    base = base if base is not None else settings.ollama_retry_backoff
+    cap = cap if cap is not None else settings.ollama_retry_backoff_max
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
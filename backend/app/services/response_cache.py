@@ -0,0 +1,166 @@
+import importlib
+import json
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from ..utils.helpers import generation_key
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend(ABC):
+    """Storage for cached responses; values are opaque bytes"""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        """Return the cached value or None"""
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        """Store a value, optionally expiring after ``ttl`` seconds"""
+
+    async def close(self) -> None:
+        """Release backend resources"""
+
+    def stats(self) -> Dict[str, Any]:
+        """Backend-specific counters"""
+        return {}
+
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process LRU bounded by entry count and total value bytes"""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[bytes, Optional[float]]]" = OrderedDict()
+        self._bytes = 0
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[bytes]:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at < time.monotonic():
+            self._pop(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        if len(value) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._pop(key)
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._entries[key] = (value, expires_at)
+        self._bytes += len(value)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._pop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _pop(self, key: str) -> None:
+        value, _ = self._entries.pop(key)
+        self._bytes -= len(value)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions
+        }
+
+
+def create_cache_backend(spec: Optional[str] = None) -> CacheBackend:
+    """Build the configured backend: ``memory`` or a ``module:Class`` path
+
+    Custom backends are constructed with ``max_entries`` and ``max_bytes``
+    keyword arguments, like the in-process one.
+    """
+    spec = spec or settings.response_cache_backend
+    kwargs = {
+        "max_entries": settings.response_cache_max_entries,
+        "max_bytes": settings.response_cache_max_bytes
+    }
+    if spec == "memory":
+        return MemoryCacheBackend(**kwargs)
+    module_name, _, class_name = spec.partition(":")
+    backend_class = getattr(importlib.import_module(module_name), class_name)
+    return backend_class(**kwargs)
+
+
+class ResponseCache:
+    """Exact-match cache for deterministic chat generations
+
+    Keys hash the model, its digest from /api/tags (so a re-pulled model
+    invalidates old entries), the prompt and the generation options. Only
+    requests whose sampling is deterministic (temperature 0 or a fixed seed)
+    are cached.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: Optional[float] = None):
+        self.backend = backend
+        self.ttl = ttl if ttl is not None else settings.response_cache_ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def is_cacheable(options: Optional[Dict[str, Any]]) -> bool:
+        """Whether generation with these options is deterministic"""
+        if not options:
+            return False
+        return options.get("temperature") == 0 or options.get("seed") is not None
+
+    @staticmethod
+    def make_key(
+        model: str,
+        digest: Optional[str],
+        prompt: str,
+        options: Optional[Dict[str, Any]],
+        images: Optional[List[str]] = None
+    ) -> str:
+        """Stable hash of everything that determines the generated text"""
+        if images:
+            return generation_key(model, digest or "", prompt, options or {}, images)
+        return generation_key(model, digest or "", prompt, options or {})
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look up a cached generation"""
+        try:
+            value = await self.backend.get(key)
+        except Exception as e:
+            logger.warning("Response cache lookup failed: %s", str(e))
+            value = None
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(value)
+
+    async def set(self, key: str, response: Dict[str, Any]) -> None:
+        """Store a generation"""
+        try:
+            await self.backend.set(key, json.dumps(response).encode(), ttl=self.ttl)
+        except Exception as e:
+            logger.warning("Response cache store failed: %s", str(e))
+
+    async def close(self) -> None:
+        """Close the backend"""
+        await self.backend.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters plus backend occupancy"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "backend": self.backend.stats()
+        }
@@ -0,0 +1,337 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+from ..core import metrics
+from ..utils.helpers import generation_key
+from .ollama_service import OllamaService
+
+logger = logging.getLogger(__name__)
+
+_KMEANS_ITERATIONS = 10
+_KMEANS_SAMPLE = 20000
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def train_centroids(vectors: np.ndarray, clusters: int, seed: int = 0) -> np.ndarray:
+    """Spherical k-means over unit vectors; returns unit centroids
+
+    CPU-bound; runs off the event loop. Trains on a sample so the cost is
+    bounded however large the store grows.
+    """
+    rng = np.random.default_rng(seed)
+    if len(vectors) > _KMEANS_SAMPLE:
+        vectors = vectors[rng.choice(len(vectors), _KMEANS_SAMPLE, replace=False)]
+    centroids = vectors[rng.choice(len(vectors), clusters, replace=False)].copy()
+    for _ in range(_KMEANS_ITERATIONS):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        empty = ~sums.any(axis=1)
+        # Re-seed empty clusters instead of letting them collapse
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        centroids = _normalize(sums)
+    return centroids.astype(np.float32)
+
+
+class SemanticCache:
+    """Answers prompts that paraphrase an earlier one
+
+    Prompts are embedded through Ollama and compared by cosine similarity
+    against previously answered prompts; if the best match clears the
+    threshold for the chat model its answer is returned without generating.
+    Entries are partitioned by model, model digest and options, so a match
+    only counts for an identical generation setup.
+
+    Vectors live in one preallocated float32 matrix of ``max_entries`` unit
+    rows, so memory is fixed up front and a lookup is a single matrix-vector
+    product. When full, the least recently used entry is overwritten. Above
+    ``ann_min_entries`` an inverted-file index (k-means centroids) narrows
+    the search to the rows in the ``ann_probes`` nearest clusters. The store
+    is snapshotted to disk so a restart starts warm.
+    """
+
+    def __init__(
+        self,
+        ollama_service: OllamaService,
+        embedding_model: Optional[str] = None,
+        max_entries: Optional[int] = None,
+        threshold: Optional[float] = None,
+        thresholds: Optional[Dict[str, float]] = None,
+        ann_min_entries: Optional[int] = None,
+        ann_probes: Optional[int] = None,
+        path: Optional[str] = None
+    ):
+        self.ollama_service = ollama_service
+        self.embedding_model = embedding_model or settings.embedding_model
+        self.capacity = max_entries or settings.semantic_cache_max_entries
+        self.threshold = threshold if threshold is not None else settings.semantic_cache_threshold
+        self.thresholds = thresholds if thresholds is not None else settings.semantic_cache_thresholds
+        self.ann_min_entries = (
+            ann_min_entries if ann_min_entries is not None else settings.semantic_cache_ann_min_entries
+        )
+        self.ann_probes = ann_probes or settings.semantic_cache_ann_probes
+        self.path = path if path is not None else settings.semantic_cache_path
+
+        self._vectors: Optional[np.ndarray] = None  # allocated once the dimension is known
+        self._partitions = np.full(self.capacity, -1, dtype=np.int32)
+        self._last_used = np.zeros(self.capacity, dtype=np.int64)
+        self._responses: List[Optional[str]] = [None] * self.capacity
+        self._partition_ids: Dict[str, int] = {}
+        self._size = 0
+        self._clock = 0
+        self._dirty = False
+
+        self._centroids: Optional[np.ndarray] = None
+        self._clusters = np.full(self.capacity, -1, dtype=np.int32)
+        self._trained_size = 0
+        self._training: Optional[asyncio.Task] = None
+        self._snapshot_task: Optional[asyncio.Task] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_partition(model: str, digest: Optional[str], options: Optional[Dict[str, Any]]) -> str:
+        """Entries are only matched within the same model build and options"""
+        return generation_key(model, digest or "", options or {})
+
+    def __len__(self) -> int:
+        return self._size
+
+    async def start(self) -> None:
+        """Load the snapshot, if any, and start periodic snapshots"""
+        if not self.path:
+            return
+        try:
+            await asyncio.to_thread(self._load)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning("Ignoring unreadable semantic cache snapshot %s: %s", self.path, str(e))
+        if self._size:
+            logger.info("Loaded %s semantic cache entries from %s", self._size, self.path)
+            self._maybe_train()
+        if self._snapshot_task is None and settings.semantic_cache_snapshot_interval > 0:
+            self._snapshot_task = asyncio.create_task(self._run_snapshots())
+
+    async def stop(self) -> None:
+        """Stop background tasks and write a final snapshot"""
+        for task in (self._snapshot_task, self._training):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._snapshot_task = None
+        self._training = None
+        await self.save()
+
+    async def lookup(
+        self,
+        partition: str,
+        model: str,
+        prompt: str
+    ) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """Return ``(cached answer or None, prompt embedding)``
+
+        The embedding is handed back so a miss can be stored with ``add``
+        without embedding the prompt twice. Embedding failures are logged and
+        treated as a miss with no embedding: the cache never fails a request.
+        """
+        started = time.perf_counter()
+        try:
+            embedding = await self.ollama_service.embed(self.embedding_model, prompt)
+        except Exception as e:
+            self.errors += 1
+            metrics.SEMANTIC_CACHE_LOOKUPS.labels(model=model, result="error").inc()
+            logger.warning("Semantic cache embedding failed: %s", str(e))
+            return None, None
+        metrics.observe_stage(model, "embedding", time.perf_counter() - started)
+
+        vector = _normalize(np.asarray(embedding, dtype=np.float32))
+        partition_id = self._partition_ids.get(partition)
+        if self._vectors is None or partition_id is None or vector.shape[0] != self._vectors.shape[1]:
+            return self._miss(model), vector
+
+        candidates = self._candidates(vector, partition_id)
+        if candidates.size == 0:
+            return self._miss(model), vector
+        similarities = self._vectors[candidates] @ vector
+        best = int(np.argmax(similarities))
+        similarity = float(similarities[best])
+        metrics.SEMANTIC_CACHE_SIMILARITY.labels(model=model).observe(similarity)
+        if similarity < self.thresholds.get(model, self.threshold):
+            return self._miss(model), vector
+
+        slot = int(candidates[best])
+        self._clock += 1
+        self._last_used[slot] = self._clock
+        self.hits += 1
+        metrics.SEMANTIC_CACHE_LOOKUPS.labels(model=model, result="hit").inc()
+        return self._responses[slot], vector
+
+    def add(self, partition: str, vector: np.ndarray, response: str) -> None:
+        """Store an answer under the embedding returned by ``lookup``"""
+        if self._vectors is None or vector.shape[0] != self._vectors.shape[1]:
+            if self._size:
+                logger.warning("Embedding dimension changed, clearing the semantic cache")
+            self._reset(vector.shape[0])
+
+        if self._size < self.capacity:
+            slot = self._size
+            self._size += 1
+        else:
+            slot = int(np.argmin(self._last_used))
+            self.evictions += 1
+
+        partition_id = self._partition_ids.setdefault(partition, len(self._partition_ids))
+        self._vectors[slot] = vector
+        self._partitions[slot] = partition_id
+        self._responses[slot] = response
+        self._clock += 1
+        self._last_used[slot] = self._clock
+        if self._centroids is not None:
+            self._clusters[slot] = int(np.argmax(self._centroids @ vector))
+        self._dirty = True
+        self._maybe_train()
+
+    async def save(self) -> None:
+        """Write a snapshot if anything changed since the last one"""
+        if not self.path or not self._dirty or self._vectors is None:
+            return
+        size = self._size
+        arrays = {
+            "vectors": self._vectors[:size].copy(),
+            "partitions": self._partitions[:size].copy(),
+            "last_used": self._last_used[:size].copy()
+        }
+        meta = {
+            "embedding_model": self.embedding_model,
+            "clock": self._clock,
+            "partition_ids": dict(self._partition_ids),
+            "responses": self._responses[:size]
+        }
+        self._dirty = False
+        try:
+            await asyncio.to_thread(self._write, arrays, meta)
+        except Exception as e:
+            self._dirty = True
+            logger.error("Failed to write semantic cache snapshot: %s", str(e))
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "embedding_model": self.embedding_model,
+            "ann_clusters": 0 if self._centroids is None else len(self._centroids),
+            "memory_bytes": 0 if self._vectors is None else self._vectors.nbytes
+        }
+
+    def _miss(self, model: str) -> None:
+        self.misses += 1
+        metrics.SEMANTIC_CACHE_LOOKUPS.labels(model=model, result="miss").inc()
+        return None
+
+    def _candidates(self, vector: np.ndarray, partition_id: int) -> np.ndarray:
+        """Row indices worth scoring: the partition, narrowed by the IVF index"""
+        mask = self._partitions[:self._size] == partition_id
+        if self._centroids is not None:
+            probes = np.argsort(self._centroids @ vector)[-self.ann_probes:]
+            mask &= np.isin(self._clusters[:self._size], probes)
+        return np.flatnonzero(mask)
+
+    def _reset(self, dimension: int) -> None:
+        self._vectors = np.zeros((self.capacity, dimension), dtype=np.float32)
+        self._partitions.fill(-1)
+        self._last_used.fill(0)
+        self._responses = [None] * self.capacity
+        self._partition_ids.clear()
+        self._size = 0
+        self._centroids = None
+        self._clusters.fill(-1)
+        self._trained_size = 0
+
+    def _maybe_train(self) -> None:
+        """(Re)build the IVF index once the store crosses the threshold or doubles"""
+        if not self.ann_min_entries or self._size < self.ann_min_entries or self._training is not None:
+            return
+        if self._trained_size and self._size < 2 * self._trained_size:
+            return
+        self._trained_size = self._size
+        self._training = asyncio.get_running_loop().create_task(self._train())
+
+    async def _train(self) -> None:
+        try:
+            clusters = max(1, int(np.sqrt(self._size)))
+            centroids = await asyncio.to_thread(train_centroids, self._vectors[:self._size].copy(), clusters)
+            # Rows may have changed while training; assign them all now, on the loop
+            self._clusters[:self._size] = np.argmax(self._vectors[:self._size] @ centroids.T, axis=1)
+            self._centroids = centroids
+            logger.info("Built semantic cache index with %s clusters over %s entries", clusters, self._size)
+        except Exception as e:
+            logger.error("Failed to build semantic cache index: %s", str(e))
+        finally:
+            self._training = None
+
+    async def _run_snapshots(self) -> None:
+        while True:
+            await asyncio.sleep(settings.semantic_cache_snapshot_interval)
+            await self.save()
+
+    def _write(self, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]) -> None:
+        """Write the snapshot atomically: arrays first, then the metadata that points at them"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        arrays_tmp = f"{self.path}.tmp.npz"
+        np.savez(arrays_tmp, **arrays)
+        os.replace(arrays_tmp, self.path)
+        meta_tmp = f"{self.path}.json.tmp"
+        with open(meta_tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(meta_tmp, f"{self.path}.json")
+
+    def _load(self) -> None:
+        with open(f"{self.path}.json", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["embedding_model"] != self.embedding_model:
+            logger.info("Semantic cache snapshot uses another embedding model, starting empty")
+            return
+        with np.load(self.path) as arrays:
+            vectors = arrays["vectors"]
+            partitions = arrays["partitions"]
+            last_used = arrays["last_used"]
+        responses = meta["responses"]
+        if not (len(vectors) == len(partitions) == len(last_used) == len(responses)):
+            raise ValueError("snapshot arrays and metadata disagree")
+
+        # Keep the most recently used entries if the store shrank
+        keep = np.argsort(last_used)[-self.capacity:]
+        self._reset(vectors.shape[1])
+        size = len(keep)
+        self._vectors[:size] = vectors[keep]
+        self._partitions[:size] = partitions[keep]
+        self._last_used[:size] = last_used[keep]
+        self._responses[:size] = [responses[i] for i in keep]
+        self._partition_ids = meta["partition_ids"]
+        self._size = size
+        self._clock = meta["clock"]
@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) for budgeting prompts"""
+    return len(text) // 4 + 1
+
+
+def build_transcript_prompt(history: List[Dict[str, str]], message: str, budget_tokens: int) -> str:
+    """Assemble a plain-text transcript of the most recent turns that fit the budget"""
+    lines = [f"User: {message}", "Assistant:"]
+    used = estimate_tokens(message) + 2
+    for turn in reversed(history):
+        speaker = "User" if turn["role"] == "user" else "Assistant"
+        line = f"{speaker}: {turn['content']}"
+        cost = estimate_tokens(line)
+        if used + cost > budget_tokens:
+            break
+        lines.insert(0, line)
+        used += cost
+    return "\n".join(lines)
+
+
+def context_window(model: str, options: Optional[Dict[str, Any]] = None) -> int:
+    """Context window (tokens) to budget for a model"""
+    if options and options.get("num_ctx"):
+        return int(options["num_ctx"])
+    return settings.context_window_overrides.get(model, settings.context_window_tokens)
+
+
+class ConversationSession:
+    """Server-side history of one conversation plus Ollama's context tokens
+
+    While the conversation stays on one model and within its window, each
+    turn sends only the new message together with the ``context`` tokens
+    Ollama returned for the previous turn, so earlier turns are not
+    re-tokenized or re-evaluated. Otherwise the prompt is rebuilt from the
+    most recent history that fits.
+
+    ``client_id`` is the caller that created the session; nobody else can
+    see, continue or delete it.
+    """
+
+    def __init__(self, session_id: str, client_id: str):
+        self.id = session_id
+        self.client_id = client_id
+        self.messages: List[Dict[str, str]] = []
+        self.model: Optional[str] = None
+        self.context: Optional[List[int]] = None
+        self.lock = asyncio.Lock()
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+
+    def build_request(
+        self,
+        message: str,
+        model: str,
+        options: Optional[Dict[str, Any]] = None
+    ) -> Tuple[str, Optional[List[int]]]:
+        """Return the prompt and context tokens to send for the next turn"""
+        budget = context_window(model, options) - settings.context_reserve_tokens
+        if self.context and self.model == model and len(self.context) + estimate_tokens(message) <= budget:
+            return message, self.context
+        if not self.messages:
+            return message, None
+        logger.debug("Rebuilding prompt from history for session %s", self.id)
+        return build_transcript_prompt(self.messages, message, budget), None
+
+    def record_turn(self, message: str, reply: str, model: str, context: Optional[List[int]]) -> None:
+        """Append a completed turn"""
+        self.messages.append({"role": "user", "content": message})
+        self.messages.append({"role": "assistant", "content": reply})
+        self.model = model
+        self.context = context
+        self.updated_at = time.time()
+
+    def state(self) -> Dict[str, Any]:
+        """Everything needed to rebuild the session in another process"""
+        return {
+            "session_id": self.id,
+            "client_id": self.client_id,
+            "messages": self.messages,
+            "model": self.model,
+            "context": self.context,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at
+        }
+
+    def update(self, state: Dict[str, Any]) -> None:
+        """Take over the conversation from ``state()`` of a copy of this session"""
+        self.messages = state["messages"]
+        self.model = state["model"]
+        self.context = state["context"]
+        self.updated_at = state["updated_at"]
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "ConversationSession":
+        session = cls(state["session_id"], state["client_id"])
+        session.created_at = state["created_at"]
+        session.update(state)
+        return session
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.id,
+            "model": self.model,
+            "messages": list(self.messages),
+            "context_tokens": len(self.context) if self.context else 0,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at
+        }
+
+
+class SessionStore:
+    """In-memory conversation sessions with idle expiry and an LRU size bound
+
+    Session IDs are random and assigned here, never chosen by clients.
+    Lookups take the caller's ID and treat other callers' sessions as
+    unknown, so IDs can't be used to read or end someone else's session.
+    """
+
+    def __init__(self, max_sessions: Optional[int] = None, ttl: Optional[float] = None):
+        self.max_sessions = max_sessions or settings.session_max
+        self.ttl = ttl or settings.session_ttl
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    async def create(self, client_id: str) -> ConversationSession:
+        """Start a new session owned by ``client_id``"""
+        session = ConversationSession(uuid.uuid4().hex, client_id)
+        self._sessions[session.id] = session
+        self._evict()
+        return session
+
+    async def get(self, session_id: str, client_id: str) -> Optional[ConversationSession]:
+        """Return a live session of ``client_id``, or None if unknown, expired or someone else's"""
+        session = self._sessions.get(session_id)
+        if session is None or session.client_id != client_id:
+            return None
+        if time.time() - session.updated_at > self.ttl:
+            del self._sessions[session_id]
+            return None
+        self._sessions.move_to_end(session_id)
+        return session
+
+    async def delete(self, session_id: str, client_id: str) -> bool:
+        """Forget a session of ``client_id``"""
+        if await self.get(session_id, client_id) is None:
+            return False
+        del self._sessions[session_id]
+        return True
+
+    @asynccontextmanager
+    async def turn(self, session_id: str, client_id: str) -> AsyncIterator[Optional[ConversationSession]]:
+        """Hold a session of ``client_id`` for one turn, so each turn sees the previous reply
+
+        Yields None if the session is unknown, expired or someone else's.
+        """
+        session = await self.get(session_id, client_id)
+        if session is None:
+            yield None
+            return
+        async with session.lock:
+            yield session
+
+    def _evict(self) -> None:
+        now = time.time()
+        expired = [sid for sid, s in self._sessions.items() if now - s.updated_at > self.ttl]
+        for sid in expired:
+            del self._sessions[sid]
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
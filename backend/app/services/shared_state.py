@@ -0,0 +1,620 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import struct
+import threading
+import time
+from contextlib import asynccontextmanager, suppress
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+
+from .admission import AdmissionController, in_background_admission
+from .rate_limiter import RateLimiter
+from .response_cache import CacheBackend, MemoryCacheBackend
+from .session_service import ConversationSession, SessionStore
+from ..core import metrics
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Frame: header length, payload length, JSON header, raw payload
+_FRAME = struct.Struct("!II")
+_STATS_INTERVAL = 1.0
+
+
+def _encode(header: Dict[str, Any], payload: bytes = b"") -> bytes:
+    encoded = json.dumps(header, separators=(",", ":")).encode()
+    return _FRAME.pack(len(encoded), len(payload)) + encoded + payload
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> Tuple[Dict[str, Any], bytes]:
+    header_size, payload_size = _FRAME.unpack(await reader.readexactly(_FRAME.size))
+    header = json.loads(await reader.readexactly(header_size))
+    payload = await reader.readexactly(payload_size) if payload_size else b""
+    return header, payload
+
+
+class _Connection:
+    """One worker's connection: requests still waiting and what it holds
+
+    ``pending`` are slot and session-lock requests not granted yet,
+    ``held`` the granted slots (model by request id) and ``locked`` the
+    session locks, all released if the worker goes away.
+    """
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.pending: Dict[int, asyncio.Task] = {}
+        self.held: Dict[int, str] = {}
+        self.locked: Dict[int, ConversationSession] = {}
+
+    def reply(self, request_id: Optional[int], header: Dict[str, Any], payload: bytes = b"") -> None:
+        self.writer.write(_encode({"id": request_id, **header}, payload))
+
+    def release_all(self, admission: AdmissionController) -> None:
+        for task in self.pending.values():
+            task.cancel()
+        for model in self.held.values():
+            admission.release(model, 0.0)
+        for session in self.locked.values():
+            session.lock.release()
+
+
+Reply = Tuple[Dict[str, Any], bytes]
+Handler = Callable[[_Connection, Dict[str, Any], bytes], Awaitable[Optional[Reply]]]
+
+
+class SharedStateServer:
+    """Coordination store shared by the worker processes of one host
+
+    Runs in the supervisor process (see ``app.server``) and listens on a
+    Unix socket that only the owning user can open. It holds:
+
+    - key/value entries with an optional TTL, in a size-bounded LRU
+      (response cache entries, the model catalog), and processed images
+      in an LRU of their own;
+    - conversation sessions, with a lock per session so turns of one
+      conversation run one at a time whichever worker serves them;
+    - expiring locks, so one worker at a time refreshes shared data;
+    - the admission controller, so the concurrency limits and the fair
+      wait queue apply to all workers together instead of to each one;
+    - the per-key rate limiter, for the same reason.
+
+    Slots and session locks held by a worker are released when its
+    connection drops, so a crashed or restarted worker cannot leak
+    capacity or block a conversation.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = MemoryCacheBackend(settings.response_cache_max_entries, settings.response_cache_max_bytes)
+        self.images = MemoryCacheBackend(settings.image_cache_max_entries, settings.image_cache_max_bytes)
+        self.sessions = SessionStore()
+        self.admission = AdmissionController()
+        self.rate_limiter = RateLimiter()
+        self.connections = 0
+        self._locks: Dict[str, float] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._handlers: Dict[str, Handler] = {
+            "get": self._op_get,
+            "set": self._op_set,
+            "lock": self._op_lock,
+            "stats": self._op_stats,
+            "acquire": self._op_acquire,
+            "release": self._op_release,
+            "cancel": self._op_cancel,
+            "rate_check": self._op_rate_check,
+            "charge": self._op_charge,
+            "session_create": self._op_session_create,
+            "session_get": self._op_session_get,
+            "session_delete": self._op_session_delete,
+            "session_lock": self._op_session_lock,
+            "session_unlock": self._op_session_unlock
+        }
+
+    async def start(self) -> None:
+        """Listen on the socket, replacing a stale one left by an earlier run"""
+        with suppress(FileNotFoundError):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._serve, path=self.path)
+        os.chmod(self.path, 0o600)
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        with suppress(FileNotFoundError):
+            os.unlink(self.path)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connections": self.connections,
+            "entries": self.entries.stats(),
+            "images": self.images.stats(),
+            "sessions": len(self.sessions),
+            "locks": len(self._locks),
+            "admission": self.admission.stats(),
+            "rate_limits": self.rate_limiter.stats()
+        }
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        connection = _Connection(writer)
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    header, payload = await _read_frame(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                handler = self._handlers.get(header["op"])
+                if handler is None:
+                    connection.reply(header.get("id"), {"error": f"unknown operation: {header['op']}"})
+                    continue
+                result = await handler(connection, header, payload)
+                if result is not None:
+                    connection.reply(header.get("id"), *result)
+        finally:
+            self.connections -= 1
+            connection.release_all(self.admission)
+            writer.close()
+
+    # Operation handlers: (connection, header, payload) -> (reply, payload)
+    # to answer at once, or None for one-way ops and for ops answering later
+
+    async def _op_get(self, connection: "_Connection", header: Dict[str, Any], payload: bytes) -> Reply:
+        value = await self._store(header).get(header["key"])
+        return {"found": value is not None}, value or b""
+
+    async def _op_set(self, connection: "_Connection", header: Dict[str, Any], payload: bytes) -> Reply:
+        await self._store(header).set(header["key"], payload, ttl=header.get("ttl"))
+        return {}, b""
+
+    async def _op_lock(self, connection: "_Connection", header: Dict[str, Any], payload: bytes) -> Reply:
+        return {"acquired": self._lock(header["key"], header["ttl"])}, b""
+
+    async def _op_stats(self, connection: "_Connection", header: Dict[str, Any], payload: bytes) -> Reply:
+        return {"stats": self.stats()}, b""
+
+    async def _op_acquire(self, connection: "_Connection", header: Dict[str, Any], payload: bytes) -> None:
+        connection.pending[header["id"]] = asyncio.create_task(self._acquire(connection, header))
+
+    async def _op_release(self, connection: "_Connection", header: Dict[str, Any], payload: bytes) -> None:
+        # Slots of one model are interchangeable, so any of the worker's will do
+        model = header["model"]
+        request_id = next((key for key, value in connection.held.items() if value == model), None)
+        if request_id is not None:
+            del connection.held[request_id]
+            self.admission.release(model, header.get("service_time", 0.0))
+
+    async def _op_cancel(self, connection: "_Connection", header: Dict[str, Any], payload: bytes) -> None:
+        # The worker gave up waiting; if the slot or lock was granted meanwhile, free it
+        request_id = header["id"]
+        task = connection.pending.pop(request_id, None)
+        if task is not None:
+            task.cancel()
+        elif request_id in connection.held:
+            self.admission.release(connection.held.pop(request_id), 0.0)
+        elif request_id in connection.locked:
+            connection.locked.pop(request_id).lock.release()
+
+    async def _op_rate_check(self, connection: "_Connection", header: Dict[str, Any], payload: bytes) -> Reply:
+        try:
+            headers = await self.rate_limiter.check(header["client"], header["model"])
+        except HTTPException as e:
+            return {"status_code": e.status_code, "detail": e.detail, "headers": e.headers}, b""
+        return {"status_code": 200, "headers": headers}, b""
+
+    async def _op_charge(self, connection: "_Connection", header: Dict[str, Any], payload: bytes) -> None:
+        self.rate_limiter.charge(header["client"], header["model"], header["tokens"])
+
+    async def _op_session_create(self, connection: "_Connection", header: Dict[str, Any], payload: bytes) -> Reply:
+        session = await self.sessions.create(header["client"])
+        return {}, json.dumps(session.state()).encode()
+
+    async def _op_session_get(self, connection: "_Connection", header: Dict[str, Any], payload: bytes) -> Reply:
+        session = await self.sessions.get(header["session"], header["client"])
+        return {"found": session is not None}, json.dumps(session.state()).encode() if session else b""
+
+    async def _op_session_delete(self, connection: "_Connection", header: Dict[str, Any], payload: bytes) -> Reply:
+        return {"deleted": await self.sessions.delete(header["session"], header["client"])}, b""
+
+    async def _op_session_lock(self, connection: "_Connection", header: Dict[str, Any], payload: bytes) -> None:
+        connection.pending[header["id"]] = asyncio.create_task(self._lock_session(connection, header))
+
+    async def _op_session_unlock(self, connection: "_Connection", header: Dict[str, Any], payload: bytes) -> None:
+        session = connection.locked.pop(header["lock"], None)
+        if session is not None:
+            if payload:
+                session.update(json.loads(payload))
+            session.lock.release()
+
+    async def _acquire(self, connection: "_Connection", header: Dict[str, Any]) -> None:
+        request_id, model = header["id"], header["model"]
+        try:
+            await self.admission.acquire(
+                model,
+                header.get("client", "anonymous"),
+                background=header.get("background", False)
+            )
+        except HTTPException as e:
+            connection.pending.pop(request_id, None)
+            reply = {"status_code": e.status_code, "detail": e.detail, "headers": e.headers}
+        else:
+            connection.pending.pop(request_id, None)
+            connection.held[request_id] = model
+            reply = {"status_code": 200}
+        reply.update(queued=self.admission.queued, active=self.admission.active)
+        connection.reply(request_id, reply)
+
+    async def _lock_session(self, connection: "_Connection", header: Dict[str, Any]) -> None:
+        request_id = header["id"]
+        session = await self.sessions.get(header["session"], header["client"])
+        state = b""
+        if session is not None:
+            await session.lock.acquire()
+            connection.locked[request_id] = session
+            # Read after waiting, so the previous turn's reply is included
+            state = json.dumps(session.state()).encode()
+        connection.pending.pop(request_id, None)
+        connection.reply(request_id, {"found": session is not None}, state)
+
+    def _lock(self, key: str, ttl: float) -> bool:
+        now = time.monotonic()
+        # Expired locks are never released explicitly; drop them here so
+        # keys that are not asked for again don't pile up
+        for expired in [name for name, expires_at in self._locks.items() if expires_at <= now]:
+            del self._locks[expired]
+        if key in self._locks:
+            return False
+        self._locks[key] = now + ttl
+        return True
+
+    def _store(self, header: Dict[str, Any]) -> MemoryCacheBackend:
+        return self.images if header.get("store") == "images" else self.entries
+
+
+def start_server_thread(path: str) -> threading.Thread:
+    """Run a ``SharedStateServer`` on its own event loop in a daemon thread
+
+    Returns once the socket is listening, so workers started afterwards
+    can connect straight away.
+    """
+    ready = threading.Event()
+    failure: Dict[str, BaseException] = {}
+
+    def run() -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        server = SharedStateServer(path)
+        try:
+            loop.run_until_complete(server.start())
+        except BaseException as e:
+            failure["error"] = e
+            ready.set()
+            return
+        ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            loop.run_until_complete(server.stop())
+
+    thread = threading.Thread(target=run, name="shared-state", daemon=True)
+    thread.start()
+    ready.wait()
+    if "error" in failure:
+        raise failure["error"]
+    return thread
+
+
+class SharedStateClient:
+    """A worker's connection to the ``SharedStateServer``
+
+    One connection is multiplexed by request id, so any number of
+    coroutines can use the client concurrently. It reconnects on the next
+    call if the connection was lost.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._receiver: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._connecting = asyncio.Lock()
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def connect(self) -> None:
+        async with self._connecting:
+            if self.connected:
+                return
+            self._reader, self._writer = await asyncio.open_unix_connection(self.path)
+            self._receiver = asyncio.create_task(self._receive(self._reader))
+
+    async def close(self) -> None:
+        # Stop receiving first, so closing isn't reported as a lost connection
+        if self._receiver is not None:
+            self._receiver.cancel()
+            await asyncio.gather(self._receiver, return_exceptions=True)
+            self._receiver = None
+        if self._writer is not None:
+            self._writer.close()
+            with suppress(Exception):
+                await self._writer.wait_closed()
+            self._writer = None
+
+    async def get(self, key: str, store: Optional[str] = None) -> Optional[bytes]:
+        header, payload = await self._call({"op": "get", "key": key, "store": store})
+        return payload if header["found"] else None
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None, store: Optional[str] = None) -> None:
+        await self._call({"op": "set", "key": key, "ttl": ttl, "store": store}, value)
+
+    async def lock(self, key: str, ttl: float) -> bool:
+        """Take an expiring lock; False if another worker holds it"""
+        header, _ = await self._call({"op": "lock", "key": key, "ttl": ttl})
+        return header["acquired"]
+
+    async def stats(self) -> Dict[str, Any]:
+        header, _ = await self._call({"op": "stats"})
+        return header["stats"]
+
+    async def acquire_slot(self, model: str, client: str, background: bool = False) -> Dict[str, int]:
+        """Wait for a generation slot; returns the global queued/active counts
+
+        Raises the same 429/503 ``HTTPException`` as ``AdmissionController``.
+        """
+        header, _ = await self._call(
+            {"op": "acquire", "model": model, "client": client, "background": background},
+            cancel=True
+        )
+        if header["status_code"] != 200:
+            raise HTTPException(status_code=header["status_code"], detail=header["detail"], headers=header["headers"])
+        return {"queued": header["queued"], "active": header["active"]}
+
+    def release_slot(self, model: str, service_time: float) -> None:
+        """Give a slot back (no reply; a lost connection releases it anyway)"""
+        self._send({"op": "release", "model": model, "service_time": service_time})
+
+    async def rate_check(self, client: str, model: str) -> Dict[str, str]:
+        """Admit one request under the shared rate limits, like ``RateLimiter.check``"""
+        header, _ = await self._call({"op": "rate_check", "client": client, "model": model})
+        if header["status_code"] != 200:
+            raise HTTPException(status_code=header["status_code"], detail=header["detail"], headers=header["headers"])
+        return header["headers"]
+
+    def rate_charge(self, client: str, model: str, tokens: int) -> None:
+        """Charge tokens used against the shared rate limits (no reply)"""
+        self._send({"op": "charge", "client": client, "model": model, "tokens": tokens})
+
+    async def session_create(self, client: str) -> Dict[str, Any]:
+        _, payload = await self._call({"op": "session_create", "client": client})
+        return json.loads(payload)
+
+    async def session_get(self, session_id: str, client: str) -> Optional[Dict[str, Any]]:
+        header, payload = await self._call({"op": "session_get", "session": session_id, "client": client})
+        return json.loads(payload) if header["found"] else None
+
+    async def session_delete(self, session_id: str, client: str) -> bool:
+        header, _ = await self._call({"op": "session_delete", "session": session_id, "client": client})
+        return header["deleted"]
+
+    async def session_lock(self, session_id: str, client: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """Wait for a session's lock; returns the lock id and the session's current state
+
+        None if the session is unknown, expired or someone else's.
+        """
+        request_id = next(self._ids)
+        header, payload = await self._call(
+            {"op": "session_lock", "session": session_id, "client": client},
+            cancel=True,
+            request_id=request_id
+        )
+        return (request_id, json.loads(payload)) if header["found"] else None
+
+    def session_unlock(self, lock_id: int, state: Optional[Dict[str, Any]] = None) -> None:
+        """Release a session's lock, saving its new ``state`` if given (no reply)"""
+        payload = json.dumps(state).encode() if state is not None else b""
+        self._send({"op": "session_unlock", "lock": lock_id}, payload)
+
+    async def _call(
+        self,
+        header: Dict[str, Any],
+        payload: bytes = b"",
+        cancel: bool = False,
+        request_id: Optional[int] = None
+    ) -> Tuple[Dict[str, Any], bytes]:
+        if not self.connected:
+            await self.connect()
+        request_id = request_id or next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            self._send({**header, "id": request_id}, payload)
+            return await future
+        except asyncio.CancelledError:
+            if cancel:
+                self._send({"op": "cancel", "id": request_id})
+            raise
+        finally:
+            self._pending.pop(request_id, None)
+
+    def _send(self, header: Dict[str, Any], payload: bytes = b"") -> None:
+        if self.connected:
+            self._writer.write(_encode(header, payload))
+
+    async def _receive(self, reader: asyncio.StreamReader) -> None:
+        error: BaseException = ConnectionError("Shared state server closed the connection")
+        try:
+            while True:
+                header, payload = await _read_frame(reader)
+                future = self._pending.get(header.pop("id"))
+                if future is not None and not future.done():
+                    future.set_result((header, payload))
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            logger.error("Lost connection to shared state server: %s", str(e) or type(e).__name__)
+        except asyncio.CancelledError:
+            error = ConnectionError("Shared state client closed")
+            raise
+        finally:
+            if self._writer is not None:
+                self._writer.close()
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(error)
+
+
+class SharedCacheBackend(CacheBackend):
+    """Cache entries kept in the shared-state server
+
+    Response cache entries by default; ``images`` selects the server's
+    separate image LRU, so large images don't evict cached responses.
+    """
+
+    def __init__(self, store: SharedStateClient, prefix: str = "response", images: bool = False):
+        self.store = store
+        self.prefix = prefix
+        self._store = "images" if images else None
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.store.get(f"{self.prefix}:{key}", store=self._store)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        await self.store.set(f"{self.prefix}:{key}", value, ttl=ttl, store=self._store)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"shared": True}
+
+
+class SharedAdmissionController(AdmissionController):
+    """Admission control decided by the shared-state server
+
+    Same interface as ``AdmissionController``, but requests queue in the
+    server's controller, so ``max_concurrent_generations`` and friends cap
+    all workers together rather than being multiplied by the worker
+    count. Local counters describe this worker; ``queued``/``active``
+    (used by readiness and metrics) are the global values, polled every
+    second.
+    """
+
+    def __init__(self, store: SharedStateClient):
+        super().__init__()
+        self.store = store
+        self._global: Dict[str, Any] = {}
+        self._poller: Optional[asyncio.Task] = None
+
+    @property
+    def queued(self) -> int:
+        return self._global.get("queued", 0)
+
+    @property
+    def active(self) -> int:
+        return self._global.get("active", 0)
+
+    async def start(self) -> None:
+        if self._poller is None:
+            self._poller = asyncio.create_task(self._poll())
+
+    async def stop(self) -> None:
+        if self._poller is not None:
+            self._poller.cancel()
+            await asyncio.gather(self._poller, return_exceptions=True)
+            self._poller = None
+
+    async def acquire(self, model: str, client: str = "anonymous", background: Optional[bool] = None) -> None:
+        if background is None:
+            background = in_background_admission()
+        requested = time.monotonic()
+        try:
+            counts = await self.store.acquire_slot(model, client, background)
+        except HTTPException as e:
+            if e.status_code == 429:
+                self._rejected += 1
+            else:
+                self._timed_out += 1
+            raise
+        self._global.update(counts)
+        self._admit(model, time.monotonic() - requested)
+
+    def release(self, model: str, service_time: float) -> None:
+        self.store.release_slot(model, service_time)
+        super().release(model, service_time)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "scope": "worker", "global": self._global}
+
+    async def _poll(self) -> None:
+        while True:
+            try:
+                self._global = (await self.store.stats())["admission"]
+            except Exception as e:
+                logger.debug("Shared admission stats unavailable: %s", str(e))
+            await asyncio.sleep(_STATS_INTERVAL)
+
+
+class SharedRateLimiter(RateLimiter):
+    """Per-key rate limits kept in the shared-state server, so they hold across workers"""
+
+    def __init__(self, store: SharedStateClient):
+        super().__init__()
+        self.store = store
+
+    async def check(self, client: str, model: str) -> Dict[str, str]:
+        try:
+            headers = await self.store.rate_check(client, model)
+        except HTTPException as e:
+            if e.status_code == 429:
+                self.rejected += 1
+                metrics.RATE_LIMITED.labels(limit="shared").inc()
+            raise
+        self.admitted += 1
+        return headers
+
+    def charge(self, client: str, model: str, tokens: int) -> None:
+        self.store.rate_charge(client, model, tokens)
+
+
+class SharedSessionStore(SessionStore):
+    """Conversation sessions kept in the shared-state server
+
+    Any worker can continue any conversation. A turn holds the session's
+    lock in the server, gets the current history along with it, and
+    writes the new state back when it lets go, so turns of one
+    conversation still run one at a time across workers.
+    """
+
+    def __init__(self, store: SharedStateClient):
+        super().__init__()
+        self.store = store
+
+    async def create(self, client_id: str) -> ConversationSession:
+        return ConversationSession.from_state(await self.store.session_create(client_id))
+
+    async def get(self, session_id: str, client_id: str) -> Optional[ConversationSession]:
+        state = await self.store.session_get(session_id, client_id)
+        return ConversationSession.from_state(state) if state is not None else None
+
+    async def delete(self, session_id: str, client_id: str) -> bool:
+        return await self.store.session_delete(session_id, client_id)
+
+    @asynccontextmanager
+    async def turn(self, session_id: str, client_id: str) -> AsyncIterator[Optional[ConversationSession]]:
+        held = await self.store.session_lock(session_id, client_id)
+        if held is None:
+            yield None
+            return
+        lock_id, state = held
+        session = ConversationSession.from_state(state)
+        try:
+            yield session
+        finally:
+            # Only a recorded turn changes the session
+            changed = session.updated_at != state["updated_at"]
+            self.store.session_unlock(lock_id, session.state() if changed else None)
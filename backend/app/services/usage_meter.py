@@ -0,0 +1,115 @@
+import asyncio
+import logging
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from ..models.db import ApiUsage
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_COUNTERS = ("requests", "prompt_tokens", "completion_tokens")
+
+
+class UsageMeter:
+    """Requests and tokens per client, model and day, written to the database periodically
+
+    Recording a request only bumps in-memory counters. Every
+    ``usage_flush_interval`` seconds (and at shutdown) a background task
+    adds the accumulated deltas to ``api_usage``, one upsert per
+    client/model/day. Deltas are added rather than overwritten, so several
+    workers can meter into the same table. A failed flush keeps its
+    deltas for the next attempt.
+    """
+
+    def __init__(self, engine: AsyncEngine, flush_interval: Optional[float] = None):
+        self.engine = engine
+        self.flush_interval = flush_interval or settings.usage_flush_interval
+        self._pending: Dict[Tuple[str, str, date], List[int]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.flushes = 0
+        self.failed_flushes = 0
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flusher and write what is still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def record(self, client: str, model: str, prompt_tokens: int, completion_tokens: int) -> None:
+        """Count one request and the tokens it used"""
+        key = (client, model, datetime.now(timezone.utc).date())
+        counters = self._pending.get(key)
+        if counters is None:
+            counters = self._pending[key] = [0, 0, 0]
+        counters[0] += 1
+        counters[1] += prompt_tokens
+        counters[2] += completion_tokens
+
+    async def flush(self) -> None:
+        """Add the pending deltas to the database"""
+        async with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            now = datetime.now(timezone.utc)
+            rows = [
+                {"client_id": client, "model": model, "day": day, "updated_at": now, **dict(zip(_COUNTERS, counters))}
+                for (client, model, day), counters in pending.items()
+            ]
+            try:
+                async with self.engine.begin() as conn:
+                    await self._add(conn, rows)
+                self.flushes += 1
+            except Exception as e:
+                self.failed_flushes += 1
+                logger.error("Failed to flush usage for %s clients/models: %s", len(rows), str(e))
+                for key, counters in pending.items():
+                    current = self._pending.setdefault(key, [0, 0, 0])
+                    for index, value in enumerate(counters):
+                        current[index] += value
+
+    def stats(self) -> Dict[str, Any]:
+        return {"pending": len(self._pending), "flushes": self.flushes, "failed_flushes": self.failed_flushes}
+
+    @staticmethod
+    async def _add(conn, rows: List[Dict[str, Any]]) -> None:
+        table = ApiUsage.__table__
+        dialect = conn.dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            statement = (postgresql if dialect == "postgresql" else sqlite).insert(table)
+            statement = statement.on_conflict_do_update(
+                index_elements=["client_id", "model", "day"],
+                set_={
+                    **{name: table.c[name] + statement.excluded[name] for name in _COUNTERS},
+                    "updated_at": statement.excluded.updated_at
+                }
+            )
+            await conn.execute(statement, rows)
+            return
+        # Other databases: update, then insert the rows that didn't exist yet
+        for row in rows:
+            result = await conn.execute(
+                update(table)
+                .where(table.c.client_id == row["client_id"], table.c.model == row["model"], table.c.day == row["day"])
+                .values(updated_at=row["updated_at"], **{name: table.c[name] + row[name] for name in _COUNTERS})
+            )
+            if result.rowcount == 0:
+                await conn.execute(insert(table), row)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            # Shield so shutdown doesn't abort a flush mid-write
+            await asyncio.shield(self.flush())
@@ -0,0 +1,152 @@
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+_INITIAL_CAPACITY = 1024
+
+
+class VectorStore:
+    """Unit-normalized float32 vectors in a memory-mapped file
+
+    Row ``i`` of ``vectors.f32`` is the vector of the chunk whose
+    ``vector_row`` is ``i``; everything else about a chunk lives in the
+    database. The file grows by doubling, and rows of deleted chunks are
+    reused, so it stays about as large as the live corpus. The OS page
+    cache keeps hot rows in memory without the process holding a copy.
+
+    Which rows are live (and their collection) is kept in small in-memory
+    arrays rebuilt from the database at startup, so a search is one
+    matrix-vector product over the file plus a mask.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._path = os.path.join(directory, "vectors.f32")
+        self._meta_path = os.path.join(directory, "index.json")
+        self.dimension: Optional[int] = None
+        self._vectors: Optional[np.memmap] = None
+        self._collections = np.full(0, -1, dtype=np.int32)  # -1 marks a free row
+        self._collection_ids: Dict[str, int] = {}
+        self._high_water = 0  # rows [0, high_water) have been written at least once
+        self._free: List[int] = []
+        self._lock = threading.Lock()  # writers run in worker threads
+
+    @property
+    def size(self) -> int:
+        """Number of live vectors"""
+        return int((self._collections[:self._high_water] >= 0).sum())
+
+    @property
+    def capacity(self) -> int:
+        return 0 if self._vectors is None else len(self._vectors)
+
+    def open(self, rows: Iterable[Tuple[int, str]]) -> None:
+        """Map the existing file and mark ``(vector_row, collection)`` pairs live"""
+        os.makedirs(self.directory, exist_ok=True)
+        if not os.path.exists(self._meta_path):
+            return
+        with open(self._meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        self.dimension = meta["dimension"]
+        self._map(meta["capacity"])
+        for row, collection in rows:
+            self._collections[row] = self._collection_id(collection)
+            self._high_water = max(self._high_water, row + 1)
+        self._free = [row for row in range(self._high_water - 1, -1, -1) if self._collections[row] < 0]
+
+    def allocate(self, count: int) -> List[int]:
+        """Reserve rows for new vectors (reusing freed rows first)"""
+        with self._lock:
+            rows = [self._free.pop() for _ in range(min(count, len(self._free)))]
+            rows.extend(range(self._high_water, self._high_water + count - len(rows)))
+            self._high_water = max(self._high_water, max(rows, default=-1) + 1)
+            return rows
+
+    def write(self, rows: List[int], vectors: np.ndarray) -> None:
+        """Store normalized vectors at reserved rows and flush them to disk
+
+        Rows only become searchable once ``activate`` is called, after their
+        metadata has been committed.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+            elif vectors.shape[1] != self.dimension:
+                raise ValueError(
+                    f"Embedding dimension {vectors.shape[1]} does not match the index ({self.dimension})"
+                )
+            needed = max(rows) + 1
+            if needed > self.capacity:
+                self._map(max(needed, 2 * self.capacity, _INITIAL_CAPACITY))
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            mapped = self._vectors
+            mapped[rows] = vectors / np.maximum(norms, 1e-12)
+        mapped.flush()
+
+    def activate(self, rows: List[int], collection: str) -> None:
+        """Make written rows searchable"""
+        with self._lock:
+            self._collections[rows] = self._collection_id(collection)
+
+    def release(self, rows: List[int]) -> None:
+        """Drop rows from search and make them reusable"""
+        with self._lock:
+            self._collections[rows] = -1
+            self._free.extend(rows)
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        collection: Optional[str] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-``k`` rows by cosine similarity: ``(rows, scores)``, best first
+
+        CPU-bound (one pass over the live part of the file); call it from a
+        worker thread.
+        """
+        if self._vectors is None or self._high_water == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query = np.asarray(query, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        # Snapshot references: a concurrent write may remap to a larger file
+        vectors, labels = self._vectors, self._collections
+        rows = min(self._high_water, len(vectors), len(labels))
+        labels = labels[:rows]
+        if collection is None:
+            mask = labels >= 0
+        else:
+            mask = labels == self._collection_ids.get(collection, -2)
+        scores = vectors[:rows] @ query
+        scores[~mask] = -np.inf
+
+        k = min(k, int(mask.sum()))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        # Partial selection, then sort only the k winners
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(scores[top])[::-1]]
+        return top, scores[top]
+
+    def _collection_id(self, collection: str) -> int:
+        return self._collection_ids.setdefault(collection, len(self._collection_ids))
+
+    def _map(self, capacity: int) -> None:
+        """(Re)map the file at ``capacity`` rows, growing it if needed"""
+        with open(self._path, "ab") as f:
+            f.truncate(max(os.path.getsize(self._path), capacity * self.dimension * 4))
+        if self._vectors is not None:
+            self._vectors.flush()
+        self._vectors = np.memmap(self._path, dtype=np.float32, mode="r+", shape=(capacity, self.dimension))
+        collections = np.full(capacity, -1, dtype=np.int32)
+        collections[:len(self._collections)] = self._collections[:capacity]
+        self._collections = collections
+        tmp_path = f"{self._meta_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"dimension": self.dimension, "capacity": capacity}, f)
+        os.replace(tmp_path, self._meta_path)
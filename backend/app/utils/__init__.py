@@ -3,7 +3,9 @@ from .helpers import (
     validate_message_content,
     format_model_list,
     extract_error_message,
-    get_default_models
+    get_default_models,
+    format_sse,
+    generation_key
 )
 
 __all__ = [
@@ -11,5 +13,7 @@ __all__ = [
     "validate_message_content",
     "format_model_list", 
     "extract_error_message",
-    "get_default_models"
+    "get_default_models",
+    "format_sse",
+    "generation_key"
 ]
@@ -0,0 +1,79 @@
+import codecs
+from typing import AsyncIterator, Iterator, List
+
+# Preferred split points, best first; a chunk ends at the last one found in
+# the back half of the window, so chunks rarely cut through a sentence
+_SEPARATORS = ("\n\n", "\n", ". ", "? ", "! ", "; ", ", ", " ")
+
+
+class TextChunker:
+    """Incrementally split streamed text into overlapping chunks
+
+    Text is fed in arbitrary pieces (e.g. decoded file blocks) and complete
+    chunks of at most ``size`` characters come out as soon as enough text
+    has arrived, so a large file never has to be held in memory whole.
+    Consecutive chunks share about ``overlap`` characters of context.
+    """
+
+    def __init__(self, size: int, overlap: int):
+        if not 0 <= overlap < size:
+            raise ValueError("overlap must be smaller than the chunk size")
+        self.size = size
+        self.overlap = overlap
+        self._buffer = ""
+
+    def feed(self, text: str) -> Iterator[str]:
+        """Add text and yield every chunk that is now complete"""
+        buffer = self._buffer + text
+        start = 0
+        # Walk an offset instead of re-slicing the buffer for every chunk
+        while len(buffer) - start > self.size:
+            window = buffer[start:start + self.size]
+            cut = self._split_point(window)
+            chunk = window[:cut].strip()
+            if chunk:
+                yield chunk
+            start += self._overlap_start(window, cut)
+        self._buffer = buffer[start:]
+
+    def finish(self) -> Iterator[str]:
+        """Yield the final, possibly short, chunk"""
+        chunk = self._buffer.strip()
+        self._buffer = ""
+        if chunk:
+            yield chunk
+
+    def _split_point(self, window: str) -> int:
+        for separator in _SEPARATORS:
+            position = window.rfind(separator, self.size // 2)
+            if position != -1:
+                return position + len(separator)
+        return self.size
+
+    def _overlap_start(self, window: str, cut: int) -> int:
+        """Start the next chunk ``overlap`` characters back, on a word boundary"""
+        if not self.overlap:
+            return cut
+        # Never step back past half the chunk, so the buffer always shrinks
+        start = max(cut - self.overlap, (cut + 1) // 2)
+        space = window.find(" ", start, cut)
+        return space + 1 if space != -1 else start
+
+
+async def chunk_stream(blocks: AsyncIterator[bytes], size: int, overlap: int) -> AsyncIterator[str]:
+    """Decode UTF-8 blocks incrementally and yield text chunks as they complete"""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    chunker = TextChunker(size, overlap)
+    async for block in blocks:
+        for chunk in chunker.feed(decoder.decode(block)):
+            yield chunk
+    for chunk in chunker.feed(decoder.decode(b"", final=True)):
+        yield chunk
+    for chunk in chunker.finish():
+        yield chunk
+
+
+def chunk_text(text: str, size: int, overlap: int) -> List[str]:
+    """Split an in-memory string into chunks"""
+    chunker = TextChunker(size, overlap)
+    return [*chunker.feed(text), *chunker.finish()]
@@ -1,5 +1,9 @@
+import hashlib
+import json
 import re
-from typing import List, Optional
+from typing import Any, List, Optional
+
+import orjson
 
 
 def sanitize_model_name(model_name: str) -> str:
@@ -13,11 +17,11 @@ def validate_message_content(content: str) -> bool:
     """Validate message content"""
     if not content or not content.strip():
         return False
-    
+
     # Check for reasonable length (prevent extremely long messages)
     if len(content) > 10000:
         return False
-    
+
     return True
 
 
@@ -25,11 +29,11 @@ def format_model_list(models: List[str]) -> List[str]:
     """Format and clean model list"""
     if not models:
         return []
-    
+
     # Remove duplicates and sort
     unique_models = list(set(models))
     unique_models.sort()
-    
+
     return unique_models
 
 
@@ -46,3 +50,18 @@ def extract_error_message(error: Exception) -> str:
 def get_default_models() -> List[str]:
     """Get list of default fallback models"""
     return ['llama3.2', 'mistral', 'codellama', 'llava', 'gemma']
+
+
+def format_sse(data: Any, event: Optional[str] = None) -> str:
+    """Format a payload as a Server-Sent Events frame"""
+    frame = ""
+    if event:
+        frame += f"event: {event}\n"
+    frame += f"data: {orjson.dumps(data).decode()}\n\n"
+    return frame
+
+
+def generation_key(*parts: Any) -> str:
+    """Stable SHA-256 over JSON-serializable request parts"""
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
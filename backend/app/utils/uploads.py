@@ -0,0 +1,155 @@
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from multipart.multipart import MultipartParser, parse_options_header
+
+from app.config import settings
+
+MAX_FIELD_BYTES = 64 * 1024
+MAX_FIELDS = 8
+
+
+class UploadedFile:
+    """A file part read from a multipart body, hashed while it streamed in"""
+
+    __slots__ = ("field", "filename", "content_type", "data", "sha256")
+
+    def __init__(self, field: str, filename: Optional[str], content_type: Optional[str]):
+        self.field = field
+        self.filename = filename
+        self.content_type = content_type
+        self.data = bytearray()
+        self.sha256 = hashlib.sha256()
+
+    @property
+    def digest(self) -> str:
+        return self.sha256.hexdigest()
+
+
+class _PartCollector:
+    """python-multipart callbacks collecting form fields and size-limited files"""
+
+    def __init__(self, max_file_bytes: int, max_files: int):
+        self.max_file_bytes = max_file_bytes
+        self.max_files = max_files
+        self.fields: Dict[str, str] = {}
+        self.files: List[UploadedFile] = []
+        self.error: Optional[HTTPException] = None
+        self._header_field = bytearray()
+        self._header_value = bytearray()
+        self._headers: Dict[bytes, bytes] = {}
+        self._field: Optional[str] = None
+        self._file: Optional[UploadedFile] = None
+        self._value = bytearray()
+
+    def callbacks(self) -> Dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": lambda data, start, end: self._header_field.extend(data[start:end]),
+            "on_header_value": lambda data, start, end: self._header_value.extend(data[start:end]),
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end
+        }
+
+    def on_part_begin(self) -> None:
+        self._headers = {}
+        self._field = None
+        self._file = None
+        self._value = bytearray()
+
+    def on_header_end(self) -> None:
+        self._headers[bytes(self._header_field).lower()] = bytes(self._header_value)
+        self._header_field.clear()
+        self._header_value.clear()
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._field = options.get(b"name", b"").decode("latin-1")
+        if b"filename" not in options:
+            if len(self.fields) >= MAX_FIELDS:
+                self._fail(413, f"At most {MAX_FIELDS} form fields per request")
+                self._field = None
+            return
+        if len(self.files) >= self.max_files:
+            self._fail(413, f"At most {self.max_files} files per request")
+            return
+        content_type = self._headers.get(b"content-type")
+        self._file = UploadedFile(
+            self._field,
+            options[b"filename"].decode("utf-8", "replace"),
+            content_type.decode("latin-1") if content_type else None
+        )
+        self.files.append(self._file)
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self.error is not None:
+            return
+        chunk = data[start:end]
+        if self._file is not None:
+            if len(self._file.data) + len(chunk) > self.max_file_bytes:
+                self._fail(413, f"File too large: at most {self.max_file_bytes} bytes")
+                return
+            self._file.data.extend(chunk)
+            self._file.sha256.update(chunk)
+        else:
+            if len(self._value) + len(chunk) > MAX_FIELD_BYTES:
+                self._fail(413, f"Form field too large: at most {MAX_FIELD_BYTES} bytes")
+                return
+            self._value.extend(chunk)
+
+    def on_part_end(self) -> None:
+        if self._file is None and self._field is not None and self.error is None:
+            try:
+                self.fields[self._field] = self._value.decode("utf-8")
+            except UnicodeDecodeError:
+                self._fail(400, f"Form field {self._field!r} is not valid UTF-8")
+
+    def _fail(self, status_code: int, detail: str) -> None:
+        if self.error is None:
+            self.error = HTTPException(status_code=status_code, detail=detail)
+
+
+async def read_multipart(
+    request: Request,
+    max_file_bytes: Optional[int] = None,
+    max_files: Optional[int] = None
+) -> Tuple[Dict[str, str], List[UploadedFile]]:
+    """Stream-parse a multipart/form-data body into text fields and files
+
+    Unlike ``request.form()``, file parts are not spooled to a temporary file
+    and read back: each is accumulated once in memory and hashed as it
+    arrives, and the request fails with 413 as soon as a limit is crossed,
+    without reading the rest of the body. The body limit is checked against
+    the bytes actually received, so chunked requests without a
+    ``Content-Length`` are bounded too.
+    """
+    max_file_bytes = max_file_bytes or settings.image_max_upload_bytes
+    max_files = max_files or settings.image_max_files
+
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=415, detail="Expected multipart/form-data")
+
+    max_body_bytes = max_files * max_file_bytes + MAX_FIELDS * MAX_FIELD_BYTES
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_body_bytes:
+        raise HTTPException(status_code=413, detail="Request body too large")
+
+    collector = _PartCollector(max_file_bytes, max_files)
+    parser = MultipartParser(boundary, collector.callbacks())
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > max_body_bytes:
+            raise HTTPException(status_code=413, detail="Request body too large")
+        parser.write(chunk)
+        if collector.error is not None:
+            raise collector.error
+    parser.finalize()
+    if collector.error is not None:
+        raise collector.error
+    return collector.fields, collector.files
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Fake Ollama server for benchmarks
+
+Speaks the subset of the Ollama API this service uses (/, /api/tags,
+/api/ps, /api/generate, /api/embed, /api/embeddings) and simulates the
+timing of a real node: a model load on first use (and after keep_alive
+expires), prompt evaluation and token generation at fixed rates, streamed
+in chunks, a limited number of parallel generations per model, and
+injected errors and timeouts. Durations in the responses are the
+simulated ones, in nanoseconds, like Ollama reports them.
+
+    python -m benchmarks.fake_ollama --port 11435 --token-rate 40 --load-time 2
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+_NS = 1_000_000_000
+
+
+@dataclass
+class FakeOllamaConfig:
+    """Simulated node behaviour; rates are in tokens per second"""
+
+    models: List[str] = field(default_factory=lambda: ["llama3.2", "nomic-embed-text"])
+    load_time: float = 1.0  # seconds to load a model that isn't resident
+    keep_alive: float = 300.0  # seconds a model stays loaded after its last request
+    prompt_eval_rate: float = 500.0
+    token_rate: float = 50.0
+    response_tokens: int = 64  # default num_predict
+    chunk_tokens: int = 1  # tokens per streamed chunk
+    parallel: int = 4  # concurrent generations per model (OLLAMA_NUM_PARALLEL)
+    embedding_dimension: int = 768
+    embed_time: float = 0.005  # seconds per embedded text
+    error_rate: float = 0.0  # fraction of generations answered with a 500
+    timeout_rate: float = 0.0  # fraction of generations that hang for hang_time
+    hang_time: float = 120.0
+    seed: Optional[int] = None
+
+    @staticmethod
+    def add_arguments(parser: argparse.ArgumentParser) -> None:
+        defaults = FakeOllamaConfig()
+        group = parser.add_argument_group("fake Ollama")
+        group.add_argument("--models", default=",".join(defaults.models), help="Comma-separated installed models")
+        for name, value in asdict(defaults).items():
+            if name == "models":
+                continue
+            group.add_argument(
+                f"--{name.replace('_', '-')}",
+                dest=name,
+                type=int if isinstance(value, int) or name == "seed" else float,
+                default=value
+            )
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> "FakeOllamaConfig":
+        values = {name: getattr(args, name) for name in asdict(cls()) if hasattr(args, name)}
+        values["models"] = [model.strip() for model in args.models.split(",") if model.strip()]
+        return cls(**values)
+
+
+class _Model:
+    def __init__(self, name: str, parallel: int):
+        self.name = name
+        self.slots = asyncio.Semaphore(parallel)
+        self.load_lock = asyncio.Lock()
+        self.expires_at = 0.0  # monotonic; 0 means not loaded
+
+    @property
+    def loaded(self) -> bool:
+        return self.expires_at > time.monotonic()
+
+
+def create_app(config: FakeOllamaConfig) -> FastAPI:
+    """Build the fake Ollama ASGI app"""
+    app = FastAPI(title="Fake Ollama")
+    models = {name: _Model(name, config.parallel) for name in config.models}
+    rng = random.Random(config.seed)
+
+    def find_model(name: str) -> Optional[_Model]:
+        return models.get(name) or models.get(name.removesuffix(":latest"))
+
+    async def ensure_loaded(model: _Model, keep_alive: Any) -> float:
+        """Load the model if needed; returns the load time paid by this request"""
+        started = time.monotonic()
+        async with model.load_lock:
+            if not model.loaded:
+                await asyncio.sleep(config.load_time)
+            model.expires_at = time.monotonic() + _keep_alive_seconds(keep_alive, config.keep_alive)
+        return time.monotonic() - started
+
+    def injected_failure() -> Optional[str]:
+        roll = rng.random()
+        if roll < config.error_rate:
+            return "error"
+        if roll < config.error_rate + config.timeout_rate:
+            return "timeout"
+        return None
+
+    @app.get("/")
+    async def root():
+        return PlainTextResponse("Ollama is running")
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [_model_entry(name) for name in models]}
+
+    @app.get("/api/ps")
+    async def ps():
+        now = time.monotonic()
+        return {
+            "models": [
+                {
+                    **_model_entry(model.name),
+                    "expires_at": datetime.fromtimestamp(
+                        time.time() + model.expires_at - now, timezone.utc
+                    ).isoformat()
+                }
+                for model in models.values() if model.loaded
+            ]
+        }
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        model = find_model(body.get("model", ""))
+        if model is None:
+            return JSONResponse({"error": f"model '{body.get('model')}' not found"}, status_code=404)
+
+        keep_alive = body.get("keep_alive")
+        if not body.get("prompt"):
+            # Empty prompt: load (or unload with keep_alive 0) and return
+            if keep_alive in (0, "0", "0s"):
+                model.expires_at = 0.0
+                return {"model": model.name, "response": "", "done": True, "done_reason": "unload"}
+            load = await ensure_loaded(model, keep_alive)
+            return {"model": model.name, "response": "", "done": True, "load_duration": int(load * _NS)}
+
+        failure = injected_failure()
+        if failure == "error":
+            return JSONResponse({"error": "simulated failure"}, status_code=500)
+        if failure == "timeout":
+            await asyncio.sleep(config.hang_time)
+
+        options = body.get("options") or {}
+        tokens = int(options.get("num_predict") or config.response_tokens)
+        prompt_tokens = max(1, len(body["prompt"]) // 4)
+
+        async def run(emit: bool) -> AsyncIterator[Dict[str, Any]]:
+            """Simulate one generation, yielding chunks (if ``emit``) then the final stats"""
+            async with model.slots:
+                started = time.monotonic()
+                load = await ensure_loaded(model, keep_alive)
+                await asyncio.sleep(prompt_tokens / config.prompt_eval_rate)
+                prompt_eval = time.monotonic() - started - load
+                eval_started = time.monotonic()
+                words = _words(tokens)
+                if emit:
+                    for start in range(0, tokens, config.chunk_tokens):
+                        piece = words[start:start + config.chunk_tokens]
+                        await asyncio.sleep(len(piece) / config.token_rate)
+                        yield {"model": model.name, "response": " ".join(piece) + " ", "done": False}
+                else:
+                    await asyncio.sleep(tokens / config.token_rate)
+                yield {
+                    "model": model.name,
+                    "response": "" if emit else " ".join(words),
+                    "done": True,
+                    "done_reason": "length",
+                    "context": [*body.get("context", []), *range(tokens)][-2048:],
+                    "total_duration": int((time.monotonic() - started) * _NS),
+                    "load_duration": int(load * _NS),
+                    "prompt_eval_count": prompt_tokens,
+                    "prompt_eval_duration": int(prompt_eval * _NS),
+                    "eval_count": tokens,
+                    "eval_duration": int((time.monotonic() - eval_started) * _NS)
+                }
+
+        if not body.get("stream", True):
+            return [chunk async for chunk in run(emit=False)][-1]
+
+        async def chunks() -> AsyncIterator[bytes]:
+            async for chunk in run(emit=True):
+                yield (json.dumps(chunk) + "\n").encode()
+
+        return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+    async def embed_texts(name: str, texts: List[str], keep_alive: Any) -> Optional[List[List[float]]]:
+        model = find_model(name)
+        if model is None:
+            return None
+        await ensure_loaded(model, keep_alive)
+        if texts and config.embed_time:
+            await asyncio.sleep(config.embed_time * len(texts))
+        return [_embedding(text, config.embedding_dimension) for text in texts]
+
+    @app.post("/api/embed")
+    async def embed(request: Request):
+        body = await request.json()
+        texts = body.get("input", [])
+        texts = [texts] if isinstance(texts, str) else texts
+        texts = [text for text in texts if text]
+        embeddings = await embed_texts(body.get("model", ""), texts, body.get("keep_alive"))
+        if embeddings is None:
+            return JSONResponse({"error": "model not found"}, status_code=404)
+        return {"model": body["model"], "embeddings": embeddings}
+
+    @app.post("/api/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        embeddings = await embed_texts(body.get("model", ""), [body.get("prompt", "")], body.get("keep_alive"))
+        if embeddings is None:
+            return JSONResponse({"error": "model not found"}, status_code=404)
+        return {"embedding": embeddings[0]}
+
+    return app
+
+
+def _model_entry(name: str) -> Dict[str, Any]:
+    return {"name": name, "model": name, "digest": hashlib.sha256(name.encode()).hexdigest(), "size": 2_000_000_000}
+
+
+def _keep_alive_seconds(value: Any, default: float) -> float:
+    """Seconds from a keep_alive value; negative means forever"""
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    else:
+        units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+        unit = next((unit for unit in units if value.endswith(unit)), None)
+        try:
+            seconds = float(value[:-len(unit)]) * units[unit] if unit else float(value)
+        except ValueError:
+            return default
+    return float("inf") if seconds < 0 else seconds
+
+
+_VOCABULARY = "the a model token server request latency answer local fast queue stream".split()
+
+
+def _words(count: int) -> List[str]:
+    return [_VOCABULARY[index % len(_VOCABULARY)] for index in range(count)]
+
+
+def _embedding(text: str, dimension: int) -> List[float]:
+    seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(dimension, dtype=np.float32).tolist()
+
+
+def serve(config: FakeOllamaConfig, host: str = "127.0.0.1", port: int = 11435) -> None:
+    """Run the fake server (blocking); used as a subprocess target"""
+    import uvicorn
+    uvicorn.run(create_app(config), host=host, port=port, log_level="warning", access_log=False)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    FakeOllamaConfig.add_arguments(parser)
+    args = parser.parse_args()
+    serve(FakeOllamaConfig.from_args(args), args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
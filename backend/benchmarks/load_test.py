@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Load test: the real FastAPI app against a fake Ollama
+
+Starts the fake Ollama (benchmarks.fake_ollama) in a subprocess, serves
+app.main:app with uvicorn in this process, and drives it from a separate
+load-generator process at each concurrency level (closed loop: every
+virtual user sends its next request as soon as the previous one ends).
+Prompts are unique, so caches and request coalescing don't short-circuit
+the pipeline unless --repeat-prompts is given.
+
+Per level it reports latency and time-to-first-token percentiles,
+throughput, errors, and the event-loop lag of the server process (how
+late a 10 ms timer fires on the app's loop), as JSON:
+
+    python -m benchmarks.load_test --concurrency 1,8,32 --requests 200 --output before.json
+    python -m benchmarks.load_test --concurrency 1,8,32 --requests 200 --compare before.json
+
+With --compare, levels whose p95 latency/TTFT grew or whose throughput
+dropped by more than --tolerance are listed and the exit status is 1.
+Settings can be overridden per run, e.g. --set max_concurrent_generations=8.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import platform
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from benchmarks.fake_ollama import FakeOllamaConfig, serve
+
+ENDPOINTS = {"chat": "/api/v1/chat/", "stream": "/api/v1/chat/stream"}
+LAG_INTERVAL = 0.01
+
+
+def summarize(samples: List[float]) -> Optional[Dict[str, float]]:
+    """Percentiles of durations in seconds, reported in milliseconds"""
+    if not samples:
+        return None
+    values = np.asarray(samples) * 1000
+    summary = {f"p{q}": round(float(np.percentile(values, q)), 3) for q in (50, 95, 99)}
+    summary["mean"] = round(float(values.mean()), 3)
+    summary["max"] = round(float(values.max()), 3)
+    return summary
+
+
+class LoopLagMonitor:
+    """Measure how late a periodic timer fires on the running event loop
+
+    A loop blocked by CPU work or synchronous I/O delays every coroutine
+    on it; the overshoot of a short sleep is a direct measure of that.
+    """
+
+    def __init__(self, interval: float = LAG_INTERVAL):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def reset(self) -> None:
+        self.samples = []
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - expected))
+
+
+# Load generator (runs in its own process so it doesn't share the app's loop)
+
+async def _one_request(client: httpx.AsyncClient, endpoint: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    result: Dict[str, Any] = {"status": None, "ttft": None, "tokens": 0}
+    try:
+        if endpoint == "stream":
+            async with client.stream("POST", ENDPOINTS[endpoint], json=payload) as response:
+                result["status"] = response.status_code
+                event = None
+                async for line in response.aiter_lines():
+                    if line.startswith("event: "):
+                        event = line[7:]
+                    elif line.startswith("data: ") and event == "token":
+                        if result["ttft"] is None:
+                            result["ttft"] = time.perf_counter() - started
+                        result["tokens"] += 1
+                    elif line.startswith("data: ") and event == "error":
+                        result["status"] = json.loads(line[6:]).get("status_code", 500)
+        else:
+            response = await client.post(ENDPOINTS[endpoint], json=payload)
+            result["status"] = response.status_code
+            if response.status_code == 200:
+                result["ttft"] = time.perf_counter() - started
+                stats = response.json().get("stats") or {}
+                result["tokens"] = stats.get("eval_count") or 0
+    except httpx.HTTPError as e:
+        result["status"] = type(e).__name__
+    result["latency"] = time.perf_counter() - started
+    return result
+
+
+async def _drive(base_url: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    concurrency, total = options["concurrency"], options["requests"]
+    issued = 0
+    results: List[Dict[str, Any]] = []
+
+    def next_payload() -> Dict[str, Any]:
+        nonlocal issued
+        issued += 1
+        prompt = options["prompt"] if options["repeat_prompts"] else f"[{issued}] {options['prompt']}"
+        payload = {"message": prompt, "model": options["model"]}
+        if options["num_predict"]:
+            payload["options"] = {"num_predict": options["num_predict"]}
+        return payload
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    timeout = httpx.Timeout(options["timeout"])
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        for _ in range(options["warmup"]):
+            await _one_request(client, options["endpoint"], next_payload())
+
+        async def user() -> None:
+            while issued < total + options["warmup"]:
+                results.append(await _one_request(client, options["endpoint"], next_payload()))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    ok = [result for result in results if result["status"] == 200]
+    errors: Dict[str, int] = {}
+    for result in results:
+        if result["status"] != 200:
+            errors[str(result["status"])] = errors.get(str(result["status"]), 0) + 1
+    return {
+        "endpoint": options["endpoint"],
+        "concurrency": concurrency,
+        "requests": len(results),
+        "errors": errors,
+        "error_rate": round(1 - len(ok) / len(results), 4) if results else 0.0,
+        "duration_seconds": round(elapsed, 3),
+        "latency_ms": summarize([result["latency"] for result in ok]),
+        "ttft_ms": summarize([result["ttft"] for result in ok if result["ttft"] is not None]),
+        "throughput": {
+            "requests_per_second": round(len(ok) / elapsed, 2),
+            "tokens_per_second": round(sum(result["tokens"] for result in ok) / elapsed, 1)
+        }
+    }
+
+
+def _generate_load(base_url: str, options: Dict[str, Any], results: multiprocessing.Queue) -> None:
+    results.put(asyncio.run(_drive(base_url, options)))
+
+
+# Orchestration
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _apply_overrides(overrides: List[str]) -> Dict[str, Any]:
+    """Set ``name=value`` pairs on the app settings (values parsed as JSON when possible)"""
+    from pydantic import TypeAdapter
+    from app.config import settings
+
+    applied = {}
+    for override in overrides:
+        name, _, raw = override.partition("=")
+        field = type(settings).model_fields.get(name)
+        if field is None:
+            raise SystemExit(f"Unknown setting: {name}")
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            value = raw
+        setattr(settings, name, TypeAdapter(field.annotation).validate_python(value))
+        applied[name] = getattr(settings, name)
+    return applied
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def _wait_until_up(url: str, deadline: float = 30.0) -> None:
+    async with httpx.AsyncClient() as client:
+        for _ in range(int(deadline / 0.1)):
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up")
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    import uvicorn
+    from app.config import settings
+
+    context = multiprocessing.get_context("spawn")
+    fake_config = FakeOllamaConfig.from_args(args)
+    fake_port = _free_port()
+    fake = context.Process(target=serve, args=(fake_config, "127.0.0.1", fake_port), daemon=True)
+    fake.start()
+
+    settings.ollama_base_url = f"http://127.0.0.1:{fake_port}"
+    settings.ollama_base_urls = []
+    settings.log_level = args.log_level
+    overrides = _apply_overrides(args.set)
+    from app.main import app
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False))
+    serving = asyncio.create_task(server.serve())
+    monitor = LoopLagMonitor()
+    levels = []
+    try:
+        await _wait_until_up(f"{settings.ollama_base_url}/")
+        await _wait_until_up(f"http://127.0.0.1:{port}/")
+        monitor.start()
+        for endpoint in args.endpoints.split(","):
+            for concurrency in (int(level) for level in args.concurrency.split(",")):
+                options = {
+                    "endpoint": endpoint,
+                    "concurrency": concurrency,
+                    "requests": args.requests,
+                    "warmup": args.warmup,
+                    "model": args.model,
+                    "prompt": args.prompt,
+                    "num_predict": args.num_predict,
+                    "repeat_prompts": args.repeat_prompts,
+                    "timeout": args.timeout
+                }
+                queue = context.Queue()
+                generator = context.Process(target=_generate_load, args=(f"http://127.0.0.1:{port}", options, queue))
+                monitor.reset()
+                generator.start()
+                level = await asyncio.to_thread(queue.get)
+                await asyncio.to_thread(generator.join)
+                level["loop_lag_ms"] = summarize(monitor.samples)
+                levels.append(level)
+                print(_describe(level), file=sys.stderr, flush=True)
+    finally:
+        await monitor.stop()
+        server.should_exit = True
+        await serving
+        fake.terminate()
+        fake.join()
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "revision": _git_revision(),
+            "version": settings.app_version,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "settings": overrides,
+            "fake_ollama": vars(fake_config)
+        },
+        "levels": levels
+    }
+
+
+def _describe(level: Dict[str, Any]) -> str:
+    latency, ttft, lag = level["latency_ms"] or {}, level["ttft_ms"] or {}, level["loop_lag_ms"] or {}
+    return (
+        f"{level['endpoint']:>6} c={level['concurrency']:<4} "
+        f"p50={latency.get('p50')}ms p95={latency.get('p95')}ms p99={latency.get('p99')}ms "
+        f"ttft_p95={ttft.get('p95')}ms rps={level['throughput']['requests_per_second']} "
+        f"errors={level['error_rate']:.1%} lag_p99={lag.get('p99')}ms"
+    )
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Describe every level that regressed by more than ``tolerance`` (a fraction)"""
+    before = {(level["endpoint"], level["concurrency"]): level for level in baseline["levels"]}
+    regressions = []
+    for level in current["levels"]:
+        old = before.get((level["endpoint"], level["concurrency"]))
+        if old is None:
+            continue
+        name = f"{level['endpoint']} c={level['concurrency']}"
+        for metric in ("latency_ms", "ttft_ms"):
+            if level[metric] and old[metric] and level[metric]["p95"] > old[metric]["p95"] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} p95 {old[metric]['p95']} -> {level[metric]['p95']}")
+        rps, old_rps = level["throughput"]["requests_per_second"], old["throughput"]["requests_per_second"]
+        if rps < old_rps * (1 - tolerance):
+            regressions.append(f"{name}: requests/s {old_rps} -> {rps}")
+        if level["error_rate"] > old["error_rate"] + tolerance / 10:
+            regressions.append(f"{name}: error rate {old['error_rate']} -> {level['error_rate']}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per level")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests before each level")
+    parser.add_argument("--endpoints", default="chat,stream", help=f"Comma-separated, from: {', '.join(ENDPOINTS)}")
+    parser.add_argument("--model", default="llama3.2")
+    parser.add_argument("--prompt", default="Summarize the benefits of local language models in two sentences.")
+    parser.add_argument("--num-predict", type=int, default=None, help="Tokens per answer (fake default otherwise)")
+    parser.add_argument("--repeat-prompts", action="store_true", help="Send the same prompt every time")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Client timeout per request (seconds)")
+    parser.add_argument("--log-level", default="WARNING", help="App log level during the run")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE", help="Override an app setting")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", metavar="BASELINE", help="Report regressions against an earlier report")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative regression (default 10%%)")
+    FakeOllamaConfig.add_arguments(parser)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+RAG benchmark: ingestion throughput and query latency against corpus size
+
+Runs the real ingestion pipeline (chunking, batched embedding, memory-mapped
+vector store, SQLite metadata) against an in-process fake Ollama that
+returns deterministic random embeddings after a configurable delay, so the
+numbers measure this service rather than the embedding model.
+
+    python -m benchmarks.rag_benchmark --sizes 1000,10000,50000 --dimension 768
+
+Prints one JSON object per corpus size.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+from app.config import settings
+from app.core.database import create_engine, create_tables
+from app.services.ollama_service import OllamaService
+from app.services.rag_service import RagService
+
+WORDS = (
+    "invoice refund shipping account password order delivery warranty return "
+    "billing address payment card subscription cancel upgrade support ticket"
+).split()
+
+
+def fake_ollama(dimension: int, latency: float) -> httpx.AsyncClient:
+    """httpx client answering /api/embed with deterministic random vectors"""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        texts = json.loads(request.content)["input"]
+        if latency:
+            await asyncio.sleep(latency)
+        embeddings = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+            embeddings.append(np.random.default_rng(seed).standard_normal(dimension, dtype=np.float32).tolist())
+        return httpx.Response(200, json={"embeddings": embeddings})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def make_document(rng: np.random.Generator, words: int) -> bytes:
+    return " ".join(rng.choice(WORDS, size=words)).encode()
+
+
+def percentile(samples, q: float) -> float:
+    return round(float(np.percentile(samples, q)) * 1000, 3)
+
+
+async def run_size(args, documents: int) -> dict:
+    directory = tempfile.mkdtemp(prefix="rag-bench-")
+    engine = create_engine(f"sqlite:///{os.path.join(directory, 'rag.db')}")
+    await create_tables(engine)
+    ollama = OllamaService(client=fake_ollama(args.dimension, args.embed_latency))
+    rag = RagService(ollama, engine, index_dir=os.path.join(directory, "index"))
+    await rag.start()
+    rng = np.random.default_rng(0)
+
+    slots = asyncio.Semaphore(args.ingest_concurrency)
+
+    async def ingest(index: int) -> None:
+        data = make_document(rng, args.words)
+        async with slots:
+            await rag.ingest("bench", f"doc-{index}.txt", hashlib.sha256(data).hexdigest(), len(data), lambda: _blocks(data))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(ingest(index) for index in range(documents)))
+    ingest_seconds = time.perf_counter() - started
+
+    search_latencies, query_latencies = [], []
+    for _ in range(args.queries):
+        query = rng.standard_normal(args.dimension, dtype=np.float32)
+        started = time.perf_counter()
+        rag.store.search(query, args.top_k)
+        search_latencies.append(time.perf_counter() - started)
+
+        text = " ".join(rng.choice(WORDS, size=8))
+        started = time.perf_counter()
+        await rag.search(text, args.top_k)
+        query_latencies.append(time.perf_counter() - started)
+
+    await ollama.close()
+    await engine.dispose()
+    return {
+        "documents": documents,
+        "chunks": rag.store.size,
+        "dimension": args.dimension,
+        "ingest_seconds": round(ingest_seconds, 3),
+        "ingest_documents_per_second": round(documents / ingest_seconds, 1),
+        "ingest_chunks_per_second": round(rag.store.size / ingest_seconds, 1),
+        "vector_search_ms": {"p50": percentile(search_latencies, 50), "p95": percentile(search_latencies, 95)},
+        "query_ms": {"p50": percentile(query_latencies, 50), "p95": percentile(query_latencies, 95)},
+        "index_dir": directory
+    }
+
+
+async def _blocks(data: bytes):
+    yield data
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000", help="Comma-separated corpus sizes (documents)")
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--words", type=int, default=300, help="Words per generated document")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=4)
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="Simulated seconds per /api/embed call")
+    parser.add_argument("--ingest-concurrency", type=int, default=settings.rag_ingest_concurrency)
+    args = parser.parse_args()
+
+    for size in (int(size) for size in args.sizes.split(",")):
+        print(json.dumps(await run_size(args, size)), flush=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
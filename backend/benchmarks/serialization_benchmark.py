@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Serialization microbenchmark: per-request encode/decode cost, before and after
+
+Times each step a request spends on JSON the old way (httpx's
+response.json(), stdlib json, FastAPI validating and re-encoding the
+returned data against the response model) and the current one (orjson,
+responses returned ready-made, pre-encoded payloads), on payloads shaped
+like real Ollama and API responses. Compression cost and ratio are
+reported per coding for a typical chat response.
+
+    python -m benchmarks.serialization_benchmark --response-tokens 300 --context-tokens 2048
+
+Prints one JSON object with microseconds per operation and the speedup.
+"""
+
+import argparse
+import gzip
+import json
+import timeit
+from typing import Any, Callable, Dict
+
+import httpx
+import orjson
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+
+from app.core.compression import brotli
+from app.core.responses import EncodedPayload, FastJSONResponse
+from app.models.chat import ChatResponse, GenerationStats
+from app.models.health import HealthStatus, ReadinessStatus
+from app.utils.helpers import format_sse
+
+WORDS = "the model answers questions about local language models quickly and privately".split()
+
+
+def ollama_body(response_tokens: int, context_tokens: int) -> bytes:
+    """A non-streaming /api/generate body: text, stats and the context token array"""
+    return json.dumps({
+        "model": "llama3.2",
+        "created_at": "2024-01-01T00:00:00.000000000Z",
+        "response": " ".join(WORDS[i % len(WORDS)] for i in range(response_tokens)),
+        "done": True,
+        "context": list(range(context_tokens)),
+        "total_duration": 5_000_000_000,
+        "load_duration": 10_000_000,
+        "prompt_eval_count": 26,
+        "prompt_eval_duration": 100_000_000,
+        "eval_count": response_tokens,
+        "eval_duration": 4_000_000_000
+    }).encode()
+
+
+def health_snapshot() -> Dict[str, Any]:
+    check = {"status": "up", "latency_ms": 1.2, "checked_at": "2024-01-01T00:00:00+00:00", "error": None, "details": {}}
+    return {
+        "status": "healthy",
+        "checked_at": "2024-01-01T00:00:00+00:00",
+        "checks": {"ollama": check, "model_catalog": check, "database": check}
+    }
+
+
+def measure(function: Callable[[], Any], min_time: float) -> float:
+    """Microseconds per call, best of 5 runs of about ``min_time`` seconds each"""
+    timer = timeit.Timer(function)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * min_time / elapsed))
+    return min(timer.repeat(repeat=5, number=number)) / number * 1e6
+
+
+def compare(before: Callable[[], Any], after: Callable[[], Any], min_time: float) -> Dict[str, float]:
+    before_us, after_us = measure(before, min_time), measure(after, min_time)
+    return {"before_us": round(before_us, 2), "after_us": round(after_us, 2), "speedup": round(before_us / after_us, 2)}
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    body = ollama_body(args.response_tokens, args.context_tokens)
+    upstream = httpx.Response(200, content=body, headers={"Content-Type": "application/json"})
+    parsed = orjson.loads(body)
+    chat_response = ChatResponse(response=parsed["response"], model="llama3.2", stats=GenerationStats(**parsed))
+    snapshot = health_snapshot()
+    payload = EncodedPayload()
+    token = {"token": WORDS[0] + " "}
+
+    def parse_before() -> Any:
+        # A fresh Response each time; httpx caches the decoded text otherwise
+        return httpx.Response(200, content=body, headers=upstream.headers).json()
+
+    def parse_after() -> Any:
+        return orjson.loads(httpx.Response(200, content=body, headers=upstream.headers).content)
+
+    def health_before() -> bytes:
+        # Route with response_model: validate the returned model, then encode
+        status = HealthStatus(
+            status=snapshot["status"],
+            ollama="running",
+            timestamp=snapshot["checked_at"],
+            checks=snapshot["checks"]
+        )
+        content = HealthStatus.model_validate(status.model_dump()).model_dump(mode="json")
+        return JSONResponse(content).body
+
+    def health_after() -> bytes:
+        return payload.response(snapshot, lambda: HealthStatus(
+            status=snapshot["status"],
+            ollama="running",
+            timestamp=snapshot["checked_at"],
+            checks=snapshot["checks"]
+        )).body
+
+    stats_dict = {"queued": 3, "active": 8, "limits": {"global": 16, "per_model": 4}, "models": {"llama3.2": 5}}
+    readiness = {"ready": True, "reasons": [], "circuits": {"http://localhost:11434": "closed"}, "queued": 0, "active": 2}
+    min_time = args.min_time
+    results = {
+        "upstream_parse": compare(parse_before, parse_after, min_time),
+        # Routes returning plain dicts still go through jsonable_encoder
+        "default_response_class": compare(
+            lambda: JSONResponse(jsonable_encoder(stats_dict)).body,
+            lambda: FastJSONResponse(jsonable_encoder(stats_dict)).body,
+            min_time
+        ),
+        "readiness_response": compare(
+            lambda: JSONResponse(ReadinessStatus.model_validate(readiness).model_dump(mode="json")).body,
+            lambda: FastJSONResponse(readiness).body,
+            min_time
+        ),
+        "health_snapshot": compare(health_before, health_after, min_time),
+        "sse_token_frame": compare(
+            lambda: f"data: {json.dumps(token)}\n\n".encode(),
+            lambda: format_sse(token, event="token").encode(),
+            min_time
+        )
+    }
+
+    chat_body = chat_response.model_dump_json().encode()
+    compression = {"identity": {"bytes": len(chat_body), "us": 0.0}}
+    compression["gzip"] = {
+        "bytes": len(gzip.compress(chat_body, compresslevel=args.gzip_level, mtime=0)),
+        "us": round(measure(lambda: gzip.compress(chat_body, compresslevel=args.gzip_level, mtime=0), min_time), 2)
+    }
+    if brotli is not None:
+        compression["br"] = {
+            "bytes": len(brotli.compress(chat_body, quality=args.brotli_quality)),
+            "us": round(measure(lambda: brotli.compress(chat_body, quality=args.brotli_quality), min_time), 2)
+        }
+
+    return {
+        "payload": {
+            "upstream_bytes": len(body),
+            "response_tokens": args.response_tokens,
+            "context_tokens": args.context_tokens
+        },
+        "steps": results,
+        "compression": compression
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--response-tokens", type=int, default=300, help="Words in the generated response")
+    parser.add_argument("--context-tokens", type=int, default=2048, help="Length of Ollama's context array")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds to spend timing each variant")
+    parser.add_argument("--gzip-level", type=int, default=6)
+    parser.add_argument("--brotli-quality", type=int, default=4)
+    args = parser.parse_args()
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Worker scaling benchmark: requests/s as uvicorn workers are added
+
+Starts fake Ollama nodes (benchmarks.fake_ollama) tuned to answer almost
+instantly, then for each worker count runs the app through run.py (so
+multi-worker mode, with its shared-state server, is what gets measured)
+and saturates it from several load-generator processes. With the
+upstream out of the way, throughput is bounded by the app's own CPU
+work (parsing, validation, logging), which is what extra workers spread
+over more cores.
+
+    python -m benchmarks.worker_scaling --workers 1,2,4 --concurrency 64 --requests 2000
+
+Reports requests/s, speedup and parallel efficiency per worker count as
+JSON. Admission limits are raised so they don't cap the run; override
+settings with --set NAME=VALUE (passed to the app as environment variables).
+Jobs use a throwaway SQLite database, since multi-worker mode refuses the
+per-process memory job backend.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from app.core.database import create_engine, create_tables
+from benchmarks.fake_ollama import FakeOllamaConfig, serve
+from benchmarks.load_test import _free_port, _generate_load, _git_revision, _wait_until_up
+
+# Keep admission control and logging out of the measurement
+APP_DEFAULTS = {
+    "MAX_CONCURRENT_GENERATIONS": "4096",
+    "MAX_CONCURRENT_PER_MODEL": "4096",
+    "MAX_QUEUED_REQUESTS": "4096",
+    "LOG_LEVEL": "WARNING"
+}
+
+
+async def _create_database(url: str) -> None:
+    # Once up front; workers creating tables concurrently would race
+    engine = create_engine(url)
+    await create_tables(engine)
+    await engine.dispose()
+
+
+def _app_environment(
+    args: argparse.Namespace,
+    port: int,
+    workers: int,
+    nodes: List[str],
+    database_url: str
+) -> Dict[str, str]:
+    env = dict(os.environ, **APP_DEFAULTS, JOB_BACKEND="database", DATABASE_URL=database_url)
+    for override in args.set:
+        name, _, value = override.partition("=")
+        env[name.upper()] = value
+    env.update(
+        HOST="127.0.0.1",
+        PORT=str(port),
+        WORKERS=str(workers),
+        OLLAMA_BASE_URLS=json.dumps(nodes),
+        PYTHONPATH=os.getcwd()
+    )
+    env.pop("SHARED_STATE_SOCKET", None)
+    return env
+
+
+def _measure(args: argparse.Namespace, context: Any, base_url: str) -> Dict[str, Any]:
+    """Drive the app from ``--generators`` processes at once and combine their results"""
+    share, extra = divmod(args.concurrency, args.generators)
+    processes, queue = [], context.Queue()
+    for index in range(args.generators):
+        options = {
+            "endpoint": args.endpoint,
+            "concurrency": share + (index < extra),
+            "requests": args.requests // args.generators,
+            "warmup": args.warmup,
+            "model": args.model,
+            "prompt": args.prompt,
+            "num_predict": None,
+            "repeat_prompts": False,
+            "timeout": args.timeout
+        }
+        process = context.Process(target=_generate_load, args=(base_url, options, queue))
+        process.start()
+        processes.append(process)
+    results = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    requests = sum(result["requests"] for result in results)
+    failed = sum(round(result["error_rate"] * result["requests"]) for result in results)
+    return {
+        "requests": requests,
+        "error_rate": round(failed / requests, 4) if requests else 0.0,
+        "requests_per_second": round(sum(result["throughput"]["requests_per_second"] for result in results), 2),
+        # Slowest generator; they run concurrently against the same server
+        "latency_p50_ms": max((result["latency_ms"] or {}).get("p50", 0) for result in results),
+        "latency_p95_ms": max((result["latency_ms"] or {}).get("p95", 0) for result in results)
+    }
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    context = multiprocessing.get_context("spawn")
+    fake_config = FakeOllamaConfig.from_args(args)
+    fakes, nodes = [], []
+    for _ in range(args.fake_nodes):
+        port = _free_port()
+        fake = context.Process(target=serve, args=(fake_config, "127.0.0.1", port), daemon=True)
+        fake.start()
+        fakes.append(fake)
+        nodes.append(f"http://127.0.0.1:{port}")
+
+    database_dir = tempfile.mkdtemp(prefix="worker-scaling-")
+    database_url = f"sqlite:///{os.path.join(database_dir, 'jobs.db')}"
+    levels = []
+    try:
+        asyncio.run(_create_database(database_url))
+        for node in nodes:
+            asyncio.run(_wait_until_up(f"{node}/"))
+        for workers in (int(count) for count in args.workers.split(",")):
+            port = _free_port()
+            server = subprocess.Popen(
+                [sys.executable, "run.py"],
+                env=_app_environment(args, port, workers, nodes, database_url),
+                stdout=subprocess.DEVNULL
+            )
+            try:
+                asyncio.run(_wait_until_up(f"http://127.0.0.1:{port}/api/v1/health/ready", deadline=60.0))
+                level = {"workers": workers, **_measure(args, context, f"http://127.0.0.1:{port}")}
+            finally:
+                server.terminate()
+                server.wait()
+            baseline = levels[0] if levels else level
+            speedup = level["requests_per_second"] / baseline["requests_per_second"]
+            level["speedup"] = round(speedup, 2)
+            level["efficiency"] = round(speedup * baseline["workers"] / workers, 2)
+            levels.append(level)
+            print(
+                f"workers={workers:<3} rps={level['requests_per_second']:<9} speedup={level['speedup']:<5} "
+                f"efficiency={level['efficiency']:<5} p95={level['latency_p95_ms']}ms errors={level['error_rate']:.1%}",
+                file=sys.stderr,
+                flush=True
+            )
+    finally:
+        for fake in fakes:
+            fake.terminate()
+            fake.join()
+        shutil.rmtree(database_dir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "endpoint": args.endpoint,
+            "concurrency": args.concurrency,
+            "generators": args.generators,
+            "fake_nodes": args.fake_nodes,
+            "settings": args.set,
+            "fake_ollama": vars(fake_config)
+        },
+        "levels": levels
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--concurrency", type=int, default=64, help="Concurrent clients, across generators")
+    parser.add_argument("--requests", type=int, default=2000, help="Measured requests per worker count")
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests per generator")
+    parser.add_argument("--generators", type=int, default=2, help="Load-generator processes")
+    parser.add_argument("--fake-nodes", type=int, default=2, help="Fake Ollama processes (OLLAMA_BASE_URLS)")
+    parser.add_argument("--endpoint", default="chat", choices=["chat", "stream"])
+    parser.add_argument("--model", default="llama3.2")
+    parser.add_argument("--prompt", default="Summarize the benefits of local language models in two sentences.")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Client timeout per request (seconds)")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE", help="Override an app setting")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    FakeOllamaConfig.add_arguments(parser)
+    # An upstream that answers at once, so the app itself is the bottleneck
+    parser.set_defaults(load_time=0.0, token_rate=1_000_000.0, prompt_eval_rate=1_000_000.0, response_tokens=16, parallel=4096)
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,12 @@
 #!/usr/bin/env python3
 """
 Application entry point for the Multimodal AI Chat API
+
+    python run.py                                   # single process
+    WORKERS=4 JOB_BACKEND=database python run.py    # four workers sharing caches and limits
 """
 
-import uvicorn
-from app.config import settings
+from app.server import run
 
 if __name__ == "__main__":
-    uvicorn.run(
-        "app.main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=settings.debug,
-        log_level=settings.log_level.lower(),
-        access_log=True
-    )
+    run()
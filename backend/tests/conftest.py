@@ -0,0 +1,182 @@
+"""
+Shared fixtures: a fake Ollama node and the API served against it
+
+The fake (benchmarks.fake_ollama) runs under uvicorn in a background
+thread, so every request goes over real HTTP with Ollama's timing: its
+config is read per request and can be changed while a test runs. The API
+itself is either driven in-process with ``TestClient`` (``api``) or also
+served by uvicorn (``live_api``) where a test needs real streaming,
+client disconnects or socket backpressure, which ``TestClient`` buffers
+away.
+
+Settings are patched per test and the services are rebuilt on every app
+start; mark a test with ``@pytest.mark.settings(name=value, ...)`` to
+start the app with other settings, and ``@pytest.mark.fake(...)`` for
+fake node options that only apply at its creation (``parallel``).
+"""
+
+import json
+import socket
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterator
+
+import pytest
+import uvicorn
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.services import OllamaService
+from benchmarks.fake_ollama import FakeOllamaConfig, create_app
+
+# Hermetic defaults: no preloading, no background probes during a test
+TEST_SETTINGS: Dict[str, Any] = {
+    "ollama_base_urls": [],
+    "preload_models": [],
+    "keep_warm_window": 0.0,
+    "lb_probe_interval": 3600.0,
+    "health_probe_interval": 3600.0,
+    "catalog_refresh_interval": 3600.0,
+    "ollama_retry_backoff": 0.01,
+    "shared_state_socket": None,
+    "job_backend": "memory",
+    "job_sweep_interval": 3600.0,
+    "persistence_enabled": False,
+    "usage_tracking_enabled": False,
+    "rag_enabled": False,
+    "response_cache_enabled": False,
+    "semantic_cache_enabled": False,
+    "rate_limit_enabled": False,
+    "api_key": None,
+    "api_keys": []
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class CountingApp:
+    """ASGI wrapper counting HTTP requests by path"""
+
+    def __init__(self, app):
+        self.app = app
+        self.requests: Counter = Counter()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            self.requests[scope["path"]] += 1
+        await self.app(scope, receive, send)
+
+
+class LiveServer:
+    """An ASGI app served by uvicorn on a free local port, in a background thread"""
+
+    def __init__(self, app, lifespan: str = "auto"):
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._server = uvicorn.Server(uvicorn.Config(
+            app,
+            host="127.0.0.1",
+            port=self.port,
+            lifespan=lifespan,
+            log_level="warning",
+            access_log=False
+        ))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def start(self) -> "LiveServer":
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if not self._thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError(f"Server on port {self.port} did not start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        # Don't wait for requests still in flight, e.g. generations the fake
+        # keeps computing after their client went away
+        self._server.should_exit = self._server.force_exit = True
+        self._thread.join(timeout=30)
+
+
+@pytest.fixture
+def fake_config(request) -> FakeOllamaConfig:
+    """A fast fake node: models resident at once, short answers"""
+    marker = request.node.get_closest_marker("fake")
+    return FakeOllamaConfig(**{
+        "models": ["llama3.2", "mistral", "nomic-embed-text"],
+        "load_time": 0.0,
+        "prompt_eval_rate": 1_000_000.0,
+        "token_rate": 1000.0,
+        "response_tokens": 8,
+        "embed_time": 0.0,
+        "seed": 0,
+        **(marker.kwargs if marker is not None else {})
+    })
+
+
+@pytest.fixture
+def fake_ollama(fake_config) -> Iterator[LiveServer]:
+    """The fake node; ``.config`` tunes it and ``.requests`` counts calls by path"""
+    counting = CountingApp(create_app(fake_config))
+    server = LiveServer(counting, lifespan="off").start()
+    server.config = fake_config
+    server.requests = counting.requests
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def configure(monkeypatch):
+    """Patch settings for this test: ``configure(queue_timeout=1, ...)``"""
+    def apply(**values: Any) -> None:
+        for name, value in values.items():
+            monkeypatch.setattr(settings, name, value)
+    return apply
+
+
+@pytest.fixture
+def app_settings(request, configure, fake_ollama, tmp_path):
+    """Settings for an app talking to the fake node, plus the test's marker"""
+    configure(**TEST_SETTINGS, ollama_base_url=fake_ollama.url, database_url=f"sqlite:///{tmp_path}/app.db")
+    marker = request.node.get_closest_marker("settings")
+    if marker is not None:
+        configure(**marker.kwargs)
+    # A fresh service per test: circuit and balancer state must not leak
+    app.state.ollama_service = OllamaService(base_url=fake_ollama.url)
+    return settings
+
+
+@pytest.fixture
+def api(app_settings) -> Iterator[TestClient]:
+    """The API in-process, started (lifespan) against the fake node"""
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def live_api(app_settings) -> Iterator[LiveServer]:
+    """The API served by uvicorn against the fake node"""
+    server = LiveServer(app, lifespan="on").start()
+    yield server
+    server.stop()
+
+
+def sse_events(lines: Iterator[str]) -> Iterator[Dict[str, Any]]:
+    """Parse Server-Sent Events from response lines into ``{"event", "data"}`` dicts"""
+    event: Dict[str, Any] = {}
+    for line in lines:
+        if not line:
+            if event:
+                yield event
+                event = {}
+        elif line.startswith("event:"):
+            event["event"] = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            event["data"] = json.loads(line[len("data:"):].strip())
@@ -0,0 +1,136 @@
+"""Admission control: fairness across clients, bounded queue, timeouts"""
+
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.services.admission import AdmissionController, set_background_admission
+
+CHAT = "/api/v1/chat/"
+
+
+async def _admitted_order(controller: AdmissionController, requests) -> list:
+    """Queue ``(name, client, background)`` requests behind a held slot; names in admission order"""
+    order = []
+
+    async def request(name, client, background):
+        await controller.acquire("llama3.2", client, background=background)
+        order.append(name)
+        await asyncio.sleep(0)
+        controller.release("llama3.2", 0.0)
+
+    await controller.acquire("llama3.2", "holder")
+    tasks = []
+    for name, client, background in requests:
+        tasks.append(asyncio.create_task(request(name, client, background)))
+        await asyncio.sleep(0)
+    controller.release("llama3.2", 0.0)
+    await asyncio.gather(*tasks)
+    return order
+
+
+@pytest.mark.asyncio
+async def test_slots_go_round_robin_across_clients():
+    controller = AdmissionController(global_limit=1, per_model_limit=1, max_queue=10, queue_timeout=5)
+    order = await _admitted_order(controller, [
+        ("a1", "a", False), ("a2", "a", False), ("a3", "a", False), ("b1", "b", False), ("c1", "c", False)
+    ])
+    assert order == ["a1", "b1", "c1", "a2", "a3"]
+
+
+@pytest.mark.asyncio
+async def test_interactive_requests_go_before_background_ones():
+    controller = AdmissionController(global_limit=1, per_model_limit=1, max_queue=10, queue_timeout=5)
+    order = await _admitted_order(controller, [
+        ("job1", "a", True), ("job2", "b", True), ("chat", "c", False)
+    ])
+    assert order == ["chat", "job1", "job2"]
+
+
+@pytest.mark.asyncio
+async def test_background_marker_applies_to_the_current_task():
+    controller = AdmissionController(global_limit=1, per_model_limit=1, max_queue=0, queue_timeout=5)
+    await controller.acquire("llama3.2")
+
+    async def job():
+        set_background_admission()
+        await controller.acquire("llama3.2")  # max_queue=0 only bounds interactive requests
+
+    task = asyncio.create_task(job())
+    await asyncio.sleep(0.01)
+    assert controller.stats()["queued_background"] == 1
+    controller.release("llama3.2", 0.0)
+    await task
+    assert controller.active == 1
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_with_429():
+    controller = AdmissionController(global_limit=1, per_model_limit=1, max_queue=1, queue_timeout=5)
+    await controller.acquire("llama3.2")
+    waiting = asyncio.create_task(controller.acquire("llama3.2", "a"))
+    await asyncio.sleep(0)
+
+    with pytest.raises(HTTPException) as rejected:
+        await controller.acquire("llama3.2", "b")
+    assert rejected.value.status_code == 429
+    assert int(rejected.value.headers["Retry-After"]) >= 1
+    assert controller.stats()["rejected"] == 1
+
+    waiting.cancel()
+    await asyncio.gather(waiting, return_exceptions=True)
+    assert controller.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_queue_timeout_returns_503():
+    controller = AdmissionController(global_limit=1, per_model_limit=1, max_queue=5, queue_timeout=0.05)
+    await controller.acquire("llama3.2")
+
+    with pytest.raises(HTTPException) as timed_out:
+        await controller.acquire("llama3.2", "a")
+    assert timed_out.value.status_code == 503
+    assert "Retry-After" in timed_out.value.headers
+    assert controller.queued == 0
+    assert controller.stats()["timed_out"] == 1
+
+
+@pytest.mark.asyncio
+async def test_per_model_limits_leave_other_models_running():
+    controller = AdmissionController(
+        global_limit=4,
+        per_model_limit=1,
+        max_queue=5,
+        queue_timeout=0.05,
+        model_limits={"mistral": 2}
+    )
+    await controller.acquire("llama3.2")
+    await controller.acquire("mistral")
+    await controller.acquire("mistral")
+    with pytest.raises(HTTPException):
+        await controller.acquire("llama3.2")
+    assert controller.stats()["active_by_model"] == {"llama3.2": 1, "mistral": 2}
+
+
+@pytest.mark.settings(max_concurrent_generations=1, max_concurrent_per_model=1, max_queued_requests=1, queue_timeout=0.3)
+def test_busy_server_answers_429_and_503(live_api, fake_ollama):
+    fake_ollama.config.token_rate = 10.0  # the first request holds the only slot for a second
+
+    async def run():
+        async with httpx.AsyncClient(base_url=live_api.url, timeout=10) as client:
+            first = asyncio.create_task(client.post(CHAT, json={"message": "one", "options": {"num_predict": 10}}))
+            while not fake_ollama.requests["/api/generate"]:
+                await asyncio.sleep(0.01)
+            queued = asyncio.create_task(client.post(CHAT, json={"message": "two"}))
+            await asyncio.sleep(0.1)
+            rejected = await client.post(CHAT, json={"message": "three"})
+            return await first, await queued, rejected
+
+    first, queued, rejected = asyncio.run(run())
+    assert first.status_code == 200
+    assert rejected.status_code == 429
+    assert int(rejected.headers["Retry-After"]) >= 1
+    assert queued.status_code == 503
+    assert int(queued.headers["Retry-After"]) >= 1
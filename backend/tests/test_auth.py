@@ -0,0 +1,42 @@
+"""API keys: required outside the exact exempt paths"""
+
+from typing import Iterator
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import ApiKeyMiddleware
+from app.main import app
+
+KEY = {"X-API-Key": "secret"}
+
+
+@pytest.fixture
+def keyed_api(app_settings) -> Iterator[TestClient]:
+    """The API behind a key check (the app's own middleware was built without keys)"""
+    with TestClient(ApiKeyMiddleware(app, keys=["secret"])) as client:
+        yield client
+
+
+def test_requests_need_a_key(keyed_api):
+    rejected = keyed_api.post("/api/v1/chat/", json={"message": "hi"})
+    assert rejected.status_code == 401
+    assert rejected.headers["WWW-Authenticate"] == "Bearer"
+
+    assert keyed_api.post("/api/v1/chat/", json={"message": "hi"}, headers=KEY).status_code == 200
+    bearer = {"Authorization": "Bearer secret"}
+    assert keyed_api.post("/api/v1/chat/", json={"message": "hi"}, headers=bearer).status_code == 200
+
+
+def test_probes_are_exempt(keyed_api):
+    for path in ("/api/v1/health/", "/api/v1/health", "/api/v1/health/live", "/api/v1/health/ready"):
+        assert keyed_api.get(path).status_code == 200, path
+
+
+def test_backend_admin_under_health_needs_a_key(keyed_api, fake_ollama):
+    assert keyed_api.post("/api/v1/health/backends/drain", params={"url": fake_ollama.url}).status_code == 401
+    assert keyed_api.post("/api/v1/health/backends/undrain", params={"url": fake_ollama.url}).status_code == 401
+    assert keyed_api.get("/api/v1/health/backends").status_code == 401
+
+    drained = keyed_api.post("/api/v1/health/backends/drain", params={"url": fake_ollama.url}, headers=KEY)
+    assert drained.json()["draining"] is True
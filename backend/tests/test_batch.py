@@ -0,0 +1,43 @@
+"""Batch chat: concurrent items streamed back as NDJSON"""
+
+import json
+import time
+
+import httpx
+
+BATCH = "/api/v1/chat/batch"
+
+
+def test_batch_streams_results_in_completion_order(live_api, fake_ollama):
+    fake_ollama.config.token_rate = 20.0
+    batch = {
+        "items": [
+            {"id": "slow", "message": "long answer", "options": {"num_predict": 30}},
+            {"id": "fast", "message": "short answer", "options": {"num_predict": 2}}
+        ]
+    }
+
+    started = time.monotonic()
+    with httpx.stream("POST", f"{live_api.url}{BATCH}", json=batch, timeout=10) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = response.iter_lines()
+        first = json.loads(next(lines))
+        first_at = time.monotonic() - started
+        second = json.loads(next(lines))
+
+    assert (first["id"], first["index"], first["status_code"]) == ("fast", 1, 200)
+    assert first_at < 1.0
+    assert (second["id"], second["index"], second["status_code"]) == ("slow", 0, 200)
+    assert second["stats"]["eval_count"] == 30
+
+
+def test_batch_reports_failed_items_without_failing(api, fake_ollama):
+    fake_ollama.config.error_rate = 1.0
+    batch = {"items": [{"message": "one"}, {"message": "two"}]}
+
+    response = api.post(BATCH, json=batch)
+    assert response.status_code == 200
+    results = [json.loads(line) for line in response.iter_lines() if line]
+    assert sorted(result["index"] for result in results) == [0, 1]
+    assert all(result["status_code"] == 500 and result["error"] for result in results)
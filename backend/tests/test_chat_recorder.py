@@ -0,0 +1,107 @@
+"""Write-behind chat records: batching, flush at shutdown, failed batches"""
+
+import asyncio
+
+import pytest
+import pytest_asyncio
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from app.core.database import create_engine, create_tables
+from app.main import app
+from app.models.db import ChatRequest, Conversation, Message
+from app.services.chat_recorder import ChatRecorder
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/records.db")
+    yield engine
+    await engine.dispose()
+
+
+async def _count(engine, model) -> int:
+    async with engine.connect() as conn:
+        return (await conn.execute(select(func.count()).select_from(model))).scalar_one()
+
+
+def _record(recorder: ChatRecorder, conversation_id=None) -> str:
+    return recorder.record_request(
+        "llama3.2", 200, 12.5, prompt="hi", reply="hello", client_id="ip:test", conversation_id=conversation_id
+    )
+
+
+@pytest.mark.asyncio
+async def test_records_are_written_in_the_background(engine):
+    await create_tables(engine)
+    recorder = ChatRecorder(engine, batch_size=10, flush_interval=0.05)
+    await recorder.start()
+    for _ in range(3):
+        _record(recorder, conversation_id="conversation")
+
+    for _ in range(100):
+        if recorder.written == 3:
+            break
+        await asyncio.sleep(0.02)
+    assert recorder.stats() == {"queued": 0, "written": 3, "dropped": 0, "failed_batches": 0}
+    assert await _count(engine, ChatRequest) == 3
+    assert await _count(engine, Message) == 6
+    assert await _count(engine, Conversation) == 1
+    await recorder.stop()
+
+
+@pytest.mark.asyncio
+async def test_stop_flushes_everything_queued(engine):
+    await create_tables(engine)
+    recorder = ChatRecorder(engine, batch_size=2, flush_interval=60)
+    await recorder.start()
+    for _ in range(5):
+        _record(recorder)
+
+    await recorder.stop()
+    assert recorder.written == 5
+    assert await _count(engine, ChatRequest) == 5
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_counted_and_its_conversation_written_later(engine):
+    recorder = ChatRecorder(engine, batch_size=10, flush_interval=60)
+    _record(recorder, conversation_id="conversation")
+    await recorder.start()
+    await recorder.stop()  # no tables yet, so the batch fails
+    assert (recorder.written, recorder.failed_batches) == (0, 1)
+
+    await create_tables(engine)
+    await recorder.start()
+    _record(recorder, conversation_id="conversation")
+    await recorder.stop()
+    assert recorder.written == 1
+    # The conversation row goes again with the next request, since it never committed
+    assert await _count(engine, Conversation) == 1
+    assert await _count(engine, ChatRequest) == 1
+
+
+@pytest.mark.asyncio
+async def test_full_queue_drops_whole_requests(engine):
+    recorder = ChatRecorder(engine, queue_size=1)
+    _record(recorder)
+    _record(recorder)
+    assert recorder.stats()["queued"] == 1
+    assert recorder.dropped == 1
+
+
+@pytest.mark.settings(persistence_enabled=True, database_create_tables=True)
+def test_chat_requests_are_recorded(app_settings):
+    with TestClient(app) as api:
+        assert api.post("/api/v1/chat/", json={"message": "remember me"}).status_code == 200
+
+    async def read():
+        engine = create_engine()
+        async with engine.connect() as conn:
+            rows = (await conn.execute(select(Message.role, Message.content))).all()
+        await engine.dispose()
+        return rows
+
+    rows = asyncio.run(read())
+    assert ("user", "remember me") in rows
+    assert any(role == "assistant" and content for role, content in rows)
@@ -0,0 +1,150 @@
+"""Chat WebSocket: several conversations on one connection, cancel, errors"""
+
+import asyncio
+import json
+import time
+from collections import defaultdict
+
+import pytest
+from websockets.asyncio.client import connect
+
+from app.main import app
+
+WS = "/api/v1/chat/ws"
+
+
+def _receive_until(ws, predicate) -> list:
+    frames = []
+    while True:
+        frames.append(ws.receive_json())
+        if predicate(frames[-1]):
+            return frames
+
+
+def test_conversations_are_multiplexed(api, fake_ollama):
+    fake_ollama.config.token_rate = 50.0
+    with api.websocket_connect(WS) as ws:
+        ws.send_json({"type": "chat", "id": "a", "message": "first", "options": {"num_predict": 10}})
+        ws.send_json({"type": "chat", "id": "b", "message": "second", "options": {"num_predict": 10}})
+
+        frames = []
+        while sum(frame["type"] == "done" for frame in frames) < 2:
+            frames.append(ws.receive_json())
+
+    tokens = defaultdict(list)
+    for position, frame in enumerate(frames):
+        if frame["type"] == "token":
+            tokens[frame["id"]].append(position)
+    assert {name: len(positions) for name, positions in tokens.items()} == {"a": 10, "b": 10}
+    # Both answers streamed at once, not one after the other
+    assert tokens["b"][0] < tokens["a"][-1] and tokens["a"][0] < tokens["b"][-1]
+    finals = {frame["id"]: frame for frame in frames if frame["type"] == "done"}
+    assert finals["a"]["eval_count"] == finals["b"]["eval_count"] == 10
+
+
+@pytest.mark.fake(parallel=1)  # a generation left running would hold the node's only slot
+def test_cancel_stops_one_conversation_and_its_generation(api, fake_ollama):
+    fake_ollama.config.token_rate = 20.0
+    with api.websocket_connect(WS) as ws:
+        ws.send_json({"type": "chat", "id": "long", "message": "long", "options": {"num_predict": 200}})
+        assert ws.receive_json() == {"type": "token", "id": "long", "token": "the "}
+
+        ws.send_json({"type": "cancel", "id": "long"})
+        frames = _receive_until(ws, lambda frame: frame["type"] == "cancelled")
+        assert frames[-1] == {"type": "cancelled", "id": "long"}
+
+        started = time.monotonic()
+        ws.send_json({"type": "chat", "id": "next", "message": "short", "options": {"num_predict": 2}})
+        frames = _receive_until(ws, lambda frame: frame["type"] == "done")
+        assert frames[-1]["id"] == "next"
+        assert time.monotonic() - started < 2
+
+
+def test_ping_is_answered(api):
+    with api.websocket_connect(WS) as ws:
+        ws.send_json({"type": "ping"})
+        assert ws.receive_json() == {"type": "pong"}
+
+
+def test_invalid_frames_get_error_frames(api, fake_ollama):
+    fake_ollama.config.token_rate = 20.0
+    with api.websocket_connect(WS) as ws:
+        ws.send_json({"type": "chat", "message": "no id"})
+        assert ws.receive_json()["status_code"] == 422
+
+        ws.send_json({"type": "chat", "id": "a", "message": "long", "options": {"num_predict": 20}})
+        ws.send_json({"type": "chat", "id": "a", "message": "again"})
+        frames = _receive_until(ws, lambda frame: frame["type"] == "error")
+        assert (frames[-1]["id"], frames[-1]["status_code"]) == ("a", 409)
+
+        ws.send_json({"type": "chat", "id": "b", "message": ""})
+        frames = _receive_until(ws, lambda frame: frame["type"] == "error")
+        assert (frames[-1]["id"], frames[-1]["status_code"]) == ("b", 422)
+
+
+@pytest.mark.settings(ws_max_streams=1)
+def test_conversations_per_connection_are_capped(api, fake_ollama):
+    fake_ollama.config.token_rate = 20.0
+    with api.websocket_connect(WS) as ws:
+        ws.send_json({"type": "chat", "id": "a", "message": "long", "options": {"num_predict": 20}})
+        ws.send_json({"type": "chat", "id": "b", "message": "other"})
+        frames = _receive_until(ws, lambda frame: frame["type"] == "error")
+        assert (frames[-1]["id"], frames[-1]["status_code"]) == ("b", 429)
+
+
+def test_upstream_failure_is_an_error_frame(api, fake_ollama):
+    fake_ollama.config.error_rate = 1.0
+    with api.websocket_connect(WS) as ws:
+        ws.send_json({"type": "chat", "id": "a", "message": "hi"})
+        frame = ws.receive_json()
+        assert (frame["type"], frame["id"], frame["status_code"]) == ("error", "a", 500)
+
+        ws.send_json({"type": "ping"})
+        assert ws.receive_json() == {"type": "pong"}  # the connection stays usable
+
+
+@pytest.mark.settings(ws_send_timeout=30.0)
+def test_client_that_stops_reading_stops_upstream_reads(live_api, fake_ollama, monkeypatch):
+    # About 30 MB of answer in five seconds, far more than the socket buffers hold
+    fake_ollama.config.token_rate = 1_000_000.0
+    fake_ollama.config.chunk_tokens = 200
+    tokens = 5_000_000
+    total_chunks = tokens // 200
+    service = app.state.ollama_service
+    stream_response = service.stream_response
+    read = 0
+
+    async def counting_stream_response(*args, **kwargs):
+        nonlocal read
+        async for chunk in stream_response(*args, **kwargs):
+            read += 1
+            yield chunk
+
+    monkeypatch.setattr(service, "stream_response", counting_stream_response)
+
+    async def run():
+        url = f"ws://127.0.0.1:{live_api.port}{WS}"
+        # max_queue=1: the client stops reading from its socket once a frame is
+        # pending; no compression, which would shrink the repetitive answer away
+        async with connect(url, max_queue=1, compression=None, close_timeout=1) as ws:
+            await ws.send(json.dumps({
+                "type": "chat", "id": "big", "message": "big", "options": {"num_predict": tokens}
+            }))
+            # Wait for the stream to start and the buffers between here and Ollama to fill up
+            stalled, deadline = -1, time.monotonic() + 10
+            while (read == 0 or read != stalled) and time.monotonic() < deadline:
+                stalled = read
+                await asyncio.sleep(0.5)
+            await asyncio.sleep(1.0)
+            assert read == stalled, "upstream kept being read for a client that reads nothing"
+            assert 0 < stalled < total_chunks // 2
+
+            # Reading again lets the stream go on
+            deadline = time.monotonic() + 10
+            while read == stalled and time.monotonic() < deadline:
+                for _ in range(200):
+                    await ws.recv()
+            assert read > stalled
+            await ws.send(json.dumps({"type": "cancel", "id": "big"}))
+
+    asyncio.run(run())
@@ -0,0 +1,168 @@
+"""Request coalescing: one upstream generation per identical request"""
+
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.services.coalescer import RequestCoalescer
+from tests.conftest import sse_events
+
+CHAT = "/api/v1/chat/"
+STREAM = "/api/v1/chat/stream"
+
+
+async def _stream_tokens(client: httpx.AsyncClient, body) -> list:
+    async with client.stream("POST", STREAM, json=body) as response:
+        assert response.status_code == 200
+        lines = [line async for line in response.aiter_lines()]
+    return [event["data"]["token"] for event in sse_events(iter(lines)) if event["event"] == "token"]
+
+
+def _gather(live_api, *requests):
+    async def run():
+        async with httpx.AsyncClient(base_url=live_api.url, timeout=10) as client:
+            return await asyncio.gather(*(request(client) for request in requests))
+    return asyncio.run(run())
+
+
+def test_identical_requests_share_one_generation(live_api, fake_ollama):
+    fake_ollama.config.token_rate = 50.0
+    body = {"message": "same question", "options": {"num_predict": 25}}
+
+    async def ask(client):
+        response = await client.post(CHAT, json=body)
+        assert response.status_code == 200
+        return response.json()["response"]
+
+    answers = _gather(live_api, ask, ask, ask)
+    assert len(set(answers)) == 1
+    assert fake_ollama.requests["/api/generate"] == 1
+    assert httpx.get(f"{live_api.url}/api/v1/chat/queue").json()["coalescing"]["coalesced"] == 2
+
+
+def test_identical_streams_fan_out_every_token(live_api, fake_ollama):
+    fake_ollama.config.token_rate = 50.0
+    body = {"message": "same question", "options": {"num_predict": 10}}
+
+    streams = _gather(live_api, *[lambda client: _stream_tokens(client, body)] * 3)
+    assert all(tokens == streams[0] for tokens in streams)
+    assert len(streams[0]) == 10
+    assert fake_ollama.requests["/api/generate"] == 1
+
+
+def test_different_requests_are_not_shared(live_api, fake_ollama):
+    async def ask(client, message):
+        return (await client.post(CHAT, json={"message": message})).status_code
+
+    assert _gather(live_api, lambda c: ask(c, "one"), lambda c: ask(c, "two")) == [200, 200]
+    assert fake_ollama.requests["/api/generate"] == 2
+
+
+@pytest.mark.asyncio
+async def test_upstream_failure_reaches_every_caller():
+    coalescer = RequestCoalescer()
+    release = asyncio.Event()
+    started = 0
+
+    async def generate():
+        nonlocal started
+        started += 1
+        await release.wait()  # fail only once every caller has joined
+        raise HTTPException(status_code=500, detail="upstream failed")
+
+    callers = [asyncio.create_task(coalescer.run("key", generate)) for _ in range(3)]
+    while coalescer.coalesced < 2:
+        await asyncio.sleep(0)
+    release.set()
+
+    results = await asyncio.gather(*callers, return_exceptions=True)
+    assert [result.status_code for result in results] == [500, 500, 500]
+    assert started == 1
+    assert coalescer.stats()["inflight_calls"] == 0
+
+
+@pytest.mark.asyncio
+async def test_shared_call_survives_one_caller_leaving():
+    coalescer = RequestCoalescer()
+    started = 0
+
+    async def generate():
+        nonlocal started
+        started += 1
+        await asyncio.sleep(0.1)
+        return {"response": "shared"}
+
+    first = asyncio.create_task(coalescer.run("key", generate))
+    second = asyncio.create_task(coalescer.run("key", generate))
+    await asyncio.sleep(0.01)
+    first.cancel()
+
+    assert await second == {"response": "shared"}
+    assert started == 1
+    assert coalescer.stats()["inflight_calls"] == 0
+
+
+@pytest.mark.asyncio
+async def test_shared_stream_is_cancelled_when_every_subscriber_leaves():
+    coalescer = RequestCoalescer(stream_window=4)
+    produced = 0
+    closed = asyncio.Event()
+
+    async def upstream():
+        nonlocal produced
+        try:
+            while True:
+                produced += 1
+                yield {"response": str(produced)}
+                await asyncio.sleep(0)
+        finally:
+            closed.set()
+
+    streams = [coalescer.stream("key", upstream) for _ in range(2)]
+    for stream in streams:
+        await stream.__anext__()
+    for stream in streams:
+        await stream.aclose()
+
+    await asyncio.wait_for(closed.wait(), timeout=1)
+    # The slowest subscriber read one chunk, so at most a window more was produced
+    assert produced <= 1 + 4 + 1
+
+
+@pytest.mark.asyncio
+async def test_request_after_the_last_caller_left_starts_afresh():
+    coalescer = RequestCoalescer()
+    started = 0
+
+    async def generate():
+        nonlocal started
+        started += 1
+        await asyncio.sleep(0.05)
+        return {"response": "fresh"}
+
+    first = asyncio.create_task(coalescer.run("key", generate))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    # The abandoned call is cancelling but not finished yet; don't join it
+    assert await coalescer.run("key", generate) == {"response": "fresh"}
+    assert started == 2
+
+
+@pytest.mark.asyncio
+async def test_stream_after_the_last_subscriber_left_starts_afresh():
+    coalescer = RequestCoalescer()
+
+    async def upstream():
+        for index in range(3):
+            yield {"response": str(index)}
+            await asyncio.sleep(0.01)
+
+    abandoned = coalescer.stream("key", upstream)
+    await abandoned.__anext__()
+    await abandoned.aclose()
+    chunks = [chunk async for chunk in coalescer.stream("key", upstream)]
+    assert [chunk["response"] for chunk in chunks] == ["0", "1", "2"]
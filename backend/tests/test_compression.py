@@ -0,0 +1,36 @@
+"""Response encoding: orjson bodies, gzip/brotli negotiation"""
+
+import importlib.util
+
+BROTLI = importlib.util.find_spec("brotli") is not None
+
+
+def test_large_json_is_compressed_when_accepted(api):
+    response = api.get("/openapi.json", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert response.json()["paths"]  # httpx decodes it transparently
+
+    preferred = api.get("/openapi.json", headers={"Accept-Encoding": "br, gzip"})
+    assert preferred.headers["Content-Encoding"] == ("br" if BROTLI else "gzip")
+
+    assert "Content-Encoding" not in api.get("/openapi.json", headers={"Accept-Encoding": "identity"}).headers
+
+
+def test_small_bodies_and_streams_go_out_as_they_are(api):
+    assert "Content-Encoding" not in api.get("/", headers={"Accept-Encoding": "gzip"}).headers
+
+    stream = api.post(
+        "/api/v1/chat/stream",
+        json={"message": "hi", "options": {"num_predict": 400}},
+        headers={"Accept-Encoding": "gzip"}
+    )
+    assert stream.headers["content-type"].startswith("text/event-stream")
+    assert "Content-Encoding" not in stream.headers
+
+
+def test_json_is_compact(api):
+    response = api.post("/api/v1/chat/", json={"message": "hi"}, headers={"Accept-Encoding": "identity"})
+    assert response.headers["content-type"] == "application/json"
+    assert response.content.startswith(b'{"response":')
+    assert b'", "' not in response.content
@@ -0,0 +1,42 @@
+"""Health, liveness and readiness from the background health snapshot"""
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import OllamaService
+from tests.conftest import free_port
+
+HEALTH = "/api/v1/health/"
+
+
+def test_probes_report_a_healthy_service(api):
+    health = api.get(HEALTH).json()
+    assert (health["status"], health["ollama"]) == ("healthy", "running")
+    assert health["checks"]["ollama"]["status"] == "up"
+
+    assert api.get(f"{HEALTH}live").json() == {"status": "alive"}
+    ready = api.get(f"{HEALTH}ready")
+    assert ready.status_code == 200
+    assert ready.json()["ready"] is True
+    assert api.get(f"{HEALTH}ping").json()["message"] == "pong"
+
+
+def test_polling_health_does_not_reach_ollama(api, fake_ollama):
+    probes = fake_ollama.requests["/api/ps"]
+    for _ in range(20):
+        api.get(HEALTH)
+        api.get(f"{HEALTH}ready")
+    assert fake_ollama.requests["/api/ps"] == probes
+
+
+def test_not_ready_while_ollama_is_down(app_settings):
+    app.state.ollama_service = OllamaService(base_url=f"http://127.0.0.1:{free_port()}")
+    with TestClient(app) as api:
+        ready = api.get(f"{HEALTH}ready")
+        assert ready.status_code == 503
+        assert ready.json()["reasons"] == ["no Ollama node available (unhealthy or circuit open)"]
+
+        health = api.get(HEALTH).json()
+        assert health["ollama"] == "not running"
+        assert health["checks"]["ollama"]["status"] == "down"
+        assert api.get(f"{HEALTH}live").status_code == 200
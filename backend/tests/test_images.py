@@ -0,0 +1,74 @@
+"""Multimodal chat: image uploads, their limits and reuse by ID"""
+
+import base64
+import hashlib
+import io
+
+import pytest
+from PIL import Image
+
+from app.config import settings
+from app.services.image_service import process_image
+
+MULTIMODAL = "/api/v1/chat/multimodal"
+
+
+def _png(width: int = 64, height: int = 48) -> bytes:
+    output = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 40, 40)).save(output, format="PNG")
+    return output.getvalue()
+
+
+def _ask(api, files=(), **fields):
+    # Fields as parts without a file name, so the body is multipart even without files
+    fields = {"message": "what is this?", "model": "llama3.2", **fields}
+    return api.post(MULTIMODAL, files=[
+        *((name, (None, value)) for name, value in fields.items()),
+        *(("files", (f"image{index}.png", data, "image/png")) for index, data in enumerate(files))
+    ])
+
+
+def test_uploaded_image_is_answered_and_reusable_by_id(api, fake_ollama):
+    image = _png()
+    assert _ask(api, [image]).status_code == 200
+
+    # The ID is the SHA-256 of the uploaded bytes; no need to send them again
+    response = _ask(api, images=hashlib.sha256(image).hexdigest())
+    assert response.status_code == 200
+    assert fake_ollama.requests["/api/generate"] == 2
+
+
+def test_unknown_image_id_is_rejected(api, fake_ollama):
+    response = _ask(api, images="0" * 64)
+    assert response.status_code == 422
+    assert response.json()["detail"].startswith(settings.error_image_not_found)
+    assert fake_ollama.requests["/api/generate"] == 0
+
+
+def test_non_images_are_unsupported(api):
+    response = _ask(api, [b"%PDF-1.4 not an image"])
+    assert response.status_code == 415
+
+
+@pytest.mark.settings(image_max_upload_bytes=1000)
+def test_file_over_the_size_limit_is_rejected(api):
+    response = _ask(api, [_png(400, 400) + b"\0" * 1000])
+    assert response.status_code == 413
+    assert "too large" in response.json()["detail"]
+
+
+@pytest.mark.settings(image_max_files=1)
+def test_too_many_files_are_rejected(api):
+    assert _ask(api, [_png(), _png(32, 32)]).status_code == 413
+
+
+@pytest.mark.settings(image_max_pixels=100 * 100)
+def test_image_with_too_many_pixels_is_rejected(api):
+    assert _ask(api, [_png(200, 200)]).status_code == 413
+
+
+def test_images_are_downscaled_to_jpeg():
+    encoded = process_image(_png(3000, 1000), max_side=1024, quality=85, max_pixels=40_000_000)
+    image = Image.open(io.BytesIO(base64.b64decode(encoded)))
+    assert image.format == "JPEG"
+    assert image.size == (1024, 341)
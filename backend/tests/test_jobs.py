@@ -0,0 +1,171 @@
+"""Asynchronous jobs: lifecycle, priorities, cancellation and recovery"""
+
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.core import ApiKeyMiddleware
+from app.core.database import create_engine, create_tables
+from app.main import app
+from app.models.job import JobRequest
+from app.services.job_queue import DatabaseJobBackend, Job
+from tests.conftest import sse_events
+
+JOBS = "/api/v1/jobs/"
+CLIENT = "ip:testclient"  # how the app identifies TestClient's requests
+
+
+def _wait_for(api, job_id: str, status: str, timeout: float = 5) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        job = api.get(f"{JOBS}{job_id}").json()
+        if job["status"] == status or time.monotonic() > deadline:
+            return job
+        time.sleep(0.02)
+
+
+def test_job_runs_to_completion(api):
+    submitted = api.post(JOBS, json={"message": "hi"})
+    assert submitted.status_code == 202
+    job = submitted.json()
+    assert job["status"] in ("queued", "running")
+
+    finished = api.get(f"{JOBS}{job['job_id']}", params={"wait": 5}).json()
+    assert finished["status"] == "succeeded"
+    assert finished["result"]["response"]
+    assert finished["result"]["stats"]["eval_count"] == 8
+    assert finished["started_at"] <= finished["finished_at"]
+    assert finished["expires_at"] > finished["finished_at"]
+
+
+def test_job_events_follow_the_lifecycle(api, fake_ollama):
+    fake_ollama.config.token_rate = 20.0
+    job = api.post(JOBS, json={"message": "hi", "options": {"num_predict": 6}}).json()
+
+    response = api.get(f"{JOBS}{job['job_id']}/events")
+    assert response.headers["content-type"].startswith("text/event-stream")
+    statuses = [event["event"] for event in sse_events(response.iter_lines())]
+    assert statuses[-1] == "succeeded"
+    assert "running" in statuses
+    assert statuses.index("running") < statuses.index("succeeded")
+
+
+def test_unknown_job_is_404(api):
+    assert api.get(f"{JOBS}missing").status_code == 404
+    assert api.delete(f"{JOBS}missing").status_code == 404
+
+
+def test_jobs_of_other_clients_are_404(app_settings, fake_ollama):
+    fake_ollama.config.token_rate = 20.0
+    owner, other = {"X-API-Key": "owner"}, {"X-API-Key": "other"}
+    with TestClient(ApiKeyMiddleware(app, keys=["owner", "other"])) as api:
+        job = api.post(JOBS, json={"message": "mine", "options": {"num_predict": 40}}, headers=owner).json()
+        path = f"{JOBS}{job['job_id']}"
+
+        assert api.get(path, headers=other).status_code == 404
+        assert api.get(path, params={"wait": 1}, headers=other).status_code == 404
+        assert api.get(f"{path}/events", headers=other).status_code == 404
+        assert api.delete(path, headers=other).status_code == 404
+        assert api.get(path, headers=owner).json()["status"] in ("queued", "running")
+
+        assert api.delete(path, headers=owner).status_code == 200
+        assert api.get(path, params={"wait": 2}, headers=owner).json()["status"] == "cancelled"
+
+
+@pytest.mark.settings(job_workers=1)
+def test_higher_priority_jobs_run_first(api, fake_ollama):
+    fake_ollama.config.token_rate = 50.0
+    blocker = api.post(JOBS, json={"message": "first", "options": {"num_predict": 10}}).json()
+    _wait_for(api, blocker["job_id"], "running")
+    low = api.post(JOBS, json={"message": "low", "priority": 0}).json()
+    high = api.post(JOBS, json={"message": "high", "priority": 5}).json()
+
+    low = api.get(f"{JOBS}{low['job_id']}", params={"wait": 5}).json()
+    high = api.get(f"{JOBS}{high['job_id']}", params={"wait": 5}).json()
+    assert low["status"] == high["status"] == "succeeded"
+    assert high["started_at"] < low["started_at"]
+
+
+def test_cancelling_a_running_job(api, fake_ollama):
+    fake_ollama.config.token_rate = 20.0
+    job = api.post(JOBS, json={"message": "long", "options": {"num_predict": 200}}).json()
+    assert _wait_for(api, job["job_id"], "running")["status"] == "running"
+
+    api.delete(f"{JOBS}{job['job_id']}")
+    cancelled = api.get(f"{JOBS}{job['job_id']}", params={"wait": 2}).json()
+    assert cancelled["status"] == "cancelled"
+    assert cancelled["result"] is None
+
+
+@pytest.mark.settings(job_workers=1)
+def test_cancelling_a_queued_job(api, fake_ollama):
+    fake_ollama.config.token_rate = 20.0
+    blocker = api.post(JOBS, json={"message": "first", "options": {"num_predict": 10}}).json()
+    queued = api.post(JOBS, json={"message": "second"}).json()
+
+    assert api.delete(f"{JOBS}{queued['job_id']}").json()["status"] == "cancelled"
+    assert api.get(f"{JOBS}{blocker['job_id']}", params={"wait": 5}).json()["status"] == "succeeded"
+    assert api.get(f"{JOBS}{queued['job_id']}").json()["started_at"] is None
+
+
+def test_job_past_its_deadline_expires(api, fake_ollama):
+    fake_ollama.config.token_rate = 20.0
+    job = api.post(JOBS, json={"message": "long", "deadline": 0.3, "options": {"num_predict": 100}}).json()
+
+    expired = api.get(f"{JOBS}{job['job_id']}", params={"wait": 3}).json()
+    assert expired["status"] == "expired"
+    assert expired["error"] == settings.error_job_deadline
+
+
+def _seed(jobs) -> None:
+    """Write jobs to the test database, as an earlier process would have"""
+    async def seed():
+        engine = create_engine()
+        await create_tables(engine)
+        backend = DatabaseJobBackend(engine)
+        for job in jobs:
+            await backend.save(job)
+        await engine.dispose()
+    asyncio.run(seed())
+
+
+def _running(message: str, holder: str, lease_expires_at: float) -> Job:
+    job = Job(JobRequest(message=message), CLIENT)
+    job.status = "running"
+    job.started_at = time.time() - 120
+    job.claimed_by = holder
+    job.lease_expires_at = lease_expires_at
+    return job
+
+
+@pytest.mark.settings(job_backend="database")
+def test_unfinished_jobs_are_recovered_at_start(app_settings):
+    queued = Job(JobRequest(message="queued before the restart"), CLIENT)
+    abandoned = _running("its worker died", "dead-worker", time.time() - 1)
+    elsewhere = _running("still running elsewhere", "live-worker", time.time() + 60)
+    _seed([queued, abandoned, elsewhere])
+
+    with TestClient(app) as api:
+        for job in (queued, abandoned):
+            recovered = api.get(f"{JOBS}{job.id}", params={"wait": 5}).json()
+            assert recovered["status"] == "succeeded"
+            assert recovered["result"]["response"]
+        assert api.get(f"{JOBS}{elsewhere.id}").json()["status"] == "running"
+
+
+@pytest.mark.settings(job_backend="database", shutdown_drain_timeout=0.0)
+def test_job_interrupted_by_shutdown_runs_after_restart(app_settings, fake_ollama):
+    fake_ollama.config.token_rate = 20.0
+    _seed([])
+    with TestClient(app) as api:
+        job = api.post(JOBS, json={"message": "long", "options": {"num_predict": 40}}).json()
+        assert _wait_for(api, job["job_id"], "running")["status"] == "running"
+
+    fake_ollama.config.token_rate = 1000.0
+    with TestClient(app) as api:
+        restarted = api.get(f"{JOBS}{job['job_id']}", params={"wait": 5}).json()
+        assert restarted["status"] == "succeeded"
+        assert restarted["result"]["stats"]["eval_count"] == 40
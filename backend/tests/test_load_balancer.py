@@ -0,0 +1,95 @@
+"""Load balancing over several Ollama nodes: spreading, ejection, draining"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import OllamaService
+from benchmarks.fake_ollama import create_app
+from tests.conftest import CountingApp, LiveServer, free_port
+
+CHAT = "/api/v1/chat/"
+
+
+@pytest.fixture
+def second_node(fake_config):
+    """Another fake node with the same config as ``fake_ollama``"""
+    counting = CountingApp(create_app(fake_config))
+    server = LiveServer(counting, lifespan="off").start()
+    server.requests = counting.requests
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def two_nodes(app_settings, configure, fake_ollama, second_node):
+    """The app over both fake nodes, each with the default model already loaded
+
+    With the model warm everywhere, routing goes by outstanding requests
+    rather than to the one node that happened to load it first.
+    """
+    for node in (fake_ollama, second_node):
+        httpx.post(f"{node.url}/api/generate", json={"model": "llama3.2", "prompt": "", "stream": False})
+        node.requests.clear()
+    _use_nodes(configure, fake_ollama.url, second_node.url)
+    return fake_ollama, second_node
+
+
+def _use_nodes(configure, *urls: str) -> None:
+    configure(ollama_base_urls=list(urls))
+    app.state.ollama_service = OllamaService(base_urls=list(urls))
+
+
+@pytest.mark.settings(max_concurrent_per_model=4)
+def test_concurrent_requests_are_spread_over_nodes(two_nodes, live_api):
+    first, second = two_nodes
+    first.config.token_rate = 20.0
+
+    def chat(index: int) -> int:
+        response = httpx.post(
+            f"{live_api.url}{CHAT}",
+            json={"message": f"question {index}", "options": {"num_predict": 10}},
+            timeout=10
+        )
+        return response.status_code
+
+    with ThreadPoolExecutor(4) as pool:
+        assert list(pool.map(chat, range(4))) == [200] * 4
+    assert first.requests["/api/generate"] == second.requests["/api/generate"] == 2
+
+
+def test_node_failing_its_probe_gets_no_requests(app_settings, fake_ollama, configure):
+    dead = f"http://127.0.0.1:{free_port()}"
+    _use_nodes(configure, dead, fake_ollama.url)
+
+    with TestClient(app) as api:
+        for index in range(3):
+            assert api.post(CHAT, json={"message": f"question {index}"}).status_code == 200
+        backends = {backend["url"]: backend for backend in api.get("/api/v1/health/backends").json()["backends"]}
+
+    assert fake_ollama.requests["/api/generate"] == 3
+    assert backends[dead]["healthy"] is False
+    assert backends[dead]["requests"] == 0
+    assert backends[fake_ollama.url]["healthy"] is True
+
+
+def test_drained_node_gets_no_new_requests(two_nodes):
+    _, second_node = two_nodes
+
+    with TestClient(app) as api:
+        drained = api.post("/api/v1/health/backends/drain", params={"url": second_node.url})
+        assert drained.json()["draining"] is True
+        for index in range(4):
+            assert api.post(CHAT, json={"message": f"question {index}"}).status_code == 200
+        assert second_node.requests["/api/generate"] == 0
+
+        assert api.post("/api/v1/health/backends/undrain", params={"url": second_node.url}).json()["draining"] is False
+        for index in range(4):
+            api.post(CHAT, json={"message": f"again {index}"})
+        assert second_node.requests["/api/generate"] > 0
+
+        missing = api.post("/api/v1/health/backends/drain", params={"url": "http://nowhere:1"})
+        assert missing.status_code == 404
@@ -0,0 +1,54 @@
+"""Structured logs: JSON lines carrying the request ID, sampling"""
+
+import io
+import json
+import re
+import sys
+
+from app.core import setup_logging, shutdown_logging
+
+CHAT = "/api/v1/chat/"
+
+
+def _logged(monkeypatch, action) -> list:
+    """Run ``action`` with logs going to a buffer; returns the parsed lines"""
+    buffer = io.StringIO()
+    with monkeypatch.context() as patch:
+        patch.setattr(sys, "stdout", buffer)
+        setup_logging()
+        try:
+            action()
+        finally:
+            shutdown_logging()  # writes out everything still queued
+    setup_logging()
+    return [json.loads(line) for line in buffer.getvalue().splitlines()]
+
+
+def test_request_id_is_returned_and_logged(api, monkeypatch):
+    responses = []
+
+    def chat():
+        responses.append(api.post(CHAT, json={"message": "hi"}, headers={"X-Request-ID": "trace-123"}))
+        responses.append(api.post(CHAT, json={"message": "hi"}))
+
+    lines = _logged(monkeypatch, chat)
+    assert responses[0].headers["X-Request-ID"] == "trace-123"
+    assert re.fullmatch(r"[0-9a-f]{32}", responses[1].headers["X-Request-ID"])
+
+    traced = [line for line in lines if line.get("request_id") == "trace-123"]
+    assert "Received chat request for model: llama3.2" in [line["event"] for line in traced]
+    assert all(line["path"] == CHAT and line["level"] and line["timestamp"] for line in traced)
+
+
+def test_unsampled_requests_keep_only_warnings(api, fake_ollama, configure, monkeypatch):
+    configure(log_sample_rate=0.0)
+
+    def chat():
+        api.post(CHAT, json={"message": "hi"}, headers={"X-Request-ID": "ok"})
+        fake_ollama.config.error_rate = 1.0
+        api.post(CHAT, json={"message": "hi"}, headers={"X-Request-ID": "failed"})
+
+    lines = _logged(monkeypatch, chat)
+    assert not [line for line in lines if line.get("request_id") == "ok"]
+    failed = [line for line in lines if line.get("request_id") == "failed"]
+    assert failed and all(line["level"] in ("warning", "error") for line in failed)
@@ -0,0 +1,35 @@
+"""Prometheus metrics endpoint"""
+
+from prometheus_client.parser import text_string_to_metric_families
+
+
+def _sample(api, name: str, **labels: str) -> float:
+    """Current value of one sample; the registry is process-wide, so tests compare deltas"""
+    for family in text_string_to_metric_families(api.get("/metrics").text):
+        for sample in family.samples:
+            if sample.name == name and sample.labels == labels:
+                return sample.value
+    return 0.0
+
+
+def test_metrics_count_requests_and_generations(api):
+    chat = {"endpoint": "chat", "model": "llama3.2", "status": "200"}
+    requests = _sample(api, "chat_requests_total", **chat)
+    tokens = _sample(api, "chat_tokens_total", kind="completion", model="llama3.2")
+    latencies = _sample(api, "chat_request_duration_seconds_count", endpoint="chat", model="llama3.2")
+
+    assert api.post("/api/v1/chat/", json={"message": "hi"}).status_code == 200
+
+    response = api.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain")
+    assert _sample(api, "chat_requests_total", **chat) == requests + 1
+    assert _sample(api, "chat_tokens_total", kind="completion", model="llama3.2") == tokens + 8
+    assert _sample(api, "chat_request_duration_seconds_count", endpoint="chat", model="llama3.2") == latencies + 1
+    assert _sample(api, "http_requests_total", method="POST", route="/api/v1/chat/", status="200") >= 1
+
+
+def test_failed_upstream_calls_are_counted(api, fake_ollama):
+    errors = _sample(api, "ollama_upstream_errors_total", operation="generate", kind="http_status")
+    fake_ollama.config.error_rate = 1.0
+    assert api.post("/api/v1/chat/", json={"message": "hi"}).status_code == 500
+    assert _sample(api, "ollama_upstream_errors_total", operation="generate", kind="http_status") == errors + 1
@@ -0,0 +1,97 @@
+"""Model catalog: stale-while-revalidate over /api/tags"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+import pytest_asyncio
+
+from app.config import settings
+from app.services import OllamaService
+from app.services.model_catalog import ModelCatalog
+
+
+class _Tags:
+    """Client hook counting /api/tags calls, optionally slowing or failing them"""
+
+    def __init__(self):
+        self.calls = 0
+        self.delay = 0.0
+        self.fail = False
+
+    async def __call__(self, request: httpx.Request) -> None:
+        if request.url.path != "/api/tags":
+            return
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise httpx.ConnectError("refused", request=request)
+
+
+@pytest_asyncio.fixture
+async def catalog(configure, fake_ollama):
+    configure(ollama_retry_attempts=0, circuit_breaker_enabled=False)
+    tags = _Tags()
+    async with httpx.AsyncClient(event_hooks={"request": [tags]}) as client:
+        catalog = ModelCatalog(OllamaService(base_url=fake_ollama.url, client=client), ttl=0.2, refresh_interval=3600)
+        catalog.tags = tags
+        yield catalog
+        await catalog.stop()
+
+
+@pytest.mark.asyncio
+async def test_first_read_fetches_then_serves_from_memory(catalog, fake_ollama):
+    assert await catalog.get_models() == fake_ollama.config.models
+    assert await catalog.get_models() == fake_ollama.config.models
+    assert catalog.tags.calls == 1
+    assert catalog.populated and not catalog.is_stale
+
+
+@pytest.mark.asyncio
+async def test_stale_catalog_is_served_while_it_refreshes(catalog, fake_ollama):
+    await catalog.get_models()
+    await asyncio.sleep(0.25)
+    assert catalog.is_stale
+
+    catalog.tags.delay = 0.3
+    started = time.monotonic()
+    assert await catalog.get_models() == fake_ollama.config.models
+    assert time.monotonic() - started < 0.1
+    await asyncio.sleep(0.05)
+    assert catalog.tags.calls == 2  # the refresh started in the background
+
+    # Further stale reads don't wait either, and join the refresh in flight
+    assert await catalog.get_models() == fake_ollama.config.models
+    assert catalog.tags.calls == 2
+    assert catalog.is_stale
+
+    await asyncio.sleep(0.4)
+    assert not catalog.is_stale
+    assert catalog.tags.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrent_refreshes_make_one_call(catalog):
+    catalog.tags.delay = 0.1
+    await asyncio.gather(*(catalog.refresh() for _ in range(5)))
+    assert catalog.tags.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_refresh_keeps_stale_entries(catalog, fake_ollama):
+    await catalog.get_models()
+    await asyncio.sleep(0.25)
+
+    catalog.tags.fail = True
+    assert await catalog.get_models() == fake_ollama.config.models
+    await asyncio.sleep(0.05)  # the background refresh has failed by now
+    assert await catalog.get_models() == fake_ollama.config.models
+    assert catalog.populated
+
+
+@pytest.mark.asyncio
+async def test_never_fetched_catalog_falls_back_to_defaults(catalog):
+    catalog.tags.fail = True
+    assert await catalog.get_models() == settings.default_models
+    assert not catalog.populated
@@ -0,0 +1,44 @@
+"""Model lifecycle: warm-up, keep_alive, unloading and preloading"""
+
+import time
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+
+MODELS = "/api/v1/models/"
+
+
+def _resident(fake_ollama) -> dict:
+    """Models loaded on the fake node, with their expiry in seconds from now"""
+    now = datetime.now(timezone.utc)
+    return {
+        model["name"]: (datetime.fromisoformat(model["expires_at"]) - now).total_seconds()
+        for model in httpx.get(f"{fake_ollama.url}/api/ps").json()["models"]
+    }
+
+
+@pytest.mark.settings(ollama_keep_alive="30m")
+def test_warm_and_unload(api, fake_ollama):
+    assert api.post(f"{MODELS}warm", params={"model": "mistral"}).json() == {"model": "mistral", "loaded": True}
+    expires_in = _resident(fake_ollama)["mistral"]
+    assert 29 * 60 < expires_in <= 30 * 60  # loaded with the configured keep_alive
+
+    assert api.post(f"{MODELS}unload", params={"model": "mistral"}).json() == {"model": "mistral", "loaded": False}
+    assert "mistral" not in _resident(fake_ollama)
+
+
+def test_warming_an_unknown_model_fails(api):
+    assert api.post(f"{MODELS}warm", params={"model": "no-such-model"}).status_code == 502
+
+
+@pytest.mark.settings(preload_models=["mistral"])
+def test_preloaded_models_are_loaded_at_start_and_kept_hot(api, fake_ollama):
+    deadline = time.monotonic() + 5
+    while "mistral" not in _resident(fake_ollama) and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert "mistral" in _resident(fake_ollama)
+
+    listing = api.get(MODELS).json()
+    assert listing["hot"] == ["mistral"]
+    assert "llama3.2" in listing["models"]
@@ -0,0 +1,84 @@
+"""Retrieval: chunking, the vector index and document search"""
+
+import asyncio
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.vector_store import VectorStore
+from app.utils.chunking import chunk_stream, chunk_text
+
+DOCUMENTS = "/api/v1/documents/"
+TEXT = " ".join(f"Sentence number {index} is about topic {index % 7}." for index in range(200))
+
+
+def test_chunks_respect_the_size_and_overlap():
+    chunks = chunk_text(TEXT, size=200, overlap=40)
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    assert len(chunks) > len(TEXT) // 200
+    # Chunks end at sentence boundaries and the next one repeats some context
+    assert all(chunk.endswith(".") for chunk in chunks[:-1])
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk[:20] in previous
+    assert chunks[-1].endswith("topic 3.")
+
+
+def test_streamed_chunks_match_in_memory_chunks():
+    text = "Grüße aus Köln. " * 100  # multi-byte characters split across blocks
+    data = text.encode()
+
+    async def blocks():
+        for offset in range(0, len(data), 7):
+            yield data[offset:offset + 7]
+
+    async def collect():
+        return [chunk async for chunk in chunk_stream(blocks(), size=120, overlap=20)]
+
+    assert asyncio.run(collect()) == chunk_text(text, size=120, overlap=20)
+
+
+def test_vector_search_ranks_by_cosine_within_a_collection(tmp_path):
+    store = VectorStore(str(tmp_path))
+    store.open([])
+    vectors = np.array([[1, 0, 0], [0.9, 0.1, 0], [0, 1, 0], [0.8, 0, 0.2]], dtype=np.float32)
+    rows = store.allocate(4)
+    store.write(rows, vectors)
+    assert store.search(np.array([1, 0, 0]), 2)[0].size == 0  # written but not yet active
+
+    store.activate(rows[:3], "docs")
+    store.activate(rows[3:], "notes")
+    found, scores = store.search(np.array([2, 0, 0]), 2)
+    assert list(found) == [rows[0], rows[1]]
+    assert scores[0] == pytest.approx(1.0)
+    assert list(store.search(np.array([1, 0, 0]), 5, collection="notes")[0]) == [rows[3]]
+
+    store.release(rows[:1])
+    assert list(store.search(np.array([1, 0, 0]), 1)[0]) == [rows[1]]
+    assert store.allocate(1) == rows[:1]  # freed rows are reused
+
+
+@pytest.mark.settings(rag_enabled=True, database_create_tables=True, rag_chunk_size=200, rag_chunk_overlap=40)
+def test_documents_are_ingested_searched_and_deleted(app_settings, configure, tmp_path):
+    configure(rag_index_dir=str(tmp_path / "index"))
+    files = [("files", ("topics.txt", TEXT.encode(), "text/plain"))]
+    with TestClient(app) as api:
+        ingested = api.post(DOCUMENTS, files=files).json()
+        assert ingested[0]["status"] == "ingested"
+        assert ingested[0]["chunks"] == len(chunk_text(TEXT, size=200, overlap=40))
+        assert api.post(DOCUMENTS, files=files).json()[0]["status"] == "unchanged"
+
+        # The fake embeds identical text identically, so a chunk finds itself
+        chunk = chunk_text(TEXT, size=200, overlap=40)[3]
+        found = api.get(f"{DOCUMENTS}search", params={"q": chunk, "k": 2}).json()
+        assert (found[0]["ordinal"], found[0]["content"]) == (3, chunk)
+        assert found[0]["score"] == pytest.approx(1.0, abs=1e-3)
+
+        document_id = ingested[0]["document_id"]
+        assert api.delete(f"{DOCUMENTS}{document_id}").json() == {"deleted": True}
+        assert api.get(f"{DOCUMENTS}search", params={"q": chunk}).json() == []
+
+
+def test_documents_are_404_while_retrieval_is_disabled(api):
+    assert api.get(DOCUMENTS).status_code == 404
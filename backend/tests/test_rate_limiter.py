@@ -0,0 +1,101 @@
+"""Per-client token buckets for requests and LLM tokens"""
+
+import pytest
+from fastapi import HTTPException
+
+from app.config import settings
+from app.core.auth import api_key_id
+from app.services.rate_limiter import RateLimiter, TokenBucket
+
+CHAT = "/api/v1/chat/"
+
+
+@pytest.mark.settings(rate_limit_enabled=True, rate_limit_requests_per_minute=2)
+def test_request_bucket_rejects_with_retry_after(api):
+    first = api.post(CHAT, json={"message": "one"})
+    assert first.status_code == 200
+    assert first.headers["RateLimit-Limit"] == "2"
+    assert first.headers["RateLimit-Remaining"] == "1"
+
+    assert api.post(CHAT, json={"message": "two"}).headers["RateLimit-Remaining"] == "0"
+    rejected = api.post(CHAT, json={"message": "three"})
+    assert rejected.status_code == 429
+    assert rejected.json()["detail"] == settings.error_rate_limited
+    assert int(rejected.headers["Retry-After"]) >= 1
+    assert rejected.headers["RateLimit-Remaining"] == "0"
+
+
+@pytest.mark.settings(rate_limit_enabled=True, rate_limit_requests_per_minute=1)
+def test_buckets_are_per_model(api):
+    assert api.post(CHAT, json={"message": "hi"}).status_code == 200
+    assert api.post(CHAT, json={"message": "hi", "model": "mistral"}).status_code == 200
+    assert api.post(CHAT, json={"message": "hi"}).status_code == 429
+
+
+@pytest.mark.settings(rate_limit_enabled=True, rate_limit_tokens_per_minute=10)
+def test_tokens_used_are_charged_after_the_response(api, fake_ollama):
+    fake_ollama.config.response_tokens = 20
+    first = api.post(CHAT, json={"message": "hi"})
+    assert first.status_code == 200
+    assert first.headers["X-RateLimit-Remaining-Tokens"] == "10"  # charged only once done
+
+    rejected = api.post(CHAT, json={"message": "hi again"})
+    assert rejected.status_code == 429
+    assert rejected.headers["X-RateLimit-Remaining-Tokens"] == "0"
+    assert int(rejected.headers["Retry-After"]) >= 1
+
+
+@pytest.mark.settings(rate_limit_enabled=True, rate_limit_tokens_per_day=10, rate_limit_tokens_per_minute=0)
+def test_daily_quota(api, fake_ollama):
+    fake_ollama.config.response_tokens = 20
+    assert api.post(CHAT, json={"message": "hi"}).status_code == 200
+
+    rejected = api.post(CHAT, json={"message": "hi again"})
+    assert rejected.status_code == 429
+    assert rejected.json()["detail"] == settings.error_token_quota
+
+
+@pytest.mark.settings(rate_limit_enabled=True, rate_limit_requests_per_minute=1)
+def test_streams_are_limited_before_the_first_frame(api):
+    assert api.post("/api/v1/chat/stream", json={"message": "hi"}).status_code == 200
+    rejected = api.post("/api/v1/chat/stream", json={"message": "hi"})
+    assert rejected.status_code == 429
+    assert "Retry-After" in rejected.headers
+
+
+def test_bucket_refills_continuously():
+    bucket = TokenBucket(2, 60.0)
+    start = bucket.updated
+    bucket.charge(2)
+    assert bucket.wait_time(1) == pytest.approx(30.0)
+
+    bucket.refill(start + 30)
+    assert bucket.tokens == pytest.approx(1.0)
+    bucket.charge(5)  # a cost known afterwards may overdraw the bucket
+    bucket.refill(start + 60)
+    assert bucket.tokens == pytest.approx(-3.0)
+    assert bucket.wait_time(1) == pytest.approx(120.0)
+    bucket.refill(start + 1000)
+    assert bucket.tokens == 2
+
+
+@pytest.mark.asyncio
+async def test_clients_have_buckets_of_their_own():
+    limiter = RateLimiter(requests_per_minute=1, tokens_per_minute=0, tokens_per_day=0, overrides={})
+    await limiter.check("key:a", "llama3.2")
+    with pytest.raises(HTTPException) as rejected:
+        await limiter.check("key:a", "llama3.2")
+    assert rejected.value.headers["Retry-After"] == "60"
+    await limiter.check("key:b", "llama3.2")
+
+
+@pytest.mark.asyncio
+async def test_overrides_apply_by_api_key():
+    limiter = RateLimiter(requests_per_minute=1, tokens_per_minute=0, tokens_per_day=0, overrides={
+        "secret": {"requests_per_minute": 3}
+    })
+    client = f"key:{api_key_id('secret')}"
+    for _ in range(3):
+        await limiter.check(client, "llama3.2")
+    with pytest.raises(HTTPException):
+        await limiter.check(client, "llama3.2")
@@ -0,0 +1,109 @@
+"""Circuit breaker and retry budget"""
+
+import time
+
+import httpx
+import pytest
+
+from app.main import app
+from app.services import OllamaService
+from app.services.resilience import RetryBudget
+from tests.conftest import free_port
+
+CHAT = "/api/v1/chat/"
+
+BREAKER = dict(
+    circuit_failure_rate=0.5,
+    circuit_min_requests=3,
+    circuit_open_duration=0.5,
+    circuit_half_open_requests=1
+)
+
+
+def _breaker():
+    return app.state.ollama_service.balancer.backends[0].breaker
+
+
+def _trip(api, fake_ollama):
+    """Fail generations until the circuit opens; each failure reaches the node"""
+    fake_ollama.config.error_rate = 1.0
+    for _ in range(BREAKER["circuit_min_requests"]):
+        assert api.post(CHAT, json={"message": "hi"}).status_code == 500
+        if _breaker().state == "open":
+            return
+    pytest.fail("circuit did not open")
+
+
+@pytest.mark.settings(**BREAKER)
+def test_circuit_opens_after_failures_and_fails_fast(api, fake_ollama):
+    _trip(api, fake_ollama)
+
+    generations = fake_ollama.requests["/api/generate"]
+    response = api.post(CHAT, json={"message": "hi"})
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+    assert fake_ollama.requests["/api/generate"] == generations
+
+
+@pytest.mark.settings(**BREAKER)
+def test_circuit_closes_after_successful_trial(api, fake_ollama):
+    _trip(api, fake_ollama)
+
+    fake_ollama.config.error_rate = 0.0
+    time.sleep(0.6)
+    assert api.post(CHAT, json={"message": "hi"}).status_code == 200
+    assert _breaker().state == "closed"
+    assert api.post(CHAT, json={"message": "again"}).status_code == 200
+
+
+@pytest.mark.settings(**BREAKER)
+def test_failed_trial_reopens_circuit(api, fake_ollama):
+    _trip(api, fake_ollama)
+    time.sleep(0.6)
+
+    assert api.post(CHAT, json={"message": "hi"}).status_code == 500
+    assert _breaker().state == "open"
+    assert api.post(CHAT, json={"message": "hi"}).status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_retries_stop_when_budget_is_exhausted(configure):
+    configure(ollama_retry_attempts=3, ollama_retry_backoff=0.001, circuit_breaker_enabled=False)
+    attempts = 0
+
+    async def count(request):
+        nonlocal attempts
+        attempts += 1
+
+    # Nothing listens on the dead node, so every call fails to connect
+    dead = f"http://127.0.0.1:{free_port()}"
+    async with httpx.AsyncClient(event_hooks={"request": [count]}) as client:
+        service = OllamaService(base_url=dead, client=client)
+        service.retry_budget = RetryBudget(ratio=0.0, min_per_second=0.0, capacity=1.0)
+
+        with pytest.raises(httpx.ConnectError):
+            await service.list_models()
+        assert attempts == 2  # the one retry the budget held
+
+        with pytest.raises(httpx.ConnectError):
+            await service.list_models()
+        assert attempts == 3  # budget empty: no retry at all
+
+
+@pytest.mark.asyncio
+async def test_retries_recover_transient_failures(configure, fake_ollama):
+    configure(ollama_retry_attempts=2, ollama_retry_backoff=0.001)
+    attempts = 0
+
+    async def flaky(request):
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise httpx.ConnectError("refused", request=request)
+
+    async with httpx.AsyncClient(event_hooks={"request": [flaky]}) as client:
+        service = OllamaService(base_url=fake_ollama.url, client=client)
+        models = await service.list_models()
+
+    assert [model["name"] for model in models] == fake_ollama.config.models
+    assert attempts == 2
@@ -0,0 +1,33 @@
+"""Semantic cache: answers from the nearest earlier prompt"""
+
+import pytest
+
+CHAT = "/api/v1/chat/"
+
+
+@pytest.mark.settings(semantic_cache_enabled=True)
+def test_matching_prompt_is_answered_from_the_cache(api, fake_ollama):
+    first = api.post(CHAT, json={"message": "What is the capital of France?"}).json()
+    # The fake embeds a text identically every time, so this is a perfect match
+    second = api.post(CHAT, json={"message": "What is the capital of France?"}).json()
+    assert second["cached"] is True
+    assert second["response"] == first["response"]
+    assert fake_ollama.requests["/api/generate"] == 1
+
+    assert api.post(CHAT, json={"message": "Something else entirely"}).json()["cached"] is False
+    assert fake_ollama.requests["/api/generate"] == 2
+
+    stats = api.get(f"{CHAT}cache").json()["semantic"]
+    assert (stats["enabled"], stats["hits"], stats["misses"], stats["entries"]) == (True, 1, 2, 2)
+
+
+@pytest.mark.settings(semantic_cache_enabled=True)
+def test_entries_only_match_the_same_generation_setup(api, fake_ollama):
+    api.post(CHAT, json={"message": "Tell me a joke"})
+    assert api.post(CHAT, json={"message": "Tell me a joke", "model": "mistral"}).json()["cached"] is False
+    assert api.post(CHAT, json={"message": "Tell me a joke", "options": {"temperature": 0}}).json()["cached"] is False
+    assert fake_ollama.requests["/api/generate"] == 3
+
+
+def test_cache_is_off_by_default(api):
+    assert api.get(f"{CHAT}cache").json()["semantic"] == {"enabled": False}
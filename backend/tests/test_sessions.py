@@ -0,0 +1,55 @@
+"""Conversation sessions: server-assigned IDs, history, per-caller ownership"""
+
+from typing import Iterator
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import ApiKeyMiddleware
+from app.main import app
+
+SESSIONS = "/api/v1/sessions/"
+CHAT = "/api/v1/chat/"
+OWNER = {"X-API-Key": "owner"}
+OTHER = {"X-API-Key": "other"}
+
+
+@pytest.fixture
+def keyed_api(app_settings) -> Iterator[TestClient]:
+    """The API behind a key check, so two callers can be told apart"""
+    with TestClient(ApiKeyMiddleware(app, keys=["owner", "other"])) as client:
+        yield client
+
+
+def test_session_keeps_the_conversation(api, fake_ollama):
+    session_id = api.post(SESSIONS).json()["session_id"]
+    for message in ("first", "second"):
+        response = api.post(CHAT, json={"message": message, "session_id": session_id})
+        assert response.status_code == 200
+        assert response.json()["session_id"] == session_id
+
+    session = api.get(f"{SESSIONS}{session_id}").json()
+    assert [turn["role"] for turn in session["messages"]] == ["user", "assistant"] * 2
+    assert [turn["content"] for turn in session["messages"][::2]] == ["first", "second"]
+    assert session["context_tokens"] > 0  # the second turn only sent its new message
+    assert fake_ollama.requests["/api/generate"] == 2
+
+
+def test_unknown_session_is_404(api):
+    assert api.get(f"{SESSIONS}made-up").status_code == 404
+    assert api.post(CHAT, json={"message": "hi", "session_id": "made-up"}).status_code == 404
+
+
+def test_sessions_of_other_callers_are_404(keyed_api):
+    session_id = keyed_api.post(SESSIONS, headers=OWNER).json()["session_id"]
+    path = f"{SESSIONS}{session_id}"
+
+    assert keyed_api.get(path, headers=OTHER).status_code == 404
+    assert keyed_api.post(CHAT, json={"message": "hi", "session_id": session_id}, headers=OTHER).status_code == 404
+    streamed = keyed_api.post(f"{CHAT}stream", json={"message": "hi", "session_id": session_id}, headers=OTHER)
+    assert streamed.status_code == 404
+    assert keyed_api.delete(path, headers=OTHER).status_code == 404
+
+    assert keyed_api.get(path, headers=OWNER).json()["messages"] == []
+    assert keyed_api.delete(path, headers=OWNER).json() == {"deleted": True}
+    assert keyed_api.get(path, headers=OWNER).status_code == 404
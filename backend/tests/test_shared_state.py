@@ -0,0 +1,106 @@
+"""Shared state across workers: admission, locks and their release on disconnect"""
+
+import asyncio
+import tempfile
+
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+
+from app.services.shared_state import (
+    SharedAdmissionController,
+    SharedStateClient,
+    SharedStateServer
+)
+
+
+@pytest_asyncio.fixture
+async def server(configure):
+    """A shared-state server on a short socket path (Unix socket paths are limited)"""
+    configure(max_concurrent_per_model=1, queue_timeout=0.5)
+    with tempfile.TemporaryDirectory(prefix="state-") as directory:
+        server = SharedStateServer(f"{directory}/state.sock")
+        await server.start()
+        yield server
+        await server.stop()
+
+
+@pytest_asyncio.fixture
+async def connect(server):
+    """Open worker connections to the server; all are closed afterwards"""
+    clients = []
+
+    async def open_client() -> SharedStateClient:
+        client = SharedStateClient(server.path)
+        await client.connect()
+        clients.append(client)
+        return client
+
+    yield open_client
+    for client in clients:
+        await client.close()
+
+
+async def _eventually(predicate, timeout: float = 2) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_limits_hold_across_workers(server, connect):
+    first = SharedAdmissionController(await connect())
+    second = SharedAdmissionController(await connect())
+
+    await first.acquire("llama3.2", "a")
+    waiting = asyncio.create_task(second.acquire("llama3.2", "b"))
+    await _eventually(lambda: server.admission.queued == 1)
+    assert not waiting.done()
+
+    first.release("llama3.2", 0.1)
+    await asyncio.wait_for(waiting, timeout=1)
+    assert server.admission.active == 1
+
+    with pytest.raises(HTTPException) as timed_out:
+        await first.acquire("llama3.2", "a")
+    assert timed_out.value.status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_slots_of_a_disconnected_worker_are_released(server, connect):
+    crashed, survivor = await connect(), await connect()
+    await crashed.acquire_slot("llama3.2", "a")
+    waiting = asyncio.create_task(survivor.acquire_slot("llama3.2", "b"))
+    await _eventually(lambda: server.admission.queued == 1)
+
+    await crashed.close()
+    assert (await asyncio.wait_for(waiting, timeout=1))["active"] == 1
+
+
+@pytest.mark.asyncio
+async def test_session_locks_of_a_disconnected_worker_are_released(server, connect):
+    crashed, survivor = await connect(), await connect()
+    session = await crashed.session_create("client")
+    assert await crashed.session_lock(session["session_id"], "client") is not None
+
+    waiting = asyncio.create_task(survivor.session_lock(session["session_id"], "client"))
+    await asyncio.sleep(0.05)
+    assert not waiting.done()
+
+    await crashed.close()
+    lock_id, _ = await asyncio.wait_for(waiting, timeout=1)
+    survivor.session_unlock(lock_id)
+
+
+@pytest.mark.asyncio
+async def test_expiring_locks(server, connect):
+    client = await connect()
+    assert await client.lock("refresh", ttl=0.1)
+    assert not await client.lock("refresh", ttl=0.1)
+    assert await client.lock("once", ttl=0.1)
+
+    await asyncio.sleep(0.15)
+    assert await client.lock("refresh", ttl=60)
+    # The expired lock nobody asked for again is gone too
+    assert (await client.stats())["locks"] == 1
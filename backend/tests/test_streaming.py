@@ -0,0 +1,67 @@
+"""SSE streaming: first frame, upstream errors, client disconnects"""
+
+import time
+
+import httpx
+import pytest
+
+from app.main import app
+from tests.conftest import sse_events
+
+STREAM = "/api/v1/chat/stream"
+
+
+def test_first_token_arrives_before_generation_finishes(live_api, fake_ollama):
+    fake_ollama.config.token_rate = 20.0  # 20 tokens: one second
+    fake_ollama.config.response_tokens = 20
+
+    started = time.monotonic()
+    with httpx.stream("POST", f"{live_api.url}{STREAM}", json={"message": "hi"}, timeout=10) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = sse_events(response.iter_lines())
+        first = next(events)
+        first_at = time.monotonic() - started
+        rest = list(events)
+
+    assert first["event"] == "token"
+    assert first_at < 0.5
+    assert time.monotonic() - started >= 0.9
+    done = rest[-1]
+    assert done["event"] == "done"
+    assert done["data"]["eval_count"] == 20
+    assert done["data"]["time_to_first_token_ms"] < 500
+    assert len([event for event in rest if event["event"] == "token"]) == 19
+
+
+def test_upstream_error_before_first_token_is_an_http_status(api, fake_ollama):
+    fake_ollama.config.error_rate = 1.0
+
+    response = api.post(STREAM, json={"message": "hi"})
+    assert response.status_code == 500
+    assert response.json()["detail"]
+
+
+@pytest.mark.fake(parallel=1)  # a leaked generation would hold the node's only slot
+def test_client_disconnect_stops_the_upstream_generation(live_api, fake_ollama):
+    fake_ollama.config.token_rate = 20.0
+    fake_ollama.config.response_tokens = 200  # ten seconds
+
+    with httpx.stream("POST", f"{live_api.url}{STREAM}", json={"message": "long"}, timeout=10) as response:
+        assert next(sse_events(response.iter_lines()))["event"] == "token"
+
+    balancer = app.state.ollama_service.balancer
+    deadline = time.monotonic() + 2
+    while balancer.backends[0].outstanding and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert balancer.backends[0].outstanding == 0
+    assert app.state.admission.active == 0
+
+    started = time.monotonic()
+    response = httpx.post(
+        f"{live_api.url}/api/v1/chat/",
+        json={"message": "next", "options": {"num_predict": 2}},
+        timeout=10
+    )
+    assert response.status_code == 200
+    assert time.monotonic() - started < 2